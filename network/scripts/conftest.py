@@ -0,0 +1,84 @@
+"""
+Shared pytest fixtures for the unifi-to-mermaid tests: one small synthetic
+site from unifi-synthetic.py, as API payloads, export files and loaded models
+"""
+
+import copy
+import importlib.util
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import pytest
+
+from unifi_mermaid import UniFiToMermaid
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+def _load_synthetic():
+    """unifi-synthetic.py, which cannot be imported by name"""
+    spec = importlib.util.spec_from_file_location('unifi_synthetic', SCRIPTS_DIR / 'unifi-synthetic.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+synthetic = _load_synthetic()
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch) -> Path:
+    """Keep the snapshot caches of every test out of the user's cache directory"""
+    cache = tmp_path / 'cache'
+    monkeypatch.setenv('XDG_CACHE_HOME', str(cache))
+    return cache
+
+
+@pytest.fixture(scope='session')
+def site_payloads() -> Dict[str, Dict[str, Any]]:
+    """API responses of the test site, keyed by export file name. Shared by
+    every test: copy before changing them (the payloads fixture does)
+    """
+    return synthetic.build_synthetic_export(switches=3, wired_aps=3, mesh_aps=1, vlans=5, rules=14,
+                                            clients=40, seed=7)
+
+
+@pytest.fixture
+def payloads(site_payloads) -> Dict[str, Dict[str, Any]]:
+    """A private copy of the test site's API responses"""
+    return copy.deepcopy(site_payloads)
+
+
+@pytest.fixture
+def write_export(tmp_path) -> Callable[[Dict[str, Dict[str, Any]], str], Path]:
+    """Write payloads as an export directory below the test's temporary directory"""
+    def write(payloads: Dict[str, Dict[str, Any]], name: str = 'export') -> Path:
+        export_dir = tmp_path / name
+        export_dir.mkdir(exist_ok=True)
+        for filename, payload in payloads.items():
+            (export_dir / filename).write_text(json.dumps(payload))
+        return export_dir
+    return write
+
+
+@pytest.fixture
+def export_dir(write_export, payloads) -> Path:
+    """The test site as export files"""
+    return write_export(payloads)
+
+
+@pytest.fixture
+def load_model() -> Callable[[Dict[str, Dict[str, Any]]], UniFiToMermaid]:
+    """Load a model from payloads, leaving the payloads untouched"""
+    def load(payloads: Dict[str, Dict[str, Any]]) -> UniFiToMermaid:
+        model = UniFiToMermaid(snapshot_cache=False)
+        model.load_payloads(copy.deepcopy(payloads))
+        return model
+    return load
+
+
+@pytest.fixture
+def model(load_model, payloads) -> UniFiToMermaid:
+    """The test site, loaded"""
+    return load_model(payloads)
@@ -0,0 +1,88 @@
+"""Behaviour tests for unifi_inventory: the SQLite schema, site loading and read-only queries"""
+
+import contextlib
+import json
+import sqlite3
+
+import pytest
+
+from unifi_inventory import (INVENTORY_SCHEMA_VERSION, INVENTORY_TABLES, open_inventory, query_main,
+                             write_inventory)
+from unifi_mermaid import ConfigError
+
+
+def _count(conn, table, site):
+    return conn.execute(f'SELECT COUNT(*) FROM {table} WHERE site = ?', (site,)).fetchone()[0]
+
+
+def test_open_inventory_creates_the_schema(tmp_path):
+    with contextlib.closing(open_inventory(tmp_path / 'inventory.sqlite')) as conn:
+        names = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        assert names == {'sites', 'port_inventory', *INVENTORY_TABLES}
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == INVENTORY_SCHEMA_VERSION
+
+    # Reopening an existing inventory keeps it
+    with contextlib.closing(open_inventory(tmp_path / 'inventory.sqlite')) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == INVENTORY_SCHEMA_VERSION
+
+
+def test_open_inventory_rejects_another_schema_version(tmp_path):
+    path = tmp_path / 'inventory.sqlite'
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        conn.execute(f'PRAGMA user_version = {INVENTORY_SCHEMA_VERSION + 1}')
+    with pytest.raises(ConfigError):
+        open_inventory(path)
+
+
+def test_write_inventory_rows_match_the_model(tmp_path, model):
+    with contextlib.closing(open_inventory(tmp_path / 'inventory.sqlite')) as conn:
+        counts = write_inventory(conn, model, 'hq')
+        placed = sum(len(hosts) for hosts in model.clients_by_network.values()) + len(model.unplaced_clients)
+        assert counts['networks'] == len(model.networks)
+        assert counts['devices'] == len(model.devices)
+        assert counts['ports'] == sum(len(ports) for ports in model.resolved_ports.values())
+        assert counts['rules'] == len(model.firewall_rules)
+        assert counts['clients'] == placed == len(model.clients.keys() | model.reservations.keys())
+        for table, count in counts.items():
+            assert _count(conn, table, 'hq') == count, table
+
+        # Parents and depths come from the topology walk
+        for device_id, parent_id, depth in conn.execute('SELECT id, parent_id, depth FROM devices'):
+            link = model.topology.parent_link.get(device_id)
+            assert parent_id == (link.other(model.devices[device_id]).id if link is not None else None)
+            assert depth == model.topology.depth.get(device_id)
+
+        # Connected clients show the fixed IP of their reservation
+        for mac, reservation in model.reservations.items():
+            fixed_ip, = conn.execute('SELECT fixed_ip FROM clients WHERE mac = ?', (mac,)).fetchone()
+            assert fixed_ip == reservation.fixed_ip
+
+        rows = conn.execute('SELECT COUNT(*) FROM port_inventory WHERE site = ?', ('hq',)).fetchone()[0]
+        assert rows == counts['ports']
+
+
+def test_write_inventory_replaces_only_its_own_site(tmp_path, model, load_model, payloads):
+    payloads['networks.json']['data'].pop()
+    smaller = load_model(payloads)
+    with contextlib.closing(open_inventory(tmp_path / 'inventory.sqlite')) as conn:
+        write_inventory(conn, model, 'hq')
+        write_inventory(conn, model, 'branch')
+        write_inventory(conn, smaller, 'hq')
+        assert _count(conn, 'networks', 'hq') == len(model.networks) - 1
+        assert _count(conn, 'networks', 'branch') == len(model.networks)
+        assert [site for site, in conn.execute('SELECT site FROM sites ORDER BY site')] == ['branch', 'hq']
+
+
+def test_query_is_read_only(tmp_path, model, capsys):
+    db = tmp_path / 'inventory.sqlite'
+    with contextlib.closing(open_inventory(db)) as conn:
+        write_inventory(conn, model, 'hq')
+
+    with pytest.raises(SystemExit) as exit_info:
+        query_main(['--db', str(db), 'DELETE FROM networks'])
+    assert exit_info.value.code == 1
+
+    capsys.readouterr()
+    query_main(['--db', str(db), '--json', 'SELECT name FROM networks ORDER BY name'])
+    names = [row['name'] for row in json.loads(capsys.readouterr().out)]
+    assert names == sorted(network.name for network in model.networks.values())
@@ -0,0 +1,569 @@
+"""Behaviour tests for unifi_mermaid: parsing, indexes, diffs, history, caches and live updates"""
+
+import filecmp
+import hashlib
+import ipaddress
+import json
+import os
+import random
+
+import pytest
+
+import unifi_mermaid
+from unifi_mermaid import (ALLOW_ACTIONS, DEFAULT_FIREWALL_ACTION, GATEWAY_TYPES, INTERNETWORK_RULESETS, PORT_MAX,
+                           PORT_MIN, PORT_PROTOCOLS, SECTION_INPUTS, Device, FirewallIndex, LiveDocumentation,
+                           Network, PortHistory, PortSet, PrefixIndex, RenderCache, SnapshotDiff, SnapshotRecords,
+                           TopologyGraph, iter_json_array, write_documentation)
+
+
+# --- Streaming JSON parser ---
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 1 << 20])
+@pytest.mark.parametrize('document', [
+    {'meta': {'rc': 'ok'}, 'data': [{'_id': 'a', 'name': 'x'}, {'_id': 'b', 'tags': [1, [2, 3]], 'n': None}]},
+    {'data': [1234567890, -0.5e-7, True, False, None, "", "ends with ]"], 'meta': {'count': 7}},
+    {'data': [{'name': 'quote \" and brace } and bracket ]', 'unicode': 'café \U0001F4E1'}]},
+    {'meta': {'rc': 'ok'}, 'data': []},
+    {'meta': {'rc': 'ok'}},
+    {},
+])
+def test_iter_json_array_matches_json_load(tmp_path, chunk_size, document):
+    path = tmp_path / 'doc.json'
+    path.write_text(json.dumps(document, indent=1, ensure_ascii=False), encoding='utf-8')
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == document.get('data', [])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 20])
+def test_iter_json_array_reads_a_bare_array(tmp_path, chunk_size):
+    elements = [{'_id': str(i), 'values': list(range(i))} for i in range(20)]
+    path = tmp_path / 'array.json'
+    path.write_text(json.dumps(elements))
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == elements
+
+
+def test_iter_json_array_uses_the_given_key(tmp_path):
+    path = tmp_path / 'doc.json'
+    path.write_text(json.dumps({'data': [1], 'devices': [2, 3]}))
+    assert list(iter_json_array(path, key='devices')) == [2, 3]
+
+
+@pytest.mark.parametrize('text', ['{"data": [1, 2', '{"data": [1 2]}', '{"data": {"a": 1}}', '"data"'])
+def test_iter_json_array_rejects_malformed_input(tmp_path, text):
+    path = tmp_path / 'bad.json'
+    path.write_text(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(path, chunk_size=3))
+
+
+# --- Port sets and the firewall index ---
+
+def test_port_set_parses_merges_and_matches():
+    ports = PortSet.parse(['22', '20-25', '80,443', '444', 'http', '70000', '9-3', ' 1000 - 1002 '])
+    assert ports.intervals == ((20, 25), (80, 80), (443, 444), (1000, 1002))
+    expected = set(range(20, 26)) | {80, 443, 444, 1000, 1001, 1002}
+    assert {port for port in range(PORT_MIN, 2000) if port in ports} == expected
+    assert str(ports) == '20-25,80,443-444,1000-1002'
+    assert not PortSet.parse(['none'])
+    assert PortSet.parse([f'{PORT_MIN}-{PORT_MAX}']).is_all
+
+
+def _expand_ports(specs):
+    """Every port named by some port specs, parsed independently of PortSet"""
+    ports = set()
+    for spec in specs:
+        for part in str(spec).split(','):
+            bounds = part.strip().split('-')
+            if all(bound.strip().isdigit() for bound in bounds) and len(bounds) in (1, 2):
+                lo, hi = int(bounds[0]), int(bounds[-1])
+                if PORT_MIN <= lo <= hi <= PORT_MAX:
+                    ports.update(range(lo, hi + 1))
+    return ports
+
+
+def _linear_first_match(rules, groups, src, dst, protocol, port):
+    """The first raw rule matching the traffic, by scanning every rule in
+    evaluation order. Only network-level rules are supported.
+    """
+    rulesets = {name: i for i, name in enumerate(INTERNETWORK_RULESETS)}
+    ordered = sorted((rulesets[rule.get('ruleset', 'LAN_IN')], rule.get('rule_index') or 0, position, rule)
+                     for position, rule in enumerate(rules)
+                     if rule.get('enabled', True) and rule.get('ruleset', 'LAN_IN') in rulesets)
+    for *_, rule in ordered:
+        port_specs = [rule['dst_port']] if rule.get('dst_port') else []
+        sides_match = True
+        for side, network in (('src', src), ('dst', dst)):
+            group_ids = rule.get(f'{side}_firewallgroup_ids') or []
+            if any(group_id not in groups for group_id in group_ids):
+                sides_match = False
+            port_specs += [member for group_id in group_ids if group_id in groups
+                           for member in groups[group_id]['group_members']]
+            wanted = rule.get(f'{side}_networkconf_id')
+            if wanted and wanted != network:
+                sides_match = False
+        if not sides_match:
+            continue
+        rule_protocol = (rule.get('protocol') or 'all').lower()
+        matches = (rule_protocol == 'all' or rule_protocol == protocol
+                   or (rule_protocol == 'tcp_udp' and protocol in PORT_PROTOCOLS))
+        if rule.get('protocol_match_excepted'):
+            matches = not matches
+        if not matches:
+            continue
+        if port_specs:
+            if port is None or protocol not in PORT_PROTOCOLS or port not in _expand_ports(port_specs):
+                continue
+        return rule
+    return None
+
+
+def _random_rules(rng, network_ids, groups):
+    rules = []
+    for index in range(rng.randint(5, 40)):
+        rule = {'_id': f'rule{index}', 'name': f'Rule {index}',
+                'ruleset': rng.choice(['LAN_IN'] * 4 + ['GUEST_IN', 'WAN_IN']),
+                'rule_index': rng.choice([2000, 2001, 2002, 2000 + index]),
+                'enabled': rng.random() < 0.9,
+                'action': rng.choice(['accept', 'drop', 'reject', 'allow']),
+                'protocol': rng.choice(['tcp', 'udp', 'tcp_udp', 'all', 'icmp'])}
+        if rng.random() < 0.15:
+            rule['protocol_match_excepted'] = True
+        for side in ('src', 'dst'):
+            if rng.random() < 0.8:
+                rule[f'{side}_networkconf_id'] = rng.choice(network_ids + ['deleted-network'] * (rng.random() < 0.05))
+        if rng.random() < 0.5:
+            rule['dst_port'] = rng.choice(['22', '80,443', '8000-8100', '5000,5001', '53', 'bad', '1-1023'])
+        if rng.random() < 0.15:
+            rule['dst_firewallgroup_ids'] = [rng.choice(list(groups) + ['deleted-group'])]
+        rules.append(rule)
+    return rules
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_firewall_index_matches_a_linear_rule_scan(site_payloads, seed):
+    rng = random.Random(seed)
+    networks = [Network(raw) for raw in site_payloads['networks.json']['data']]
+    network_ids = [network.id for network in networks]
+    groups = {'web': {'_id': 'web', 'name': 'Web', 'group_type': 'port-group', 'group_members': ['80', '443']},
+              'high': {'_id': 'high', 'name': 'High', 'group_type': 'port-group', 'group_members': ['49152-65535']}}
+    rules = _random_rules(rng, network_ids, groups)
+    firewall = FirewallIndex(networks, rules, groups)
+
+    # Verdicts only change at rule port boundaries, so checking both sides of each covers every port
+    probes = {PORT_MIN, PORT_MAX, None}
+    for rule in rules:
+        for lo, hi in PortSet.parse([rule.get('dst_port') or '', '80,443', '49152-65535']).intervals:
+            probes.update(port for port in (lo - 1, lo, hi, hi + 1) if PORT_MIN <= port <= PORT_MAX)
+    default_allow = DEFAULT_FIREWALL_ACTION in ALLOW_ACTIONS
+
+    def linear_allows(src, dst, protocol, port):
+        rule = _linear_first_match(rules, groups, src, dst, protocol, port)
+        return rule['action'] in ALLOW_ACTIONS if rule is not None else default_allow
+
+    for src in network_ids:
+        for dst in network_ids:
+            for protocol in ('tcp', 'udp', 'icmp', 'gre'):
+                for port in sorted(probes, key=lambda port: port or 0):
+                    expected = _linear_first_match(rules, groups, src, dst, protocol, port)
+                    found = firewall.first_match(src, dst, protocol, port)
+                    assert (found.id if found else None) == (expected['_id'] if expected else None), \
+                        (src, dst, protocol, port)
+                    if port is not None or protocol not in PORT_PROTOCOLS:
+                        assert firewall.can_reach(src, dst, protocol, port) == linear_allows(src, dst, protocol, port)
+                if protocol in PORT_PROTOCOLS:
+                    any_port = any(linear_allows(src, dst, protocol, port) for port in probes if port is not None)
+                    assert firewall.can_reach(src, dst, protocol) == any_port
+
+
+def test_firewall_index_accepts_network_names(site_payloads):
+    networks = [Network(raw) for raw in site_payloads['networks.json']['data']]
+    rules = [{'_id': 'block', 'action': 'drop', 'protocol': 'all',
+              'src_networkconf_id': networks[1].id, 'dst_networkconf_id': networks[2].id}]
+    firewall = FirewallIndex(networks, rules, {})
+    assert not firewall.can_reach(networks[1].name, networks[2].name, 'tcp', 443)
+    assert firewall.can_reach(networks[2].name, networks[1].name, 'tcp', 443)
+    with pytest.raises(KeyError):
+        firewall.network_index('no such network')
+
+
+# --- Longest-prefix match ---
+
+PREFIX_SUBNETS = ['10.0.0.1/8', '10.1.0.1/16', '10.1.2.1/24', '10.1.2.129/25', '10.1.2.0/24', '192.168.1.1/24',
+                  '172.16.0.1/12', '0.0.0.0/0', 'fd00::1/48', 'fd00:0:0:1::1/64', 'N/A', '300.1.1.1/24']
+
+
+def test_prefix_index_matches_ipaddress():
+    networks = [Network({'_id': f'net{i}', 'ip_subnet': subnet}) for i, subnet in enumerate(PREFIX_SUBNETS)]
+    candidates = []
+    for network in networks:
+        try:
+            candidates.append((ipaddress.ip_network(network.subnet, strict=False), network))
+        except ValueError:
+            pass
+    index = PrefixIndex(networks)
+
+    rng = random.Random(3)
+    addresses = ['10.1.2.128', '10.1.2.127', '10.1.3.1', '10.255.255.255', '11.0.0.1', '192.168.1.255',
+                 'fd00::5', 'fd00:0:0:1::5', 'fd01::1', '::1']
+    addresses += [f'10.1.2.{rng.randrange(256)}' for _ in range(50)]
+    addresses += [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(200)]
+    addresses += [str(ipaddress.IPv6Address((0xfd00 << 112) | rng.getrandbits(80))) for _ in range(100)]
+    for address in addresses:
+        ip = ipaddress.ip_address(address)
+        containing = [(subnet.prefixlen, -position, network) for position, (subnet, network) in enumerate(candidates)
+                      if subnet.version == ip.version and ip in subnet]
+        expected = max(containing, key=lambda item: item[:2])[2] if containing else None
+        assert index.lookup(address) is expected, address
+
+    assert index.lookup(None) is None
+    assert index.lookup('not an address') is None
+
+
+# --- Topology ---
+
+def _device(device_id, device_type, uplink=None, lldp=()):
+    record = {'_id': device_id, 'mac': f'00:00:00:00:00:{int(device_id[1:]):02x}', 'type': device_type,
+              'name': device_id, 'port_table': [{'port_idx': i} for i in range(1, 9)],
+              'lldp_table': [{'local_port_idx': local, 'chassis_id': f'00:00:00:00:00:{int(peer[1:]):02x}',
+                              'port_id': f'Port {remote}'} for local, peer, remote in lldp]}
+    if uplink is not None:
+        parent, remote_port, own_port = uplink
+        record['uplink'] = {'type': 'wire', 'uplink_mac': f'00:00:00:00:00:{int(parent[1:]):02x}',
+                            'uplink_remote_port': remote_port, 'port_idx': own_port}
+    return Device(record)
+
+
+def _topology(devices):
+    devices_by_mac = {device.mac: device for device in devices}
+    return TopologyGraph(devices, devices_by_mac, [device for device in devices if device.type in GATEWAY_TYPES])
+
+
+def test_topology_walks_breadth_first_and_keeps_loop_links():
+    devices = [
+        _device('d1', 'udm'),
+        _device('d2', 'usw', uplink=('d1', 1, 8)),
+        _device('d3', 'usw', uplink=('d1', 2, 8)),
+        _device('d4', 'usw', uplink=('d2', 1, 8), lldp=[(7, 'd3', 1)]),  # Also cabled to d3: a loop
+        _device('d5', 'uap', uplink=('d4', 3, 1)),
+        _device('d6', 'usw'),  # Reached by no gateway
+        _device('d7', 'usw', uplink=('d6', 2, 8)),
+    ]
+    topology = _topology(devices)
+    by_id = {device.id: device for device in devices}
+
+    assert topology.depth == {'d1': 0, 'd2': 1, 'd3': 1, 'd4': 2, 'd5': 3, 'd6': 0, 'd7': 1}
+    assert [device.id for device in topology.order] == ['d1', 'd2', 'd3', 'd4', 'd5', 'd6', 'd7']
+    assert topology.parent(by_id['d4']) is by_id['d2']
+    assert topology.uplink_port(by_id['d4']) == 8
+    assert [device.id for device in topology.component_roots] == ['d6']
+    assert [device.id for device in topology.subtree(by_id['d2'])] == ['d2', 'd4', 'd5']
+
+    assert len(topology.loop_links) == 1
+    loop = topology.loop_links[0]
+    assert {loop.a.id, loop.b.id} == {'d3', 'd4'}
+    assert loop.port_of(by_id['d4']) == 7 and loop.port_of(by_id['d3']) == 1
+    assert topology.port_peers[('d3', 1)] is by_id['d4']
+
+
+def test_topology_depths_are_shortest_paths_on_the_synthetic_site(model):
+    devices = list(model.devices.values())
+    topology = model.topology
+    neighbours = {device.id: set() for device in devices}
+    for link in topology.links:
+        neighbours[link.a.id].add(link.b.id)
+        neighbours[link.b.id].add(link.a.id)
+
+    # Independent breadth-first search from the gateways, then each unreached component
+    depth = {}
+    for roots in [[device.id for device in devices if device.type in GATEWAY_TYPES]] + [[d.id] for d in devices]:
+        frontier = [root for root in roots if root not in depth]
+        for root in frontier:
+            depth[root] = 0
+        while frontier:
+            following = []
+            for device_id in frontier:
+                for peer in sorted(neighbours[device_id]):
+                    if peer not in depth:
+                        depth[peer] = depth[device_id] + 1
+                        following.append(peer)
+            frontier = following
+    assert topology.depth == depth
+
+    # Every link is one device's parent link or a loop link, never both
+    parent_links = {id(link) for link in topology.parent_link.values()}
+    loop_links = [id(link) for link in topology.loop_links]
+    assert len(loop_links) == len(set(loop_links))
+    assert parent_links.isdisjoint(loop_links)
+    assert parent_links | set(loop_links) == {id(link) for link in topology.links}
+    for device_id, link in topology.parent_link.items():
+        device = model.devices[device_id]
+        assert depth[link.other(device).id] == depth[device_id] - 1
+
+
+# --- Snapshot diffs ---
+
+def test_snapshot_diff_of_identical_exports_is_empty(model, load_model, payloads):
+    diff = SnapshotDiff(SnapshotRecords(model), SnapshotRecords(load_model(payloads)))
+    assert not diff
+    assert list(diff.iter_report('old', 'new'))[-1] == "No changes."
+
+
+def test_snapshot_diff_reports_added_removed_and_changed_records(model, load_model, payloads):
+    network = payloads['networks.json']['data'][1]
+    old_name, network['name'] = network['name'], 'Renamed'
+    leaf = next(device for device in payloads['devices.json']['data']
+                if not any(other.get('uplink', {}).get('uplink_mac') == device['mac']
+                           for other in payloads['devices.json']['data']) and device['type'] == 'uap')
+    payloads['devices.json']['data'].remove(leaf)
+    payloads['firewall-rules.json']['data'].append({'_id': 'new-rule', 'name': 'Block', 'ruleset': 'LAN_IN',
+                                                    'rule_index': 4000, 'action': 'drop', 'protocol': 'all'})
+    diff = SnapshotDiff(SnapshotRecords(model), SnapshotRecords(load_model(payloads)))
+
+    assert diff
+    assert diff.changed['networks'] == [network['_id']]
+    assert diff.field_changes('networks', network['_id']) == [('name', old_name, 'Renamed')]
+    assert diff.removed['devices'] == [leaf['mac'].lower()]
+    assert diff.added['firewall rules'] == ['new-rule']
+    assert not diff.added['networks'] and not diff.removed['networks']
+    # Ports refer to networks by id, so a rename does not touch them
+    assert all(key.split('/')[0] != leaf['mac'].lower() for key in diff.changed['ports'])
+    report = '\n'.join(diff.iter_report('old', 'new'))
+    assert '| Renamed | name |' in report
+    assert f"- {leaf['name']}" in report
+
+
+# --- Port history ---
+
+def _switch(ports, poe=0.0):
+    """A one-switch snapshot: ports maps a port index to (up, speed, tx bytes, rx bytes)"""
+    return Device({'_id': 'sw', 'mac': 'AA:BB:CC:00:00:01', 'name': 'Core', 'type': 'usw',
+                   'port_table': [{'port_idx': idx, 'up': up, 'speed': speed, 'tx_bytes': tx, 'rx_bytes': rx,
+                                   'port_poe': True, 'poe_power': f'{poe:.2f}'}
+                                  for idx, (up, speed, tx, rx) in ports.items()]})
+
+
+def _fields(stats):
+    return {name: getattr(stats, name) for name in stats.__slots__}
+
+
+def _ingest_sample_history(store):
+    """Five snapshots 300 s apart: port 1 at 100 Mbps with a counter reset
+    before the fourth, port 2 missing from the third, port 3 without link
+    """
+    history = PortHistory(store)
+    tx1 = [0, 375_000_000, 1_125_000_000, 10, 375_000_010]
+    for n, at in enumerate(range(0, 1500, 300)):
+        ports = {1: (True, 100, tx1[n], 3_000_000 * n), 3: (False, 0, 0, 0)}
+        if n != 2:
+            ports[2] = (True, 1000, 1_000_000 * n, 0)
+        history.ingest([_switch(ports, poe=5 + n)], 1_700_000_000 + at)
+    return history
+
+
+def test_port_history_statistics(tmp_path):
+    history = _ingest_sample_history(tmp_path / 'store')
+    stats = history.stats()
+    mac = 'aa:bb:cc:00:00:01'
+
+    port = stats[(mac, 1)]
+    assert port.samples == 5
+    # The interval with the counter reset is skipped
+    assert port.tx_rate == pytest.approx((375 + 750 + 375) * 1e6 / 900)
+    assert port.rx_rate == pytest.approx(9_000_000 / 900)
+    assert (port.util_p50, port.util_p95, port.util_max) == pytest.approx((0.1, 0.2, 0.2))
+    assert port.poe_avg == pytest.approx(7.0)
+    # One watt more every five minutes
+    assert port.poe_trend == pytest.approx(86400 / 300)
+
+    gap = stats[(mac, 2)]
+    assert gap.samples == 4
+    assert gap.tx_rate == pytest.approx(1_000_000 / 300)
+
+    # Without link there is traffic to average but no utilization
+    idle = stats[(mac, 3)]
+    assert idle.tx_rate == 0 and idle.util_max is None
+
+    recent = history.stats(window=600)[(mac, 1)]
+    assert recent.samples == 3
+    assert recent.tx_rate == pytest.approx(375e6 / 300)
+
+
+def test_port_history_persists_and_rejects_older_snapshots(tmp_path):
+    history = _ingest_sample_history(tmp_path / 'store')
+    with pytest.raises(ValueError):
+        history.ingest([_switch({1: (True, 100, 0, 0)})], history.times[-1])
+
+    reopened = PortHistory(tmp_path / 'store')
+    assert reopened.fingerprint == history.fingerprint
+    assert list(reopened.iter_report()) == list(history.iter_report())
+    assert {port: _fields(stats) for port, stats in reopened.stats().items()} == \
+        {port: _fields(stats) for port, stats in history.stats().items()}
+
+
+def test_port_history_grows_its_columns(tmp_path):
+    history = PortHistory(tmp_path / 'store')
+    history.ingest([_switch({1: (True, 100, 0, 0)})], 1000)
+    history.ingest([_switch({idx: (True, 100, 1000 * idx, 0) for idx in range(1, 101)})], 1300)
+    history.ingest([_switch({idx: (True, 100, 2000 * idx, 0) for idx in range(1, 101)})], 1600)
+    assert history.capacity == 128
+
+    stats = PortHistory(tmp_path / 'store').stats()
+    assert len(stats) == 100
+    assert stats[('aa:bb:cc:00:00:01', 1)].samples == 3
+    assert stats[('aa:bb:cc:00:00:01', 1)].tx_rate == pytest.approx(2000 / 600)
+    assert stats[('aa:bb:cc:00:00:01', 100)].samples == 2
+
+
+def test_port_history_report(tmp_path):
+    assert list(PortHistory(tmp_path / 'empty').iter_report()) == ["No snapshots recorded yet."]
+
+    report = list(_ingest_sample_history(tmp_path / 'store').iter_report(bucket='hour', buckets=2))
+    assert "| Core | 1 | 80.0 kbps | 13.3 Mbps | 10% | 20% | 20% | 7.0W | +288.00 W/day |" in report
+    assert "| Core | 3 | 0 bps | 0 bps | - | - | - | 7.0W | +288.00 W/day |" in report
+    assert "### Core" in report
+
+
+def _random_history(store, seed):
+    """A history with counter resets, missing ports, link changes, idle
+    ports and uneven snapshot intervals, over more ports than one block
+    """
+    rng = random.Random(seed)
+    history = PortHistory(store)
+    counters = {}
+    at = 1_700_000_000.0
+    for _ in range(120):
+        at += rng.choice([300, 300, 299.5, 600, 0.25])
+        ports = {}
+        for idx in range(1, 80):
+            if rng.random() < 0.03:
+                continue
+            tx, rx = counters.get(idx, (rng.randrange(10 ** 9), rng.randrange(10 ** 9)))
+            if rng.random() < 0.01:
+                tx, rx = 0, 0
+            if idx % 11:
+                tx, rx = tx + rng.randrange(10 ** 8), rx + rng.randrange(10 ** 7)
+            counters[idx] = (tx, rx)
+            ports[idx] = (rng.random() > 0.1, rng.choice([1000, 100, 0]), tx, rx)
+        history.ingest([_switch(ports, poe=rng.uniform(0, 15))], at)
+    return history
+
+
+def test_port_history_numpy_statistics_match_pure_python(tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    history = _random_history(tmp_path / 'store', seed=1)
+
+    vectorized = {port: _fields(stats) for port, stats in history.stats(window=8 * 3600).items()}
+    vectorized_report = list(history.iter_report(bucket='hour', buckets=12))
+    monkeypatch.setattr(unifi_mermaid, '_load_numpy', lambda: None)
+    python = {port: _fields(stats) for port, stats in history.stats(window=8 * 3600).items()}
+
+    assert vectorized.keys() == python.keys()
+    for port, fields in python.items():
+        for name, value in fields.items():
+            assert vectorized[port][name] == (pytest.approx(value, rel=1e-12) if value is not None else None), \
+                (port, name)
+    assert vectorized_report == list(history.iter_report(bucket='hour', buckets=12))
+
+
+# --- Render cache ---
+
+def test_render_cache_reuses_hashes_until_size_or_mtime_change(tmp_path):
+    output_dir, config_dir = tmp_path / 'out', tmp_path / 'config'
+    output_dir.mkdir()
+    config_dir.mkdir()
+    path = config_dir / 'devices.json'
+    path.write_text('first')
+    cache = RenderCache(output_dir)
+    assert cache.fingerprint(path) == hashlib.sha256(b'first').hexdigest()
+    assert cache.fingerprint(config_dir / 'missing.json') == 'missing'
+    cache.save()
+
+    # Same size and mtime: the stored hash is trusted without reading the file
+    stat = path.stat()
+    path.write_text('other')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert RenderCache(output_dir).fingerprint(path) == hashlib.sha256(b'first').hexdigest()
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert RenderCache(output_dir).fingerprint(path) == hashlib.sha256(b'other').hexdigest()
+
+
+def test_render_cache_section_keys_follow_their_inputs(tmp_path, export_dir):
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    cache = RenderCache(output_dir)
+    keys = {name: cache.section_key(name, export_dir) for name in SECTION_INPUTS}
+    for name, key in keys.items():
+        cache.record(name, key)
+        (output_dir / f'{name}.md').write_text(name)
+    cache.save()
+
+    rules = export_dir / 'firewall-rules.json'
+    rules.write_text(rules.read_text() + ' ')
+    cache = RenderCache(output_dir)
+    for name, key in keys.items():
+        fresh = cache.is_fresh(name, cache.section_key(name, export_dir), output_dir / f'{name}.md')
+        assert fresh == ('firewall-rules.json' not in SECTION_INPUTS[name]), name
+
+    (output_dir / 'physical_topology.md').unlink()
+    assert not cache.is_fresh('physical_topology', keys['physical_topology'], output_dir / 'physical_topology.md')
+    assert cache.section_key('physical_topology', export_dir, options='x') != keys['physical_topology']
+
+
+# --- Live documentation ---
+
+def _switch_records(payloads):
+    return [device for device in payloads['devices.json']['data'] if device['type'] == 'usw']
+
+
+def test_live_documentation_matches_a_full_render(tmp_path, model, load_model, payloads):
+    live = LiveDocumentation(model, [dict(record) for record in payloads['devices.json']['data']],
+                             tmp_path / 'live')
+    live.write()
+    clients = payloads['connected-clients.json']['data']
+    switch, other_switch = _switch_records(payloads)[:2]
+
+    # A port loses link
+    port = switch['port_table'][2]
+    assert live.apply({'meta': {'message': 'device:update'},
+                       'data': [{'_id': switch['_id'], 'port_table': [{'port_idx': port['port_idx'], 'up': False,
+                                                                         'speed': 0}]}]})
+    port.update(up=False, speed=0)
+    summary = live.write()
+    assert summary['rendered'] == ['port_mapping', 'switch_details']
+    assert summary['fragments'] == 2
+
+    # A device is renamed
+    other_switch['name'] = 'Renamed switch'
+    live.apply({'meta': {'message': 'device:sync'}, 'data': [{'_id': other_switch['_id'], 'name': 'Renamed switch'}]})
+
+    # A wired client moves to another switch port; the model lists it last
+    moved = dict(next(client for client in clients if client.get('is_wired')))
+    moved.update(sw_mac=other_switch['mac'], sw_port=1)
+    clients.remove(next(client for client in clients if client['mac'] == moved['mac']))
+    clients.append(moved)
+    live.apply({'meta': {'message': 'sta:sync'}, 'data': [moved]})
+
+    # A client leaves, and a new one joins
+    gone = clients.pop(0)
+    live.apply({'meta': {'message': 'events'}, 'data': [{'key': 'EVT_WU_Disconnected', 'user': gone['mac']}]})
+    joined = dict(clients[0], mac='02:00:00:00:00:99', hostname='joined', _id='joined')
+    clients.append(joined)
+    live.apply({'meta': {'message': 'sta:sync'}, 'data': [joined]})
+
+    assert not live.apply({'meta': {'message': 'speed-test:update'}, 'data': []})
+    live.write()
+
+    write_documentation(tmp_path / 'full', load_model(payloads).iter_sections(SECTION_INPUTS))
+    comparison = filecmp.dircmp(tmp_path / 'live', tmp_path / 'full')
+    assert (comparison.diff_files, comparison.left_only, comparison.right_only) == ([], [], [])
+    assert 'Renamed switch' in (tmp_path / 'live' / 'physical_topology.md').read_text()
+
+
+def test_reservations_do_not_change_client_records(model, payloads):
+    reservation = next(record for record in payloads['known-clients.json']['data']
+                       if record['mac'] in model.clients)
+    client = model.clients[reservation['mac']]
+    model.build('place_clients')
+    assert client.fixed_ip is None
+    assert model.reserved_ip(client) == reservation['fixed_ip']
+    assert model.host_address(client) == client.ip
@@ -0,0 +1,107 @@
+"""Behaviour tests for unifi_serve: page caching, reloads on export changes and the HTTP ETag handling"""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+import unifi_serve
+from unifi_serve import DocumentationServer, ServedSite
+
+
+@pytest.fixture
+def site(export_dir, monkeypatch) -> ServedSite:
+    """The test site served with every request checking the export files"""
+    monkeypatch.setattr(unifi_serve, 'SERVE_CHECK_SECONDS', 0)
+    return ServedSite('hq', export_dir)
+
+
+def _drop_firewall_rule(export_dir):
+    path = export_dir / 'firewall-rules.json'
+    rules = json.loads(path.read_text())
+    rules['data'].pop()
+    path.write_text(json.dumps(rules))
+
+
+def test_pages_are_rendered_once_and_typed(site):
+    page = site.page('firewall_matrix')
+    assert page.content_type == 'text/html; charset=utf-8'
+    assert site.page('firewall_matrix') is page
+    assert site.page('firewall_matrix.md').content_type == 'text/markdown; charset=utf-8'
+    assert site.page('graphs/physical_topology.json').content_type == 'application/json; charset=utf-8'
+    assert site.page('graphs/physical_topology.dot').content_type == 'text/vnd.graphviz; charset=utf-8'
+    assert site.loads == 1
+
+    for missing in ('nowhere', 'firewall_matrix.txt', 'graphs/firewall_matrix.json', 'graphs/nowhere.dot'):
+        assert site.page(missing) is None
+
+
+def test_a_changed_export_file_drops_only_its_pages(site, export_dir):
+    firewall = site.page('firewall_matrix')
+    switches = site.page('switch_details')
+
+    # New mtime, same content: nothing to reload
+    path = export_dir / 'firewall-rules.json'
+    path.write_bytes(path.read_bytes())
+    assert site.page('firewall_matrix') is firewall
+    assert site.loads == 1
+
+    _drop_firewall_rule(export_dir)
+    reloaded = site.page('firewall_matrix')
+    assert site.loads == 2
+    assert reloaded.etag != firewall.etag
+    assert site.page('switch_details') is switches
+
+
+def test_a_broken_export_keeps_the_previous_model(site, export_dir):
+    page = site.page('firewall_matrix')
+    model = site.model
+    (export_dir / 'networks.json').write_text('{"data": [')
+    assert site.page('firewall_matrix') is page
+    assert site.model is model
+    assert site.loads == 1
+
+
+@pytest.fixture
+def server(site):
+    server = DocumentationServer(('127.0.0.1', 0), [site])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _get(server, path, headers=None):
+    host, port = server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_http_revalidation(server, export_dir):
+    status, headers, body = _get(server, '/hq/firewall_matrix')
+    assert status == 200
+    assert headers['Content-Type'] == 'text/html; charset=utf-8'
+    assert int(headers['Content-Length']) == len(body) > 0
+    etag = headers['ETag']
+
+    status, headers, body = _get(server, '/hq/firewall_matrix', {'If-None-Match': etag})
+    assert (status, headers['ETag'], body) == (304, etag, b'')
+
+    _drop_firewall_rule(export_dir)
+    status, headers, body = _get(server, '/hq/firewall_matrix', {'If-None-Match': etag})
+    assert status == 200
+    assert headers['ETag'] != etag
+    assert body
+
+    assert _get(server, '/elsewhere/firewall_matrix')[0] == 404
+    assert _get(server, '/hq/nowhere')[0] == 404
+    status, headers, _ = _get(server, '/')
+    assert (status, headers['Location']) == (302, '/hq/')
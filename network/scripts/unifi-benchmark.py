@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+UniFi Parser Benchmarks
+Measures memory use and timing of unifi-to-mermaid.py against a UniFi API JSON
+export, or against synthetic sites of increasing size to catch superlinear code
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+GENERATORS = (
+    'generate_physical_topology',
+    'generate_logical_topology',
+    'generate_switch_details',
+    'generate_firewall_matrix',
+    'generate_vlan_isolation_matrix',
+    'generate_port_mapping',
+)
+
+# Growth exponent above which a step is flagged: 1.0 is linear, 2.0 quadratic
+SUPERLINEAR_EXPONENT = 1.5
+
+
+def load_module(module_name: str, filename: str):
+    """Import a sibling script whose hyphenated file name rules out a plain import"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPT_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_parser_module():
+    import unifi_mermaid
+    return unifi_mermaid
+
+
+def measure_port_memory(config_dir: Path) -> dict:
+    """Compare memory retained by raw controller dicts and by the record layer"""
+    unifi = load_parser_module()
+    devices_file = config_dir / 'devices.json'
+
+    # Raw dicts, as load_configs kept them before the record layer
+    tracemalloc.start()
+    with open(devices_file) as f:
+        raw_devices = json.load(f).get('data', [])
+    raw_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    port_count = sum(len(dev.get('port_table', [])) for dev in raw_devices)
+    del raw_devices
+
+    # Records, with the raw dicts released once converted
+    tracemalloc.start()
+    with open(devices_file) as f:
+        devices = [unifi.Device(dev) for dev in json.load(f).get('data', [])]
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del devices
+
+    return {
+        'ports': port_count,
+        'raw_bytes': raw_bytes,
+        'record_bytes': record_bytes,
+    }
+
+
+def _measure(step, repeat: int) -> Dict[str, Any]:
+    """Best wall time over repeat runs, then peak traced memory from one extra run"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    step()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def _load_sections(unifi, config_dir: Path, sections: List[str]):
+    """Load just what the named sections read, as an --only run does"""
+    parser = unifi.UniFiToMermaid(str(config_dir), snapshot_cache=False)
+    parser.load_configs(sections=sections)
+    parser.prepare(sections)
+
+
+def _live_port_update(unifi, parser, config_dir: Path, output_dir: Path):
+    """Write live documentation of a loaded export, and return a step that
+    flips one switch port through it and rewrites the documentation
+    """
+    with open(config_dir / 'devices.json') as f:
+        records = json.load(f)['data']
+    live = unifi.LiveDocumentation(parser, records, output_dir)
+    live.write()
+    switch = next((record for record in records
+                   if record.get('type') in unifi.SWITCH_TYPES and record.get('port_table')), None)
+    
+    def step():
+        if switch is not None:
+            port = switch['port_table'][0]  # Merged into in place, so each run flips it back
+            live.apply({'meta': {'message': 'device:update'},
+                        'data': [{'_id': switch['_id'], 'port_table': [{'port_idx': port['port_idx'],
+                                                                          'up': not port.get('up')}]}]})
+        live.write()
+    return step
+
+
+def benchmark_export(config_dir: Path, repeat: int = 3) -> Dict[str, Any]:
+    """Time load_configs (parsing, from the snapshot cache and for the firewall
+    alone), each generate_* method, one host trace and one live port update
+    against one export
+    """
+    unifi = load_parser_module()
+    unifi.logger.setLevel(logging.ERROR)  # Status lines would only add noise to the timings
+    # Parse timings must not be served from the snapshot cache
+    steps = {'load_configs': _measure(
+        lambda: unifi.UniFiToMermaid(str(config_dir), snapshot_cache=False).load_configs(), repeat)}
+    parser = unifi.UniFiToMermaid(str(config_dir))
+    parser.load_configs()  # Parses once more and writes the cache
+    steps['load_snapshot_cache'] = _measure(lambda: unifi.UniFiToMermaid(str(config_dir)).load_configs(), repeat)
+    steps['load_firewall_only'] = _measure(lambda: _load_sections(unifi, config_dir, ['firewall_matrix']), repeat)
+    for name in GENERATORS:
+        steps[name] = _measure(getattr(parser, name), repeat)
+    # The last connected client: the worst case for any scan over the clients
+    host = next(reversed(parser.clients), '')
+    steps['trace_host'] = _measure(lambda: parser.trace_host(host), repeat)
+    # Last, as it changes the loaded model
+    with tempfile.TemporaryDirectory(prefix='unifi-live-') as output_dir:
+        steps['live_port_update'] = _measure(_live_port_update(unifi, parser, config_dir, Path(output_dir)), repeat)
+    return {
+        'devices': len(parser.devices),
+        'ports': sum(len(device.ports) for device in parser.devices.values()),
+        'steps': steps,
+    }
+
+
+def growth_exponents(results: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Log-log slope of time against device count between the two largest sizes.
+    
+    Small sites fit in CPU caches and are dominated by fixed costs, so only
+    the largest step says how a generator scales.
+    """
+    if len(results) < 2:
+        return {}
+    smaller, larger = results[-2], results[-1]
+    size_ratio = larger['devices'] / max(smaller['devices'], 1)
+    if size_ratio <= 1:
+        return {}
+    exponents = {}
+    for name, step in larger['steps'].items():
+        before = smaller['steps'][name]['seconds']
+        # Sub-millisecond steps are dominated by timer noise
+        if before < 1e-3:
+            continue
+        exponents[name] = math.log(step['seconds'] / before) / math.log(size_ratio)
+    return exponents
+
+
+@contextlib.contextmanager
+def _cache_home(path: Path) -> Iterator[None]:
+    """Point XDG_CACHE_HOME, where the parser keeps its snapshot caches, at path for a while"""
+    previous = os.environ.get('XDG_CACHE_HOME')
+    os.environ['XDG_CACHE_HOME'] = str(path)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = previous
+
+
+def run_scaling_suite(scales: List[int], base: Dict[str, int], repeat: int = 3, seed: int = 1) -> List[Dict[str, Any]]:
+    """Benchmark synthetic sites whose device, rule and client counts grow with each scale"""
+    synthetic = load_module('unifi_synthetic', 'unifi-synthetic.py')
+    results = []
+    with tempfile.TemporaryDirectory(prefix='unifi-bench-') as work_dir, _cache_home(Path(work_dir) / 'cache'):
+        # The snapshot caches of the synthetic sites are removed along with them
+        for scale in scales:
+            site_dir = Path(work_dir) / f'scale-{scale}'
+            params = {key: value * scale for key, value in base.items()}
+            synthetic.write_synthetic_export(site_dir, seed=seed, **params)
+            result = benchmark_export(site_dir, repeat)
+            result['scale'] = scale
+            results.append(result)
+            print(f"⏱️  Scale {scale}: {result['devices']} devices, {result['ports']} ports")
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    header = '| Step | ' + ' | '.join(f"{r['devices']} devices" for r in results) + ' |'
+    print(header)
+    print('|' + '---|' * (len(results) + 1))
+    for name in results[0]['steps']:
+        cells = [f"{r['steps'][name]['seconds'] * 1000:,.1f} ms / {r['steps'][name]['peak_bytes'] / 1048576:,.1f} MB"
+                 for r in results]
+        print(f"| {name} | " + ' | '.join(cells) + ' |')
+
+
+def suite_main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog='unifi-benchmark.py suite',
+                                         description="Time the parser on synthetic sites of increasing size")
+    arg_parser.add_argument('--scales', default='1,2,4,8',
+                            help="Comma-separated size multipliers (default: 1,2,4,8)")
+    arg_parser.add_argument('--switches', type=int, default=10, help="Switches at scale 1")
+    arg_parser.add_argument('--wired-aps', type=int, default=10, help="Wired APs at scale 1")
+    arg_parser.add_argument('--mesh-aps', type=int, default=4, help="Mesh APs at scale 1")
+    arg_parser.add_argument('--rules', type=int, default=20, help="Firewall rules at scale 1")
+    arg_parser.add_argument('--clients', type=int, default=100, help="Clients at scale 1")
+    arg_parser.add_argument('--vlans', type=int, default=8, help="Networks (not scaled)")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="Timed runs per step; the best is kept")
+    arg_parser.add_argument('--seed', type=int, default=1)
+    arg_parser.add_argument('--json', dest='json_path', help="Also write the raw results to this file")
+    args = arg_parser.parse_args(argv)
+
+    scales = sorted({int(scale) for scale in args.scales.split(',') if scale.strip()})
+    base = {'switches': args.switches, 'wired_aps': args.wired_aps, 'mesh_aps': args.mesh_aps,
+            'rules': args.rules, 'clients': args.clients}
+    results = run_scaling_suite(scales, base, args.repeat, args.seed)
+    # Networks stay fixed so the VLAN and firewall matrices grow with rules, not squared networks
+    print()
+    print_results(results)
+
+    exponents = growth_exponents(results)
+    superlinear = {name: exp for name, exp in exponents.items() if exp > SUPERLINEAR_EXPONENT}
+    print()
+    for name, exponent in sorted(exponents.items()):
+        marker = '⚠️ ' if name in superlinear else '✅'
+        print(f"{marker} {name}: time grows as n^{exponent:.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'results': results, 'exponents': exponents}, f, indent=2)
+        print(f"📄 Results: {args.json_path}")
+    if superlinear:
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'suite':
+        suite_main(sys.argv[2:])
+        return
+
+    arg_parser = argparse.ArgumentParser(description="Benchmark the UniFi to Mermaid parser")
+    arg_parser.add_argument('config_dir', nargs='?', default='.',
+                            help="Directory containing the exported JSON files (default: current directory)")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="Timed runs per step; the best is kept")
+    args = arg_parser.parse_args()
+
+    config_dir = Path(args.config_dir)
+    if not (config_dir / 'devices.json').exists():
+        print(f"❌ devices.json not found in {config_dir}")
+        sys.exit(1)
+
+    result = measure_port_memory(config_dir)
+    ports = max(result['ports'], 1)
+    raw_per_port = result['raw_bytes'] / ports
+    record_per_port = result['record_bytes'] / ports
+
+    print(f"📊 Memory per port ({result['ports']} ports)")
+    print(f"   Raw controller dicts: {raw_per_port:,.0f} bytes/port")
+    print(f"   Slotted records:      {record_per_port:,.0f} bytes/port")
+    if record_per_port:
+        print(f"   Reduction:            {raw_per_port / record_per_port:.1f}x")
+
+    print()
+    print(f"⏱️  Timing ({args.repeat} runs, best kept)")
+    for name, step in benchmark_export(config_dir, args.repeat)['steps'].items():
+        print(f"   {name:32s} {step['seconds'] * 1000:9,.1f} ms  {step['peak_bytes'] / 1048576:7,.1f} MB peak")
+
+
+if __name__ == '__main__':
+    main()
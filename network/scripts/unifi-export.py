@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""
+UniFi Configuration Exporter
+Fetches the UniFi Network API endpoints used for documentation concurrently
+over one authenticated keep-alive connection pool (replaces unifi.sh)
+"""
+
+import argparse
+import base64
+import hashlib
+import http.client
+import http.cookies
+import json
+import os
+import queue
+import socket
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# (output file, API path, timeout in seconds). {site} is the controller site name.
+# /stat/device is fetched once; gateway-device.json is derived from it.
+ENDPOINTS = [
+    ('networks.json', '/proxy/network/api/s/{site}/rest/networkconf', 30),
+    ('firewall-zones.json', '/proxy/network/api/s/{site}/rest/firewallzone', 30),
+    ('zones.json', '/proxy/network/api/s/{site}/rest/zone', 30),
+    ('firewall-rules-v2.json', '/proxy/network/api/s/{site}/rest/firewallrule', 30),
+    ('port-profiles.json', '/proxy/network/api/s/{site}/rest/portconf', 30),
+    ('devices.json', '/proxy/network/api/s/{site}/stat/device', 120),
+    ('devices-basic.json', '/proxy/network/api/s/{site}/stat/device-basic', 30),
+    ('port-forwards.json', '/proxy/network/api/s/{site}/rest/portforward', 30),
+    ('wireless-networks.json', '/proxy/network/api/s/{site}/rest/wlanconf', 30),
+    ('site-settings.json', '/proxy/network/api/s/{site}/rest/setting', 30),
+    ('user-groups.json', '/proxy/network/api/s/{site}/rest/usergroup', 30),
+    ('gateway-sysinfo.json', '/proxy/network/api/s/{site}/stat/sysinfo', 30),
+    ('system-info.json', '/api/system', 30),
+    ('health-stats.json', '/proxy/network/api/s/{site}/stat/health', 30),
+    ('current-user.json', '/proxy/network/api/s/{site}/stat/current-user', 30),
+    ('connected-clients.json', '/proxy/network/api/s/{site}/stat/sta', 60),
+    ('known-clients.json', '/proxy/network/api/s/{site}/rest/user', 60),
+]
+
+# Without these the documentation cannot be rendered, so the export is abandoned
+REQUIRED_ENDPOINT_FILES = ('networks.json', 'devices.json')
+
+# Fetched after networks.json, using the first network's firewall zone
+ZONE_RULES_ENDPOINT = ('zone-specific-rules.json', '/proxy/network/api/s/{site}/rest/firewallrule/{zone_id}', 30)
+
+GATEWAY_TYPES = ('udm', 'usg', 'ugw')
+
+# WebSocket the controller pushes device, client and event updates on
+EVENTS_PATH = '/proxy/network/wss/s/{site}/events'
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# WebSocket frame opcodes
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+# Seconds to wait before reconnecting a dropped event stream
+WATCH_RETRY_SECONDS = 5.0
+
+
+class ExportError(Exception):
+    """Login failed or an endpoint could not be fetched"""
+
+
+def load_env(env_file: Path) -> Dict[str, str]:
+    """Read KEY=VALUE pairs from a .env file; the process environment wins"""
+    values = {}
+    if env_file.exists():
+        for line in env_file.read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            values[key.strip()] = value.strip().strip('"\'')
+    for key in ('CONTROLLER', 'USERNAME', 'PASSWORD', 'SITE'):
+        if key in os.environ:
+            values[key] = os.environ[key]
+    return values
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one controller, shared by worker threads.
+
+    Cookies set by the controller (the login token) are kept on the pool and
+    sent with every request, so all connections share one session.
+    """
+
+    def __init__(self, base_url: str, size: int, verify_tls: bool = False):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip('/')
+        self.size = size
+        self.ssl_context = ssl.create_default_context() if verify_tls else ssl._create_unverified_context()
+        self.cookies: Dict[str, str] = {}
+        self.csrf_token: Optional[str] = None
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _connect(self, timeout: float) -> http.client.HTTPConnection:
+        with self._lock:
+            self.connections_opened += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                timeout: float = 30) -> Tuple[int, bytes]:
+        """Send one request on an idle connection (or a new one) and return status and body"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect(timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        with self._lock:
+            if self.cookies:
+                headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+            if self.csrf_token:
+                headers['X-CSRF-Token'] = self.csrf_token
+
+        try:
+            conn.request(method, self.base_path + path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+
+        with self._lock:
+            for header in response.headers.get_all('Set-Cookie') or []:
+                cookie = http.cookies.SimpleCookie()
+                cookie.load(header)
+                for name, morsel in cookie.items():
+                    self.cookies[name] = morsel.value
+            csrf = response.getheader('X-CSRF-Token')
+            if csrf:
+                self.csrf_token = csrf
+
+        if response.will_close or self._idle.qsize() >= self.size:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def websocket_accept(key: str) -> str:
+    """The Sec-WebSocket-Accept value answering a handshake's Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    # XOR the whole payload as one big integer rather than byte by byte
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT, mask: bool = True) -> bytes:
+    """One final WebSocket frame; clients must mask what they send, servers must not"""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header.append(mask_bit | len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(mask_bit | 126)
+        header += len(payload).to_bytes(2, 'big')
+    else:
+        header.append(mask_bit | 127)
+        header += len(payload).to_bytes(8, 'big')
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    return bytes(header) + key + _mask(payload, key)
+
+
+def _read_exactly(stream, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) < size:
+        raise ConnectionError("WebSocket closed mid-frame")
+    return data
+
+
+def read_frame(stream) -> Tuple[bool, int, bytes]:
+    """Read one WebSocket frame from a binary file object and return (final, opcode, payload), unmasked"""
+    head = _read_exactly(stream, 2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = int.from_bytes(_read_exactly(stream, 2), 'big')
+    elif length == 127:
+        length = int.from_bytes(_read_exactly(stream, 8), 'big')
+    key = _read_exactly(stream, 4) if head[1] & 0x80 else None
+    payload = _read_exactly(stream, length)
+    return bool(head[0] & 0x80), head[0] & 0x0F, _mask(payload, key) if key else payload
+
+
+class EventStream:
+    """The controller's event WebSocket, opened with the pool's login session.
+    
+    receive() returns one text message at a time, answering pings on the way,
+    and None once the controller closes the stream.
+    """
+    
+    def __init__(self, pool: ConnectionPool, path: str, timeout: float = 30):
+        self.pool = pool
+        self.path = path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._send_lock = threading.Lock()
+    
+    def connect(self):
+        """Open the socket and complete the upgrade handshake; raises ExportError if refused"""
+        pool = self.pool
+        port = pool.port or (443 if pool.scheme == 'https' else 80)
+        sock = socket.create_connection((pool.host, port), timeout=self.timeout)
+        if pool.scheme == 'https':
+            sock = pool.ssl_context.wrap_socket(sock, server_hostname=pool.host)
+        key = base64.b64encode(os.urandom(16)).decode()
+        headers = {
+            'Host': f"{pool.host}:{port}",
+            'Upgrade': 'websocket',
+            'Connection': 'Upgrade',
+            'Sec-WebSocket-Key': key,
+            'Sec-WebSocket-Version': '13',
+        }
+        with pool._lock:
+            if pool.cookies:
+                headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in pool.cookies.items())
+            if pool.csrf_token:
+                headers['X-CSRF-Token'] = pool.csrf_token
+        request = f"GET {pool.base_path + self.path} HTTP/1.1\r\n"
+        request += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        sock.sendall((request + '\r\n').encode())
+        
+        # Frames follow the headers on the same buffered file
+        self._sock, self._file = sock, sock.makefile('rb')
+        status = self._file.readline().decode('latin-1').split()
+        response = {}
+        for line in iter(self._file.readline, b'\r\n'):
+            if not line:
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response[name.strip().lower()] = value.strip()
+        if len(status) < 2 or status[1] != '101':
+            self.close()
+            raise ExportError(f"Event stream: HTTP {status[1] if len(status) > 1 else '?'}")
+        if response.get('sec-websocket-accept') != websocket_accept(key):
+            self.close()
+            raise ExportError("Event stream: bad WebSocket handshake")
+        # Events can be minutes apart; block until the next one
+        sock.settimeout(None)
+    
+    def send(self, payload: bytes, opcode: int = OP_TEXT):
+        with self._send_lock:
+            self._sock.sendall(encode_frame(payload, opcode))
+    
+    def receive(self) -> Optional[str]:
+        """Return the next text message, or None when the stream is closed"""
+        message = []
+        try:
+            while True:
+                final, opcode, payload = read_frame(self._file)
+                if opcode == OP_PING:
+                    self.send(payload, OP_PONG)
+                elif opcode == OP_CLOSE:
+                    return None
+                elif opcode in (OP_TEXT, OP_CONTINUATION):
+                    message.append(payload)
+                    if final:
+                        return b''.join(message).decode('utf-8')
+        except (OSError, ValueError):
+            return None
+    
+    def close(self):
+        if self._sock is None:
+            return
+        try:
+            self.send(b'', OP_CLOSE)
+        except OSError:
+            pass
+        self._file.close()
+        self._sock.close()
+        self._sock = None
+
+
+class UniFiExporter:
+    """Logs in once and fetches all export endpoints concurrently"""
+
+    def __init__(self, controller: str, username: str, password: str, site: str = 'default',
+                 concurrency: int = 8, retries: int = 2, verify_tls: bool = False):
+        self.pool = ConnectionPool(controller, size=concurrency, verify_tls=verify_tls)
+        self.username = username
+        self.password = password
+        self.site = site
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timings: Dict[str, float] = {}
+        # Endpoints the last export could not fetch
+        self.failed: List[str] = []
+
+    def login(self):
+        body = json.dumps({'username': self.username, 'password': self.password}).encode()
+        try:
+            status, _ = self.pool.request('POST', '/api/auth/login', body=body)
+        except (OSError, http.client.HTTPException) as e:
+            raise ExportError(f"Login failed: {e}") from e
+        if status != 200:
+            raise ExportError(f"Login failed: HTTP {status}")
+
+    def fetch(self, filename: str, path: str, timeout: float) -> bytes:
+        """GET one endpoint, retrying connection errors and 5xx responses with backoff"""
+        started = time.perf_counter()
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                status, data = self.pool.request('GET', path, timeout=timeout)
+            except (OSError, http.client.HTTPException) as e:
+                last_error = str(e) or type(e).__name__
+                continue
+            if status >= 500:
+                last_error = f"HTTP {status}"
+                continue
+            if status != 200:
+                raise ExportError(f"{filename}: HTTP {status}")
+            self.timings[filename] = time.perf_counter() - started
+            return data
+        raise ExportError(f"{filename}: {last_error} after {self.retries + 1} attempts")
+
+    def export(self) -> Dict[str, bytes]:
+        """Fetch every endpoint and return the raw response bodies keyed by file name.
+        
+        Failed endpoints are listed in self.failed; if a required one failed,
+        raises ExportError instead.
+        """
+        self.login()
+        results: Dict[str, bytes] = {}
+        errors: Dict[str, str] = {}
+
+        def run(filename, path, timeout):
+            try:
+                results[filename] = self.fetch(filename, path.format(site=self.site), timeout)
+            except ExportError as e:
+                errors[filename] = str(e)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {filename: pool.submit(run, filename, path, timeout) for filename, path, timeout in ENDPOINTS}
+
+            # Zone-specific rules depend on the networks response
+            futures['networks.json'].result()
+            zone_id = first_zone_id(results.get('networks.json'))
+            if zone_id:
+                filename, path, timeout = ZONE_RULES_ENDPOINT
+                pool.submit(run, filename, path.replace('{zone_id}', zone_id), timeout)
+
+        self.pool.close()
+        self.failed = sorted(errors)
+        missing = [filename for filename in REQUIRED_ENDPOINT_FILES if filename in errors]
+        if missing:
+            raise ExportError('; '.join(errors[filename] for filename in self.failed))
+        for filename in self.failed:
+            print(f"⚠️  {errors[filename]}")
+
+        if 'devices.json' in results:
+            results['gateway-device.json'] = gateway_devices(results['devices.json'])
+        return results
+
+
+def first_zone_id(networks_body: Optional[bytes]) -> Optional[str]:
+    if not networks_body:
+        return None
+    try:
+        networks = json.loads(networks_body).get('data', [])
+    except (ValueError, AttributeError):
+        return None
+    return networks[0].get('firewall_zone_id') if networks else None
+
+
+def gateway_devices(devices_body: bytes) -> bytes:
+    """The gateway entries of /stat/device, written like `jq '.data[] | select(...)'`"""
+    try:
+        devices = json.loads(devices_body).get('data', [])
+    except (ValueError, AttributeError):
+        return b''
+    gateways = [dev for dev in devices if dev.get('type') in GATEWAY_TYPES]
+    return ''.join(json.dumps(dev, indent=2) + '\n' for dev in gateways).encode()
+
+
+def load_parser_module():
+    """Import the parser library (unifi_mermaid.py, next to this script), only once diagrams are wanted"""
+    import unifi_mermaid
+    return unifi_mermaid
+
+
+def parse_payloads(unifi, results: Dict[str, bytes]) -> Dict[str, Any]:
+    """Parse the fetched bodies the documentation is rendered from, skipping invalid JSON"""
+    payloads = {}
+    for filename in unifi.REQUIRED_FILES + unifi.OPTIONAL_FILES:
+        if filename in results:
+            try:
+                payloads[filename] = json.loads(results[filename])
+            except ValueError as e:
+                print(f"⚠️  Invalid JSON in {filename}: {e}")
+    return payloads
+
+
+def live_documentation(unifi, results: Dict[str, bytes], config_dir: str, diagrams_dir: Path):
+    """Load fetched bodies into a LiveDocumentation writing to diagrams_dir"""
+    payloads = parse_payloads(unifi, results)
+    # The model converts the device records; keep a copy for merging partial updates
+    records = json.loads(json.dumps(payloads.get('devices.json', {}).get('data', [])))
+    parser = unifi.UniFiToMermaid(config_dir)
+    parser.load_payloads(payloads)
+    return unifi.LiveDocumentation(parser, records, diagrams_dir)
+
+
+def follow_events(stream: EventStream, live, debounce: float):
+    """Apply event-stream messages to live documentation until the stream closes.
+    
+    Messages arriving within `debounce` seconds of each other are applied
+    together and written once.
+    """
+    messages: "queue.Queue[Optional[str]]" = queue.Queue()
+    
+    def read():
+        while True:
+            message = stream.receive()
+            messages.put(message)
+            if message is None:
+                return
+    
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        batch = [messages.get()]
+        deadline = time.monotonic() + debounce
+        while batch[-1] is not None:
+            try:
+                batch.append(messages.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        
+        started = time.perf_counter()
+        applied = 0
+        for message in batch:
+            if message is None:
+                continue
+            try:
+                applied += live.apply(json.loads(message))
+            except (ValueError, AttributeError) as e:
+                print(f"⚠️  Ignoring malformed event: {e}")
+        if applied:
+            summary = live.write()
+            rendered = ', '.join(summary['rendered']) or 'nothing'
+            print(f"🔄 Applied {applied} update{'s' if applied != 1 else ''} in {(time.perf_counter() - started) * 1000:.0f} ms: "
+                  f"re-rendered {rendered} ({summary['fragments']} device fragments), "
+                  f"{len(summary['changed'])} files changed")
+        if batch[-1] is None:
+            return
+
+
+def watch(exporter: UniFiExporter, unifi, results: Dict[str, bytes], config_dir: str, diagrams_dir: Path,
+          debounce: float):
+    """Keep the documentation in diagrams_dir current from the controller's event stream.
+    
+    Starts from an export already fetched. Whenever the stream drops, events
+    may have been missed, so the site is exported again in full before
+    subscribing anew; an export missing any endpoint is retried.
+    """
+    live = None
+    while True:
+        try:
+            if live is None:
+                if results is None:
+                    results = exporter.export()
+                    if exporter.failed:
+                        raise ExportError(f"export incomplete: {', '.join(exporter.failed)} could not be fetched")
+                live = live_documentation(unifi, results, config_dir, diagrams_dir)
+                live.write()
+                print(f"📚 Documentation written to {diagrams_dir}")
+            stream = EventStream(exporter.pool, EVENTS_PATH.format(site=exporter.site))
+            stream.connect()
+        except (ExportError, unifi.ConfigError, OSError) as e:
+            print(f"⚠️  {e}; retrying in {WATCH_RETRY_SECONDS:.0f}s")
+            results = None
+            time.sleep(WATCH_RETRY_SECONDS)
+            continue
+        
+        print(f"👂 Watching {exporter.site} for changes (Ctrl+C to stop)")
+        try:
+            follow_events(stream, live, debounce)
+        finally:
+            stream.close()
+        print("🔌 Event stream closed; exporting again")
+        live, results = None, None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export UniFi configuration for documentation")
+    arg_parser.add_argument('--env', default='.env', help="File with CONTROLLER, USERNAME and PASSWORD (default: .env)")
+    arg_parser.add_argument('--site', help="Controller site name (default: SITE from .env, or 'default')")
+    arg_parser.add_argument('--output-dir', default='.', help="Directory to write the JSON files to (default: .)")
+    arg_parser.add_argument('--concurrency', type=int, default=8, help="Parallel requests (default: 8)")
+    arg_parser.add_argument('--retries', type=int, default=2, help="Retries per endpoint on errors (default: 2)")
+    arg_parser.add_argument('--verify-tls', action='store_true', help="Verify the controller's TLS certificate")
+    arg_parser.add_argument('--no-write', action='store_true', help="Do not write the JSON files")
+    arg_parser.add_argument('--diagrams', metavar='DIR',
+                            help="Also render the documentation into DIR straight from the fetched data")
+    arg_parser.add_argument('--watch', action='store_true',
+                            help="After exporting, keep the --diagrams documentation current from the "
+                                 "controller's event stream until interrupted")
+    arg_parser.add_argument('--debounce', type=float, default=0.5,
+                            help="Seconds to gather events before re-rendering in --watch mode (default: 0.5)")
+    args = arg_parser.parse_args()
+    if args.watch and not args.diagrams:
+        arg_parser.error("--watch requires --diagrams")
+
+    env = load_env(Path(args.env))
+    missing = [key for key in ('CONTROLLER', 'USERNAME', 'PASSWORD') if not env.get(key)]
+    if missing:
+        print(f"❌ Missing {', '.join(missing)} (set them in {args.env} or the environment)")
+        sys.exit(1)
+
+    exporter = UniFiExporter(env['CONTROLLER'], env['USERNAME'], env['PASSWORD'],
+                             site=args.site or env.get('SITE', 'default'),
+                             concurrency=args.concurrency, retries=args.retries, verify_tls=args.verify_tls)
+
+    print("Logging in to UniFi controller...")
+    started = time.perf_counter()
+    try:
+        results = exporter.export()
+    except ExportError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    if not args.no_write:
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for filename, body in results.items():
+            (output_dir / filename).write_bytes(body)
+
+    slowest = sorted(exporter.timings.items(), key=lambda item: item[1], reverse=True)[:3]
+    print(f"✅ Fetched {len(exporter.timings)} endpoints in {elapsed:.2f}s "
+          f"over {exporter.pool.connections_opened} connections")
+    for filename, seconds in slowest:
+        print(f"   {filename}: {seconds:.2f}s")
+
+    if args.watch:
+        if exporter.failed:
+            # Watching would keep documentation from a partial export current
+            print(f"❌ Export incomplete: {', '.join(exporter.failed)} could not be fetched; not watching")
+            sys.exit(1)
+        unifi = load_parser_module()
+        # One summary line per update; the parser's per-file lines would drown it
+        unifi.configure_logging(quiet=True)
+        try:
+            watch(exporter, unifi, results, args.output_dir, Path(args.diagrams), args.debounce)
+        except KeyboardInterrupt:
+            print("👋 Stopped watching")
+        return
+    
+    if args.diagrams:
+        unifi = load_parser_module()
+        unifi.configure_logging()
+        payloads = parse_payloads(unifi, results)
+        parser = unifi.UniFiToMermaid(args.output_dir)
+        try:
+            parser.load_payloads(payloads)
+        except unifi.ConfigError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        unifi.write_documentation(Path(args.diagrams), parser.iter_sections(unifi.SECTION_INPUTS))
+        print(f"📚 Documentation written to {args.diagrams}")
+
+    if exporter.failed:
+        print(f"❌ Export incomplete: {', '.join(exporter.failed)} could not be fetched")
+        sys.exit(1)
+    print("Configuration extracted successfully!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Mock UniFi Controller
+Serves export fixtures over the UniFi OS API paths so unifi-export.py can be
+tested and timed offline. Messages POSTed to /__mock/events are pushed to
+every client subscribed to the event stream WebSocket.
+"""
+
+import argparse
+import importlib.util
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+EMPTY_RESPONSE = b'{"meta": {"rc": "ok"}, "data": []}'
+
+
+def load_exporter_module():
+    """Import unifi-export.py for its endpoint table"""
+    module_name = 'unifi_export'
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPT_DIR / 'unifi-export.py')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def endpoint_routes():
+    """Compile the exporter's endpoint paths into (regex, fixture file) routes"""
+    exporter = load_exporter_module()
+    routes = []
+    for filename, path, _ in exporter.ENDPOINTS + [exporter.ZONE_RULES_ENDPOINT]:
+        pattern = re.escape(path).replace(r'\{site\}', '[^/]+').replace(r'\{zone_id\}', '[^/]+')
+        routes.append((re.compile(pattern + '$'), filename))
+    return routes
+
+
+class MockController(ThreadingHTTPServer):
+    """HTTP server holding the fixtures, sessions and request counters"""
+    daemon_threads = True
+
+    def __init__(self, address, fixtures_dir: Optional[Path], username: str = 'admin',
+                 password: str = 'admin', latency: float = 0.0, flaky: int = 0):
+        super().__init__(address, MockControllerHandler)
+        self.fixtures_dir = fixtures_dir
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.flaky = flaky
+        self.routes = endpoint_routes()
+        events_path = re.escape(load_exporter_module().EVENTS_PATH).replace(r'\{site\}', '[^/]+')
+        self.events_route = re.compile(events_path + '$')
+        # Open event streams, as (socket writer, lock serializing its frames)
+        self.subscribers = []
+        self.sessions = set()
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def publish(self, messages) -> int:
+        """Push JSON messages to every event stream subscriber; returns how many were reached"""
+        exporter = load_exporter_module()
+        frames = b''.join(exporter.encode_frame(json.dumps(message).encode(), mask=False) for message in messages)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        reached = 0
+        for wfile, lock in subscribers:
+            try:
+                with lock:
+                    wfile.write(frames)
+                    wfile.flush()
+                reached += 1
+            except OSError:
+                pass  # The stream's handler thread removes it when it notices
+        return reached
+
+    def fixture(self, filename: str) -> bytes:
+        if self.fixtures_dir is not None:
+            path = self.fixtures_dir / filename
+            if path.exists():
+                return path.read_bytes()
+        return EMPTY_RESPONSE
+
+
+class MockControllerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like a real controller
+    server: MockController
+
+    def log_message(self, format, *args):
+        pass  # Request counts are reported instead
+
+    def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _session(self) -> Optional[str]:
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'TOKEN':
+                return value
+        return None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/__mock/events':
+            try:
+                messages = json.loads(body)
+            except ValueError:
+                self._send(400, b'{"error": "invalid JSON"}')
+                return
+            if not isinstance(messages, list):
+                messages = [messages]
+            self._send(200, json.dumps({'subscribers': self.server.publish(messages)}).encode())
+            return
+        if self.path != '/api/auth/login':
+            self._send(404, b'{"error": "not found"}')
+            return
+        try:
+            credentials = json.loads(body)
+        except ValueError:
+            credentials = {}
+        if credentials.get('username') != self.server.username or credentials.get('password') != self.server.password:
+            self._send(401, b'{"error": "invalid credentials"}')
+            return
+        token = secrets.token_hex(16)
+        with self.server.lock:
+            self.server.sessions.add(token)
+        self._send(200, b'{"username": "admin"}', {
+            'Set-Cookie': f'TOKEN={token}; Path=/; HttpOnly',
+            'X-CSRF-Token': secrets.token_hex(8),
+        })
+
+    def do_GET(self):
+        if self.path == '/__mock/stats':
+            with self.server.lock:
+                stats = dict(self.server.requests)
+            self._send(200, json.dumps(stats).encode())
+            return
+
+        if self._session() not in self.server.sessions:
+            self._send(401, b'{"meta": {"rc": "error", "msg": "api.err.LoginRequired"}}')
+            return
+
+        if self.server.events_route.match(self.path) and self.headers.get('Upgrade', '').lower() == 'websocket':
+            self._stream_events()
+            return
+
+        for pattern, filename in self.server.routes:
+            if pattern.match(self.path):
+                break
+        else:
+            self._send(404, b'{"error": "not found"}')
+            return
+
+        with self.server.lock:
+            self.server.requests[self.path] += 1
+            attempt = self.server.requests[self.path]
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if attempt <= self.server.flaky:
+            self._send(503, b'{"error": "service unavailable"}')
+            return
+        self._send(200, self.server.fixture(filename))
+
+    def _stream_events(self):
+        """Upgrade to a WebSocket and hold it open as an event stream subscriber until the client closes it"""
+        exporter = load_exporter_module()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', exporter.websocket_accept(self.headers.get('Sec-WebSocket-Key', '')))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        subscriber = (self.wfile, threading.Lock())
+        with self.server.lock:
+            self.server.requests[self.path] += 1
+            self.server.subscribers.append(subscriber)
+        try:
+            while True:
+                _, opcode, payload = exporter.read_frame(self.rfile)
+                if opcode == exporter.OP_CLOSE:
+                    break
+                if opcode == exporter.OP_PING:
+                    with subscriber[1]:
+                        self.wfile.write(exporter.encode_frame(payload, exporter.OP_PONG, mask=False))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.server.lock:
+                self.server.subscribers.remove(subscriber)
+
+
+def start_mock_controller(fixtures_dir: Optional[Path] = None, host: str = '127.0.0.1', port: int = 0,
+                          **options) -> MockController:
+    """Start a mock controller on a background thread; port 0 picks a free port"""
+    server = MockController((host, port), fixtures_dir, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve UniFi export fixtures as a mock controller")
+    arg_parser.add_argument('fixtures_dir', nargs='?', help="Directory of exported JSON files to serve")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8443)
+    arg_parser.add_argument('--username', default='admin')
+    arg_parser.add_argument('--password', default='admin')
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help="Seconds to delay every API response, to mimic a busy controller")
+    arg_parser.add_argument('--flaky', type=int, default=0,
+                            help="Fail the first N requests to each path with HTTP 503, to exercise retries")
+    args = arg_parser.parse_args()
+
+    fixtures_dir = Path(args.fixtures_dir) if args.fixtures_dir else None
+    server = MockController((args.host, args.port), fixtures_dir, username=args.username,
+                            password=args.password, latency=args.latency, flaky=args.flaky)
+    print(f"🧪 Mock controller on {server.url} (user {args.username})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("📊 Requests served:")
+        for path, count in sorted(server.requests.items()):
+            print(f"   {count:3d}  {path}")
+
+
+if __name__ == '__main__':
+    main()
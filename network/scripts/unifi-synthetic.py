@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Synthetic UniFi Export Generator
+Writes realistic, shareable networks.json, devices.json, port-profiles.json,
+firewall and client exports of any size for testing and benchmarking
+"""
+
+import argparse
+import ipaddress
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SWITCH_MODELS = {8: 'USL8LP', 16: 'USL16LP', 24: 'US24P250', 48: 'US48P500'}
+AP_MODELS = ['U6LR', 'U6PRO', 'U6ENT', 'UAL6', 'U7PRO']
+GATEWAY_PORTS = 11  # UDM SE: 8 LAN, WAN, 2 SFP+; port 9 is the WAN
+
+SERVICE_PORTS = ['22', '53', '80', '443', '445', '389', '636', '3389', '8000-8100', '5000,5001']
+
+
+def _mac(index: int, prefix: str = 'f4:e2:c6') -> str:
+    return f"{prefix}:{(index >> 16) & 0xff:02x}:{(index >> 8) & 0xff:02x}:{index & 0xff:02x}"
+
+
+def _object_id(rng: random.Random) -> str:
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(24))
+
+
+def _response(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {'meta': {'rc': 'ok'}, 'data': data}
+
+
+class _SyntheticSite:
+    """Builds one consistent site: uplinks occupy real ports on their parents"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.devices: List[Dict[str, Any]] = []
+        self.next_mac = 1
+        self.free_ports: Dict[str, List[int]] = {}
+
+    def new_mac(self) -> str:
+        mac = _mac(self.next_mac)
+        self.next_mac += 1
+        return mac
+
+    def port_entry(self, port_idx: int, poe: bool) -> Dict[str, Any]:
+        """A port_table entry with the counters a real /stat/device carries"""
+        rng = self.rng
+        up = rng.random() < 0.45
+        speed = rng.choice([100, 1000, 1000, 2500]) if up else 0
+        power = round(rng.uniform(1.5, 14.0), 2) if (up and poe and rng.random() < 0.5) else 0
+        return {
+            'port_idx': port_idx, 'name': f'Port {port_idx}', 'media': 'GE', 'enable': True,
+            'up': up, 'speed': speed, 'full_duplex': up, 'is_uplink': False,
+            'port_poe': poe, 'poe_enable': poe, 'poe_mode': 'auto' if poe else 'off',
+            'poe_power': f"{power:.2f}" if poe else '0.00', 'poe_voltage': '53.10' if poe else '0.00',
+            'tx_bytes': rng.randint(10 ** 6, 10 ** 11) if up else 0,
+            'rx_bytes': rng.randint(10 ** 6, 10 ** 11) if up else 0,
+            'tx_packets': rng.randint(10 ** 3, 10 ** 8) if up else 0,
+            'rx_packets': rng.randint(10 ** 3, 10 ** 8) if up else 0,
+            'tx_errors': 0, 'rx_errors': 0, 'tx_dropped': 0, 'rx_dropped': 0,
+            'stp_state': 'forwarding' if up else 'disabled', 'stp_pathcost': 20000,
+            'mac_table_count': rng.randint(0, 4) if up else 0,
+            'satisfaction': 100, 'flowctrl_rx': False, 'flowctrl_tx': False,
+        }
+
+    def add_device(self, dev_type: str, name: str, model: str, port_count: int,
+                   poe_ports: bool) -> Dict[str, Any]:
+        device = {
+            '_id': _object_id(self.rng), 'mac': self.new_mac(), 'type': dev_type,
+            'name': name, 'model': model, 'version': '7.1.66.15435', 'adopted': True,
+            'state': 1, 'uptime': self.rng.randint(3600, 10 ** 7),
+            'ip': f"10.0.{len(self.devices) // 250}.{len(self.devices) % 250 + 2}",
+            'port_table': [self.port_entry(idx, poe_ports and idx <= max(port_count - 2, 1))
+                           for idx in range(1, port_count + 1)],
+            'port_overrides': [], 'lldp_table': [], 'uplink': {},
+            'sys_stats': {'loadavg_1': '0.12', 'mem_total': 1 << 30, 'mem_used': 1 << 28},
+        }
+        self.devices.append(device)
+        self.free_ports[device['mac']] = [idx for idx in range(2, port_count + 1)]
+        return device
+
+    def take_port(self, parent: Dict[str, Any], exclude: Optional[int] = None) -> Optional[int]:
+        free = self.free_ports.get(parent['mac'], [])
+        for position, port_idx in enumerate(free):
+            if port_idx != exclude:
+                return free.pop(position)
+        return None
+
+    def connect(self, child: Dict[str, Any], parent: Dict[str, Any], parent_port: int, child_port: int):
+        """Wire child's uplink port to parent_port, marking both ends up with LLDP neighbors"""
+        speed = 1000
+        for device, port_idx in ((parent, parent_port), (child, child_port)):
+            if device.get('port_table'):
+                port = device['port_table'][port_idx - 1]
+                port.update(up=True, speed=speed, full_duplex=True,
+                            tx_bytes=port['tx_bytes'] or self.rng.randint(10 ** 8, 10 ** 12),
+                            rx_bytes=port['rx_bytes'] or self.rng.randint(10 ** 8, 10 ** 12))
+        child['port_table'][child_port - 1]['is_uplink'] = True
+        child['uplink'] = {
+            'type': 'wire', 'up': True, 'speed': speed, 'full_duplex': True,
+            'uplink_mac': parent['mac'], 'uplink_device_name': parent['name'],
+            'uplink_remote_port': parent_port, 'port_idx': child_port,
+        }
+        child['lldp_table'].append({'chassis_id': parent['mac'], 'port_id': f'Port {parent_port}',
+                                    'local_port_idx': child_port, 'is_wired': True})
+        parent['lldp_table'].append({'chassis_id': child['mac'], 'port_id': f'Port {child_port}',
+                                     'local_port_idx': parent_port, 'is_wired': True})
+
+
+def build_synthetic_export(gateways: int = 1, switches: int = 4, wired_aps: int = 6, mesh_aps: int = 2,
+                           vlans: int = 6, rules: int = 10, clients: int = 50, min_ports: int = 8,
+                           max_ports: int = 48, seed: int = 1) -> Dict[str, Dict[str, Any]]:
+    """Build a consistent synthetic site and return its API responses keyed by export file name"""
+    site = _SyntheticSite(seed)
+    rng = site.rng
+
+    # Networks: a default LAN plus tagged VLANs, each with its own /24
+    networks = [{'_id': _object_id(rng), 'name': 'Default', 'purpose': 'corporate',
+                 'ip_subnet': '10.0.0.1/16', 'networkgroup': 'LAN', 'dhcpd_enabled': True,
+                 'firewall_zone_id': _object_id(rng), 'internet_access_enabled': True}]
+    for index in range(1, vlans):
+        vlan = index * 10
+        networks.append({'_id': _object_id(rng), 'name': f'VLAN{vlan}', 'purpose': 'corporate',
+                         'vlan': vlan, 'vlan_enabled': True, 'ip_subnet': f'10.{vlan % 250 + 1}.{index // 250}.1/24',
+                         'networkgroup': 'LAN', 'dhcpd_enabled': True, 'firewall_zone_id': networks[0]['firewall_zone_id']
+                         if index % 3 == 0 else _object_id(rng), 'internet_access_enabled': index % 4 != 0})
+
+    # Port profiles: one access profile per network plus an all-VLAN trunk
+    profiles = [{'_id': _object_id(rng), 'name': f"{net['name']} Access", 'forward': 'native',
+                 'native_networkconf_id': net['_id'], 'poe_mode': 'auto'} for net in networks]
+    profiles.append({'_id': _object_id(rng), 'name': 'All', 'forward': 'all',
+                     'native_networkconf_id': networks[0]['_id'],
+                     'tagged_networkconf_ids': [net['_id'] for net in networks[1:]]})
+
+    # Gateways are the roots; switches hang off gateways or earlier switches
+    roots = [site.add_device('udm', f'Gateway {i + 1}', 'UDMPRO-SE', GATEWAY_PORTS, False)
+             for i in range(gateways)]
+    for root in roots:
+        site.free_ports[root['mac']].remove(9)  # Reserved for WAN
+        root['port_table'][8].update(up=True, speed=1000, tx_bytes=10 ** 12, rx_bytes=10 ** 12)
+
+    port_choices = [size for size in sorted(SWITCH_MODELS) if min_ports <= size <= max_ports] or [min_ports]
+    switch_devices = []
+    for index in range(switches):
+        port_count = rng.choice(port_choices)
+        switch = site.add_device('usw', f'Switch {index + 1}', SWITCH_MODELS.get(port_count, 'USW'),
+                                 port_count, True)
+        candidates = roots + switch_devices
+        parent = rng.choice(candidates[:len(roots) + max(1, len(switch_devices) // 2)])
+        parent_port = site.take_port(parent)
+        if parent_port is None:
+            parent = next((c for c in candidates if site.free_ports[c['mac']]), roots[0])
+            parent_port = site.take_port(parent) or 1
+        site.free_ports[switch['mac']].remove(port_count)  # Last port is the uplink
+        site.connect(switch, parent, parent_port, port_count)
+        switch_devices.append(switch)
+
+    # Wired APs take free switch ports; mesh APs hang off wired APs
+    access_points = []
+    wired_parents = switch_devices or roots
+    for index in range(wired_aps):
+        ap = site.add_device('uap', f'AP {index + 1}', rng.choice(AP_MODELS), 1, False)
+        ap['radio_table_stats'] = [{'name': radio, 'channel': rng.choice([1, 6, 11, 36, 149]),
+                                    'num_sta': rng.randint(0, 30), 'satisfaction': 98} for radio in ('ng', 'na')]
+        parent = rng.choice(wired_parents)
+        parent_port = site.take_port(parent)
+        if parent_port is None:
+            parent = next((p for p in wired_parents + roots if site.free_ports[p['mac']]), None)
+            parent_port = site.take_port(parent) if parent else None
+        if parent is not None and parent_port is not None:
+            site.connect(ap, parent, parent_port, 1)
+        access_points.append(ap)
+    for index in range(mesh_aps):
+        ap = site.add_device('uap', f'Mesh AP {index + 1}', rng.choice(AP_MODELS), 1, False)
+        if access_points:
+            parent = rng.choice(access_points)
+            ap['uplink'] = {'type': 'wireless', 'up': True, 'uplink_mac': parent['mac'],
+                            'uplink_device_name': parent['name'], 'rssi': -rng.randint(45, 75)}
+        access_points.append(ap)
+
+    # Port overrides on about half of each switch's ports
+    for switch in switch_devices:
+        for port in switch['port_table']:
+            if rng.random() < 0.5 and not port.get('is_uplink'):
+                profile = rng.choice(profiles)
+                override = {'port_idx': port['port_idx'], 'portconf_id': profile['_id'], 'poe_mode': 'auto'}
+                if rng.random() < 0.3:
+                    override['name'] = f"Desk {switch['name'][-1]}-{port['port_idx']}"
+                switch['port_overrides'].append(override)
+
+    # Firewall groups and rules between networks
+    groups = [{'_id': _object_id(rng), 'name': f'Ports {i}', 'group_type': 'port-group',
+               'group_members': rng.sample(SERVICE_PORTS, 2)} for i in range(max(1, rules // 10))]
+    groups.append({'_id': _object_id(rng), 'name': 'Servers', 'group_type': 'address-group',
+                   'group_members': [f"10.{(n * 10) % 250 + 1}.0.{10 + n}" for n in range(1, 4)]})
+    firewall_rules = []
+    for index in range(rules):
+        src, dst = rng.sample(networks, 2) if len(networks) > 1 else (networks[0], networks[0])
+        rule = {'_id': _object_id(rng), 'name': f'Rule {index + 1}', 'enabled': rng.random() < 0.9,
+                'ruleset': 'LAN_IN', 'rule_index': 2000 + index,
+                'action': rng.choice(['accept', 'accept', 'drop', 'reject']),
+                'protocol': rng.choice(['tcp', 'udp', 'tcp_udp', 'all']),
+                'src_networkconf_id': src['_id'], 'src_networkconf_type': 'NETv4',
+                'dst_networkconf_id': dst['_id'], 'dst_networkconf_type': 'NETv4',
+                'dst_port': rng.choice(SERVICE_PORTS + ['']), 'src_firewallgroup_ids': [],
+                'dst_firewallgroup_ids': []}
+        if rng.random() < 0.2:
+            rule['dst_firewallgroup_ids'] = [rng.choice(groups)['_id']]
+        firewall_rules.append(rule)
+
+    # Clients on switch ports (wired) and APs (wireless), with IPs in their network
+    client_list = []
+    tagged = networks[1:] or networks
+    for index in range(clients):
+        network = rng.choice(tagged)
+        subnet = ipaddress.ip_network(network['ip_subnet'], strict=False)
+        host = subnet.network_address + 10 + index % max(1, subnet.num_addresses - 20)
+        client = {'_id': _object_id(rng), 'mac': _mac(index + 1, '3c:22:fb'),
+                  'hostname': f'host-{index + 1}', 'ip': str(host), 'network_id': network['_id'],
+                  'network': network['name'], 'vlan': network.get('vlan'),
+                  'oui': 'Apple', 'uptime': rng.randint(60, 10 ** 6),
+                  'tx_bytes': rng.randint(10 ** 4, 10 ** 9), 'rx_bytes': rng.randint(10 ** 4, 10 ** 9)}
+        if switch_devices and rng.random() < 0.5:
+            switch = rng.choice(switch_devices)
+            client.update(is_wired=True, sw_mac=switch['mac'],
+                          sw_port=rng.randint(1, len(switch['port_table'])))
+        elif access_points:
+            ap = rng.choice(access_points)
+            client.update(is_wired=False, ap_mac=ap['mac'], essid='Corp', channel=36,
+                          signal=-rng.randint(40, 80))
+        else:
+            client['is_wired'] = True
+        client_list.append(client)
+
+    # DHCP reservations: some for connected clients, some for hosts that are offline
+    reservations = []
+    for index, client in enumerate(client_list):
+        if index % 10 == 0:
+            reservations.append({'_id': _object_id(rng), 'mac': client['mac'], 'name': f"Reserved {index + 1}",
+                                 'use_fixedip': True, 'fixed_ip': client['ip'], 'network_id': client['network_id']})
+    for index in range(clients // 20):
+        network = rng.choice(tagged)
+        subnet = ipaddress.ip_network(network['ip_subnet'], strict=False)
+        reservations.append({'_id': _object_id(rng), 'mac': _mac(index + 1, '00:11:32'),
+                             'name': f'Printer {index + 1}', 'use_fixedip': True, 'network_id': network['_id'],
+                             'fixed_ip': str(subnet.broadcast_address - 1 - index % max(1, subnet.num_addresses - 20))})
+
+    return {
+        'networks.json': _response(networks),
+        'devices.json': _response(site.devices),
+        'port-profiles.json': _response(profiles),
+        'firewall-rules.json': _response(firewall_rules),
+        'firewall-groups.json': _response(groups),
+        'connected-clients.json': _response(client_list),
+        'known-clients.json': _response(reservations),
+    }
+
+
+def write_synthetic_export(output_dir: Path, **params) -> Dict[str, int]:
+    """Write a synthetic export to output_dir and return its size in bytes per file"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sizes = {}
+    for filename, payload in build_synthetic_export(**params).items():
+        path = output_dir / filename
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+        sizes[filename] = path.stat().st_size
+    return sizes
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic UniFi export")
+    arg_parser.add_argument('output_dir', help="Directory to write the JSON files to")
+    arg_parser.add_argument('--gateways', type=int, default=1)
+    arg_parser.add_argument('--switches', type=int, default=4)
+    arg_parser.add_argument('--wired-aps', type=int, default=6)
+    arg_parser.add_argument('--mesh-aps', type=int, default=2)
+    arg_parser.add_argument('--vlans', type=int, default=6, help="Number of networks, including the default LAN")
+    arg_parser.add_argument('--rules', type=int, default=10, help="Number of firewall rules")
+    arg_parser.add_argument('--clients', type=int, default=50)
+    arg_parser.add_argument('--min-ports', type=int, default=8, help="Smallest switch size (8-48)")
+    arg_parser.add_argument('--max-ports', type=int, default=48, help="Largest switch size (8-48)")
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+
+    params = {key: value for key, value in vars(args).items() if key != 'output_dir'}
+    sizes = write_synthetic_export(Path(args.output_dir), **params)
+    for filename, size in sizes.items():
+        print(f"📄 {filename}: {size / 1024:,.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
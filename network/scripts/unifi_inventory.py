@@ -0,0 +1,236 @@
+"""
+SQLite inventory of one or more sites, for the inventory and query commands
+of unifi-to-mermaid.py
+"""
+
+import argparse
+import contextlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from unifi_mermaid import DEFAULT_OVERRIDE, ConfigError, UniFiToMermaid, configure_logging, load_manifest, logger
+
+
+# Inventory database layout. Every table is keyed by site, so one database
+# holds many sites and reloading a site replaces only its rows.
+INVENTORY_SCHEMA_VERSION = 1
+INVENTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    site TEXT PRIMARY KEY, config_dir TEXT, loaded_at REAL
+);
+CREATE TABLE IF NOT EXISTS networks (
+    site TEXT, id TEXT, name TEXT, vlan INTEGER, subnet TEXT, zone_id TEXT, internet_access INTEGER,
+    PRIMARY KEY (site, id)
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    site TEXT, id TEXT, name TEXT, native_network_id TEXT, tagged_network_ids TEXT,
+    PRIMARY KEY (site, id)
+);
+CREATE TABLE IF NOT EXISTS devices (
+    site TEXT, id TEXT, mac TEXT, type TEXT, name TEXT, model TEXT,
+    parent_id TEXT, parent_port INTEGER, uplink_port INTEGER, depth INTEGER,
+    PRIMARY KEY (site, id)
+);
+CREATE TABLE IF NOT EXISTS ports (
+    site TEXT, device_id TEXT, idx INTEGER, name TEXT, up INTEGER, speed INTEGER,
+    tx_bytes INTEGER, rx_bytes INTEGER, full_duplex INTEGER,
+    profile_id TEXT, profile_name TEXT, network_id TEXT, vlan INTEGER, tagged_networks TEXT,
+    poe INTEGER, poe_mode TEXT, poe_watts REAL, peer_id TEXT,
+    PRIMARY KEY (site, device_id, idx)
+);
+CREATE TABLE IF NOT EXISTS overrides (
+    site TEXT, device_id TEXT, idx INTEGER, name TEXT, portconf_id TEXT, poe_mode TEXT,
+    PRIMARY KEY (site, device_id, idx)
+);
+CREATE TABLE IF NOT EXISTS rules (
+    site TEXT, id TEXT, position INTEGER, ruleset TEXT, rule_index INTEGER, name TEXT, enabled INTEGER,
+    action TEXT, protocol TEXT, src_network_id TEXT, dst_network_id TEXT, src_address TEXT,
+    dst_address TEXT, dst_port TEXT, raw TEXT,
+    PRIMARY KEY (site, id)
+);
+CREATE TABLE IF NOT EXISTS clients (
+    site TEXT, mac TEXT, name TEXT, ip TEXT, fixed_ip TEXT, network_id TEXT, wired INTEGER,
+    sw_mac TEXT, sw_port INTEGER, ap_mac TEXT, online INTEGER,
+    PRIMARY KEY (site, mac)
+);
+CREATE INDEX IF NOT EXISTS devices_mac ON devices (mac);
+CREATE INDEX IF NOT EXISTS ports_vlan ON ports (site, vlan);
+CREATE INDEX IF NOT EXISTS ports_profile ON ports (profile_name);
+CREATE INDEX IF NOT EXISTS ports_poe ON ports (poe_watts) WHERE poe;
+CREATE INDEX IF NOT EXISTS networks_vlan ON networks (site, vlan);
+CREATE INDEX IF NOT EXISTS rules_order ON rules (site, ruleset, rule_index);
+CREATE INDEX IF NOT EXISTS clients_ip ON clients (ip);
+CREATE INDEX IF NOT EXISTS clients_port ON clients (site, sw_mac, sw_port);
+CREATE VIEW IF NOT EXISTS port_inventory AS
+    SELECT ports.site, devices.name AS device, devices.type, ports.idx AS port, ports.name AS port_name,
+           ports.up, ports.speed, ports.profile_name AS profile, ports.vlan, networks.name AS network,
+           ports.poe, ports.poe_mode, ports.poe_watts, peers.name AS connected
+    FROM ports
+    JOIN devices ON devices.site = ports.site AND devices.id = ports.device_id
+    LEFT JOIN networks ON networks.site = ports.site AND networks.id = ports.network_id
+    LEFT JOIN devices AS peers ON peers.site = ports.site AND peers.id = ports.peer_id;
+"""
+INVENTORY_TABLES = ('networks', 'profiles', 'devices', 'ports', 'overrides', 'rules', 'clients')
+
+
+def open_inventory(db_path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) an inventory database"""
+    conn = sqlite3.connect(db_path)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version not in (0, INVENTORY_SCHEMA_VERSION):
+        conn.close()
+        raise ConfigError(f"{db_path} has inventory schema {version}, expected {INVENTORY_SCHEMA_VERSION}")
+    conn.executescript(INVENTORY_SCHEMA)
+    conn.execute(f'PRAGMA user_version = {INVENTORY_SCHEMA_VERSION}')
+    return conn
+
+
+def write_inventory(conn: sqlite3.Connection, parser: UniFiToMermaid, site: str) -> Dict[str, int]:
+    """Replace one site's rows with the loaded model, in a single transaction.
+    
+    Returns the number of rows written per table.
+    """
+    topology = parser.topology
+    rows: Dict[str, List[Tuple]] = {table: [] for table in INVENTORY_TABLES}
+    
+    for network in parser.networks.values():
+        rows['networks'].append((site, network.id, network.name, network.vlan, network.subnet,
+                                 network.zone_id, network.internet_access))
+    for profile in parser.port_profiles.values():
+        rows['profiles'].append((site, profile.id, profile.name, profile.native_network_id,
+                                 ','.join(profile.tagged_network_ids)))
+    for device in parser.devices.values():
+        link = topology.parent_link.get(device.id)
+        parent = link.other(device) if link is not None else None
+        rows['devices'].append((site, device.id, device.mac, device.type, device.label,
+                                device.model, parent.id if parent is not None else None,
+                                link.port_of(parent) if link is not None else None,
+                                topology.uplink_port(device), topology.depth.get(device.id)))
+        for override in device.overrides.values():
+            rows['overrides'].append((site, device.id, override.port_idx, override.name,
+                                      override.portconf_id, override.poe_mode))
+        for port in parser.resolved_ports.get(device.id, ()):
+            override = device.overrides.get(port.idx, DEFAULT_OVERRIDE)
+            profile = parser.port_profiles.get(override.portconf_id)
+            rows['ports'].append((site, device.id, port.idx, port.name, port.up, port.port.speed,
+                                  port.port.tx_bytes, port.port.rx_bytes, port.port.full_duplex,
+                                  override.portconf_id, port.profile_name,
+                                  profile.native_network_id if profile is not None else None, port.vlan,
+                                  ','.join(network.name for network in port.tagged_networks),
+                                  port.port.poe, port.poe_mode if port.port.poe else None, port.poe_watts,
+                                  port.peer.id if port.peer is not None else None))
+    for position, rule in enumerate(parser.firewall_rules):
+        rows['rules'].append((site, rule.get('_id') or f"#{position}", position, rule.get('ruleset'),
+                              rule.get('rule_index'), rule.get('name'), bool(rule.get('enabled', True)),
+                              rule.get('action'), rule.get('protocol'), rule.get('src_networkconf_id'),
+                              rule.get('dst_networkconf_id'), rule.get('src_address'), rule.get('dst_address'),
+                              rule.get('dst_port'), json.dumps(rule, sort_keys=True)))
+    placed = [(network_id, client) for network_id, clients in parser.clients_by_network.items() for client in clients]
+    placed.extend((client.network_id, client) for client in parser.unplaced_clients)
+    for network_id, client in placed:
+        rows['clients'].append((site, client.mac, client.name, client.ip, parser.reserved_ip(client), network_id, client.wired,
+                                client.sw_mac, client.sw_port, client.ap_mac, client.online))
+    
+    with conn:  # One transaction: readers never see a half-loaded site
+        for table in INVENTORY_TABLES:
+            conn.execute(f'DELETE FROM {table} WHERE site = ?', (site,))
+            if rows[table]:
+                placeholders = ', '.join('?' * len(rows[table][0]))
+                conn.executemany(f'INSERT OR REPLACE INTO {table} VALUES ({placeholders})', rows[table])
+        conn.execute('INSERT OR REPLACE INTO sites VALUES (?, ?, ?)', (site, str(parser.config_dir), time.time()))
+    return {table: len(table_rows) for table, table_rows in rows.items()}
+
+
+def inventory_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py inventory',
+                                         description="Load one or more exports into a SQLite inventory database")
+    arg_parser.add_argument('site_dirs', nargs='*', help="Export directories, one per site")
+    arg_parser.add_argument('--manifest', help="JSON manifest listing the sites, as for batch")
+    arg_parser.add_argument('--db', default='inventory.sqlite', help="Database file (default: inventory.sqlite)")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="Stream devices.json one device at a time to bound memory on very large exports")
+    arg_parser.add_argument('--quiet', action='store_true', help="Only report failures")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=True)
+    
+    sites = [{'name': Path(d).resolve().name, 'config_dir': d} for d in args.site_dirs]
+    if args.manifest:
+        sites.extend(load_manifest(Path(args.manifest)))
+    if not sites:
+        arg_parser.error("no sites given; pass site directories or --manifest")
+    
+    # Per-site summaries only; the loader's own status lines stay quiet
+    progress = print if not args.quiet else (lambda *_: None)
+    try:
+        conn = open_inventory(Path(args.db))
+    except ConfigError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    failed = 0
+    with contextlib.closing(conn):
+        for site in sites:
+            parser = UniFiToMermaid(site['config_dir'], stream=args.stream)
+            try:
+                parser.load_configs()
+            except ConfigError as e:
+                logger.error(f"❌ {site['name']}: {e}")
+                failed += 1
+                continue
+            counts = write_inventory(conn, parser, site['name'])
+            progress(f"🗄️  {site['name']}: " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    if failed:
+        sys.exit(1)
+
+
+def query_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(
+        prog='unifi-to-mermaid.py query',
+        description="Query a SQLite inventory: filter the port_inventory view, or run any SQL",
+        epilog="Tables: sites, " + ", ".join(INVENTORY_TABLES) + "; view: port_inventory")
+    arg_parser.add_argument('sql', nargs='?', help="SQL to run instead of the port filters")
+    arg_parser.add_argument('--db', default='inventory.sqlite', help="Database file (default: inventory.sqlite)")
+    arg_parser.add_argument('--site', help="Only this site")
+    arg_parser.add_argument('--device', help="Only ports of this device name")
+    arg_parser.add_argument('--vlan', type=int, help="Only ports whose native VLAN is this tag")
+    arg_parser.add_argument('--profile', help="Only ports using this port profile")
+    arg_parser.add_argument('--min-poe', type=float, metavar='WATTS', help="Only PoE ports drawing more than this")
+    arg_parser.add_argument('--up', action='store_true', help="Only ports with link")
+    arg_parser.add_argument('--json', action='store_true', help="Print JSON rows instead of a Markdown table")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=True)
+    
+    if not Path(args.db).exists():
+        arg_parser.error(f"no inventory at {args.db}; create it with the inventory command")
+    if args.sql:
+        sql, params = args.sql, []
+    else:
+        filters = [('site = ?', args.site), ('device = ?', args.device), ('vlan = ?', args.vlan),
+                   ('profile = ?', args.profile), ('poe AND poe_watts > ?', args.min_poe)]
+        clauses = [clause for clause, value in filters if value is not None]
+        params = [value for _, value in filters if value is not None]
+        if args.up:
+            clauses.append('up')
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM port_inventory{where} ORDER BY site, device, port"
+    
+    with contextlib.closing(sqlite3.connect(Path(args.db).resolve().as_uri() + "?mode=ro", uri=True)) as conn:
+        try:
+            cursor = conn.execute(sql, params)
+        except sqlite3.Error as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        columns = [column[0] for column in cursor.description or ()]
+        rows = cursor.fetchall()
+    
+    if args.json:
+        print(json.dumps([dict(zip(columns, row)) for row in rows], indent=2))
+        return
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for row in rows:
+        print("| " + " | ".join("" if value is None else str(value).replace('|', '\\|') for value in row) + " |")
+    print(f"\n*{len(rows)} rows*")
@@ -0,0 +1,4232 @@
+"""
+UniFi Configuration to Mermaid Diagram Parser
+Converts UniFi API JSON exports to Mermaid diagrams for GitHub documentation.
+
+The library behind unifi-to-mermaid.py. The inventory and serve commands live
+in unifi_inventory.py and unifi_serve.py, imported only when run, as are the
+modules used by a single command (multiprocessing, mmap).
+"""
+
+import argparse
+import array
+import bisect
+import contextlib
+import filecmp
+import hashlib
+import importlib
+import io
+import ipaddress
+import itertools
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import shutil
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Any, Iterator, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger('unifi_to_mermaid')
+
+# Device type groupings used across generators
+GATEWAY_TYPES = ('udm', 'usg', 'ugw')
+SWITCH_TYPES = ('usw', 'switch')
+AP_TYPES = ('uap', 'uap-ac', 'uap-hd', 'uap-pro')
+
+# Export files each section is rendered from. Used to decide which sections
+# need regenerating when only some inputs change, and which files a
+# section-selective run (--only) has to read.
+SECTION_INPUTS = {
+    'physical_topology': ('devices.json',),
+    'logical_topology': ('devices.json', 'networks.json', 'firewall-rules.json',
+                         'connected-clients.json', 'known-clients.json'),
+    'port_mapping': ('devices.json', 'port-profiles.json', 'networks.json', 'connected-clients.json',
+                     'known-clients.json'),
+    'switch_details': ('devices.json', 'port-profiles.json', 'networks.json'),
+    'firewall_matrix': ('networks.json', 'firewall-rules.json', 'firewall-groups.json'),
+}
+
+# Sections whose per-device work can be split across workers, with the
+# device types they cover and whether chunks are separated by a blank line
+SPLIT_SECTIONS = {
+    'port_mapping': (SWITCH_TYPES + GATEWAY_TYPES, False),
+    'switch_details': (SWITCH_TYPES, True),
+}
+
+# Heading and introduction of each section in network-documentation.md
+COMBINED_SECTIONS = [
+    ('physical_topology', "Physical Topology", "Shows actual cable connections and wireless mesh links."),
+    ('logical_topology', "Logical Network", "Shows VLANs, subnets, and logical network segmentation."),
+    ('port_mapping', "Port Mapping", "Detailed port-by-port documentation for cable management."),
+    ('switch_details', "Switch Configuration", None),
+    ('firewall_matrix', "Firewall Rules", None),
+]
+COMBINED_HEADER = "# Network Documentation\n\n*Auto-generated from UniFi Controller configuration*\n\n"
+COMBINED_FOOTER = "---\n*Generated automatically from UniFi configuration*"
+
+
+class ConfigError(Exception):
+    """An export directory is missing required files or holds invalid JSON"""
+
+
+# Export files read by load_configs
+REQUIRED_FILES = ('networks.json', 'devices.json')
+OPTIONAL_FILES = ('port-profiles.json', 'firewall-rules.json', 'firewall-groups.json',
+                  'connected-clients.json', 'known-clients.json')
+# Model attribute each export file is read into
+FILE_ATTRIBUTES = {
+    'networks.json': 'networks',
+    'devices.json': 'devices',
+    'port-profiles.json': 'port_profiles',
+    'firewall-rules.json': 'firewall_rules',
+    'firewall-groups.json': 'firewall_groups',
+    'connected-clients.json': 'clients',
+    'known-clients.json': 'reservations',
+}
+# Build steps run after loading, in dependency order, with their profiler
+# stage names, one attribute each fills in and the export files they read
+BUILD_STEPS = {
+    'build_indexes': ('build_indexes', 'devices_by_mac', ('devices.json',)),
+    'build_topology': ('build_topology', 'topology', ('devices.json',)),
+    'build_firewall_index': ('compile_firewall', 'firewall',
+                             ('networks.json', 'firewall-rules.json', 'firewall-groups.json')),
+    'place_clients': ('place_clients', 'clients_by_network',
+                      ('networks.json', 'connected-clients.json', 'known-clients.json')),
+    'resolve_ports': ('resolve_ports', 'resolved_ports', ('devices.json', 'port-profiles.json', 'networks.json')),
+    'index_hosts': ('index_hosts', 'hosts_by_key', ('networks.json', 'connected-clients.json', 'known-clients.json')),
+}
+
+# Binary cache of the loaded model, one file per export directory under the
+# user's cache directory, so a pickle dropped into an export is never loaded
+SNAPSHOT_CACHE_DIR = ('unifi-to-mermaid', 'snapshots')
+SNAPSHOT_CACHE_VERSION = 2
+# Parser attributes that are run options rather than loaded state
+SNAPSHOT_RUN_OPTIONS = ('config_dir', 'stream', 'profiler', 'node_budget', 'snapshot_cache', 'port_stats')
+
+# Networks with more hosts than this show one summary node in the logical diagram
+CLIENT_DETAIL_LIMIT = 8
+# Wired clients listed per port in the port mapping before "+N more"
+PORT_CLIENT_LIMIT = 3
+# Most nodes per Mermaid graph before detail is collapsed; GitHub's renderer
+# times out a few hundred nodes in
+MERMAID_NODE_BUDGET = 200
+
+# Sections drawn as graphs, which --graph-formats also writes to GRAPHS_DIR
+GRAPH_SECTIONS = ('physical_topology', 'logical_topology', 'switch_details')
+GRAPHS_DIR = 'graphs'
+
+# Export files the per-device pages are rendered from
+DEVICE_PAGE_INPUTS = ('devices.json', 'port-profiles.json', 'networks.json', 'connected-clients.json',
+                      'known-clients.json')
+DEVICE_PAGES_DIR = 'devices'
+
+# Controller event-stream messages LiveDocumentation applies: device and
+# client records to merge, and the events that mean a client has left
+LIVE_DEVICE_MESSAGES = ('device:sync', 'device:update')
+LIVE_CLIENT_MESSAGES = ('sta:sync',)
+CLIENT_LEAVE_EVENTS = ('EVT_WU_Disconnected', 'EVT_WG_Disconnected', 'EVT_LU_Disconnected', 'EVT_LG_Disconnected')
+
+
+# Characters that may continue a JSON number, running to the end of the buffer
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+
+class _JSONStream:
+    """Minimal pull reader over a JSON file, decoding one value at a time"""
+    
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self) -> bool:
+        """Read more input, dropping the consumed prefix. Returns False at EOF."""
+        if self.eof:
+            return False
+        # Read at least as much as is pending so a large value is retried
+        # a logarithmic number of times rather than once per chunk
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+    
+    def next_char(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+    
+    def expect(self, chars: str) -> str:
+        char = self.next_char()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buf, self.pos - 1)
+        return char
+    
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the buffer edge may continue in the next chunk, also
+            # when cut after its digits: "-0." and "5e" decode as 0 and 5
+            if _NUMBER_TAIL.match(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(path: Path, key: str = 'data', chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the elements of a JSON array one at a time without loading the file.
+    
+    Handles both UniFi API responses ({"meta": ..., "data": [...]}), streaming
+    the array under `key`, and files that are a bare top-level array.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        stream = _JSONStream(f, chunk_size)
+        
+        def elements():
+            if stream.peek() == ']':
+                stream.next_char()
+                return
+            while True:
+                yield stream.decode(decoder)
+                if stream.expect(',]') == ']':
+                    return
+        
+        if stream.expect('{[') == '[':
+            yield from elements()
+            return
+        
+        if stream.peek() == '}':
+            return
+        while True:
+            name = stream.decode(decoder)
+            stream.expect(':')
+            if name == key:
+                stream.expect('[')
+                yield from elements()
+            else:
+                stream.decode(decoder)  # Skip values such as "meta"
+            if stream.expect(',}') == '}':
+                return
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, if the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def configure_logging(quiet: bool = False, verbose: bool = False):
+    """Send this module's log records to stdout as plain status lines"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.WARNING if quiet else logging.DEBUG if verbose else logging.INFO)
+
+
+@contextlib.contextmanager
+def capture_log() -> Iterator[io.StringIO]:
+    """Temporarily route this module's log records into a buffer"""
+    buffer = io.StringIO()
+    handler = logging.StreamHandler(buffer)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    saved = logger.handlers[:]
+    logger.handlers[:] = [handler]
+    try:
+        yield buffer
+    finally:
+        logger.handlers[:] = saved
+
+
+class StageProfiler:
+    """Wall time, CPU time, memory and item counts for each load and render stage.
+    
+    Memory is the process's peak resident set size, which is cheap to read;
+    rss_growth_mb is how far a stage pushed that high-water mark.
+    """
+    
+    def __init__(self):
+        self.stages: List[Dict[str, Any]] = []
+        self.wall_started = time.perf_counter()
+        self.cpu_started = time.process_time()
+    
+    @contextlib.contextmanager
+    def stage(self, name: str, items: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Time the enclosed block; set record['items'] inside it to report a count"""
+        record = {'name': name, 'items': items}
+        rss_before = peak_memory_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu, 6)
+            rss_after = peak_memory_mb()
+            record['peak_rss_mb'] = round(rss_after, 1) if rss_after is not None else None
+            record['rss_growth_mb'] = round(rss_after - rss_before, 1) if rss_after is not None else None
+            self.stages.append(record)
+    
+    def iter_sections(self, sections: Iterator[Tuple[str, Iterator[str]]]) -> Iterator[Tuple[str, Iterator[str]]]:
+        """Wrap iter_sections() output so each section is timed as it is consumed"""
+        for name, lines in sections:
+            yield name, self._timed_lines(f'render {name}', lines)
+    
+    def _timed_lines(self, name: str, lines: Iterator[str]) -> Iterator[str]:
+        # Includes writing, since sections stream straight into their files
+        with self.stage(name) as record:
+            count = 0
+            for line in lines:
+                count += line.count('\n') + 1  # Parallel chunks hold many lines
+                yield line
+            record['items'] = count
+    
+    def report(self, **context) -> Dict[str, Any]:
+        """The whole run plus every stage, ready for json.dump"""
+        peak = peak_memory_mb()
+        times = os.times()
+        return {
+            **context,
+            'wall_seconds': round(time.perf_counter() - self.wall_started, 6),
+            'cpu_seconds': round(time.process_time() - self.cpu_started, 6),
+            'children_cpu_seconds': round(times.children_user + times.children_system, 6),
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+            'stages': self.stages,
+        }
+
+
+def _to_float(value: Any) -> float:
+    """Coerce a controller number that may arrive as a string; invalid values become 0"""
+    try:
+        return float(value) if value else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+# Normalized record layer. Raw controller dicts are converted once at load so
+# generators read plain attributes instead of repeated .get() chains, and the
+# dozens of counters we never render are dropped.
+
+class Port:
+    """One entry of a device's port_table"""
+    __slots__ = ('idx', 'up', 'speed', 'tx_bytes', 'rx_bytes', 'poe', 'poe_power', 'full_duplex')
+    
+    def __init__(self, port: Dict[str, Any]):
+        self.idx = port.get('port_idx')
+        self.up = bool(port.get('up', False))
+        self.speed = port.get('speed') or 0
+        self.tx_bytes = port.get('tx_bytes') or 0
+        self.rx_bytes = port.get('rx_bytes') or 0
+        self.poe = bool(port.get('port_poe', False))
+        self.poe_power = _to_float(port.get('poe_power'))
+        self.full_duplex = bool(port.get('full_duplex', False))
+    
+    @property
+    def has_traffic(self) -> bool:
+        return self.tx_bytes > 0 or self.rx_bytes > 0
+
+
+class PortOverride:
+    """Per-port configuration from a device's port_overrides"""
+    __slots__ = ('port_idx', 'name', 'portconf_id', 'poe_mode')
+    
+    def __init__(self, override: Dict[str, Any]):
+        self.port_idx = override.get('port_idx')
+        self.name: Optional[str] = override.get('name')
+        self.portconf_id: Optional[str] = override.get('portconf_id')
+        self.poe_mode: str = override.get('poe_mode', 'auto')
+
+
+# Stands in for ports without a port_overrides entry
+DEFAULT_OVERRIDE = PortOverride({})
+
+
+def _lldp_port(port_id: Any) -> Optional[int]:
+    """Port index from an LLDP port_id such as 5, "5" or "Port 5"; None for names like eth0"""
+    if isinstance(port_id, int):
+        return port_id
+    match = re.fullmatch(r'(?:port\s*)?(\d+)', str(port_id or '').strip(), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+class Device:
+    """A UniFi device (gateway, switch or access point) from /stat/device"""
+    __slots__ = ('id', 'mac', 'type', 'name', 'model', 'label', 'uplink_type', 'uplink_mac',
+                 'uplink_remote_port', 'uplink_port', 'lldp', 'ports', 'overrides')
+    
+    def __init__(self, device: Dict[str, Any]):
+        self.id: str = device['_id']
+        # Lower case, as clients and LLDP neighbours report MACs
+        self.mac: Optional[str] = (device.get('mac') or '').lower() or None
+        self.type: str = device.get('type') or ''
+        self.name: Optional[str] = device.get('name')
+        self.model: str = device.get('model') or ''
+        # Display name used throughout the docs
+        self.label: str = self.name if self.name is not None else (self.model or 'Unknown')
+        
+        uplink = device.get('uplink') or {}
+        self.uplink_type: str = uplink.get('type', 'unknown')
+        self.uplink_mac: Optional[str] = (uplink.get('uplink_mac') or '').lower() or None
+        self.uplink_remote_port = uplink.get('uplink_remote_port')
+        # This device's own port the uplink leaves from, when reported
+        self.uplink_port = uplink.get('port_idx')
+        
+        # LLDP neighbors as (local port, neighbor MAC, neighbor port)
+        self.lldp: Tuple[Tuple[Any, str, Optional[int]], ...] = tuple(
+            (entry.get('local_port_idx'), entry['chassis_id'].lower(), _lldp_port(entry.get('port_id')))
+            for entry in device.get('lldp_table') or () if entry.get('chassis_id'))
+        
+        self.ports: List[Port] = [Port(port) for port in device.get('port_table', [])]
+        
+        # Keyed by port index; later entries win like the controller UI
+        self.overrides: Dict[int, PortOverride] = {}
+        for override in device.get('port_overrides', []):
+            record = PortOverride(override)
+            if record.port_idx:
+                self.overrides[record.port_idx] = record
+    
+    def update(self, device: Dict[str, Any]):
+        """Re-read every field from a newer record of this device, in place,
+        so the topology and port tables that refer to it stay valid
+        """
+        self.__init__(device)
+
+
+class Link:
+    """One physical connection between two devices, with the port at each end if known"""
+    __slots__ = ('a', 'a_port', 'b', 'b_port', 'wireless')
+    
+    def __init__(self, a: Device, a_port: Any, b: Device, b_port: Any, wireless: bool):
+        self.a, self.a_port = a, a_port
+        self.b, self.b_port = b, b_port
+        self.wireless = wireless
+    
+    def other(self, device: Device) -> Device:
+        return self.b if device is self.a else self.a
+    
+    def port_of(self, device: Device) -> Any:
+        return self.a_port if device is self.a else self.b_port
+
+
+class TopologyGraph:
+    """Physical adjacency built from each device's uplink block and LLDP table.
+    
+    The graph is walked breadth-first from the gateways, so every reachable
+    device gets a parent link and a depth. A link between two devices that
+    were both already reached closes a loop and is kept in loop_links.
+    Devices that cannot be reached from a gateway are walked as their own
+    components, rooted at the first such device in load order. Building and
+    walking are linear in devices plus links.
+    """
+    
+    def __init__(self, devices: List[Device], devices_by_mac: Dict[str, Device], roots: List[Device]):
+        self.links: List[Link] = []
+        self.adjacency: Dict[str, List[Link]] = {}
+        # (device id, port index) -> device on the other end of that port
+        self.port_peers: Dict[Tuple[str, Any], Device] = {}
+        self._pairs: Dict[Tuple[str, str], Link] = {}
+        
+        # Controller-reported uplinks first, so they win over LLDP for each pair
+        for device in devices:
+            parent = devices_by_mac.get(device.uplink_mac) if device.uplink_mac else None
+            if parent is not None and parent is not device:
+                self._connect(device, device.uplink_port, parent, device.uplink_remote_port,
+                              wireless=device.uplink_type == 'wireless')
+        for device in devices:
+            for local_port, neighbor_mac, neighbor_port in device.lldp:
+                neighbor = devices_by_mac.get(neighbor_mac)
+                if neighbor is not None and neighbor is not device:
+                    self._connect(device, local_port, neighbor, neighbor_port, wireless=False)
+        
+        self.parent_link: Dict[str, Link] = {}
+        self.children: Dict[str, List[Device]] = {}
+        self.depth: Dict[str, int] = {}
+        self.order: List[Device] = []
+        self.loop_links: List[Link] = []
+        # Devices walked as the top of a component no gateway reaches
+        self.component_roots: List[Device] = []
+        self._walk(roots)
+        for device in devices:
+            if device.id not in self.depth:
+                self.component_roots.append(device)
+                self._walk([device])
+    
+    def _connect(self, a: Device, a_port: Any, b: Device, b_port: Any, wireless: bool):
+        key = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+        link = self._pairs.get(key)
+        if link is None:
+            link = self._pairs[key] = Link(a, a_port, b, b_port, wireless)
+            self.links.append(link)
+            self.adjacency.setdefault(a.id, []).append(link)
+            self.adjacency.setdefault(b.id, []).append(link)
+        else:
+            # Fill in ends the earlier source did not report
+            if link.a is a:
+                link.a_port = link.a_port if link.a_port is not None else a_port
+                link.b_port = link.b_port if link.b_port is not None else b_port
+            else:
+                link.a_port = link.a_port if link.a_port is not None else b_port
+                link.b_port = link.b_port if link.b_port is not None else a_port
+        # Every observed port keeps its first peer, including parallel links
+        if a_port is not None:
+            self.port_peers.setdefault((a.id, a_port), b)
+        if b_port is not None:
+            self.port_peers.setdefault((b.id, b_port), a)
+    
+    def _walk(self, roots: List[Device]):
+        queue = deque()
+        for root in roots:
+            if root.id not in self.depth:
+                self.depth[root.id] = 0
+                self.order.append(root)
+                queue.append(root)
+        closing = set()
+        while queue:
+            device = queue.popleft()
+            parent_link = self.parent_link.get(device.id)
+            for link in self.adjacency.get(device.id, ()):
+                if link is parent_link:
+                    continue
+                peer = link.other(device)
+                if peer.id not in self.depth:
+                    self.parent_link[peer.id] = link
+                    self.children.setdefault(device.id, []).append(peer)
+                    self.depth[peer.id] = self.depth[device.id] + 1
+                    self.order.append(peer)
+                    queue.append(peer)
+                elif id(link) not in closing:
+                    # Seen from both ends; record each loop link once
+                    closing.add(id(link))
+                    self.loop_links.append(link)
+    
+    def parent(self, device: Device) -> Optional[Device]:
+        link = self.parent_link.get(device.id)
+        return link.other(device) if link is not None else None
+    
+    def uplink_port(self, device: Device) -> Any:
+        """This device's own port towards its parent, if known"""
+        link = self.parent_link.get(device.id)
+        return link.port_of(device) if link is not None else None
+    
+    def subtree(self, root: Device) -> List[Device]:
+        """The root and every device below it, breadth-first"""
+        order = [root]
+        for device in order:
+            order.extend(self.children.get(device.id, ()))
+        return order
+
+
+class Network:
+    """A network/VLAN from /rest/networkconf"""
+    __slots__ = ('id', 'name', 'vlan', 'subnet', 'zone_id', 'internet_access')
+    
+    def __init__(self, network: Dict[str, Any]):
+        self.id: str = network['_id']
+        self.name: str = network.get('name', 'Unknown')
+        self.vlan = network.get('vlan')
+        self.subnet: str = network.get('ip_subnet', 'N/A')
+        self.zone_id: str = network.get('firewall_zone_id', 'No Zone')
+        self.internet_access: bool = network.get('internet_access_enabled', True)
+    
+    @property
+    def vlan_tag(self):
+        """VLAN number with untagged networks reported as VLAN 1"""
+        return self.vlan if self.vlan is not None else 1
+
+
+class PortProfile:
+    """A switch port profile from /rest/portconf"""
+    __slots__ = ('id', 'name', 'native_network_id', 'tagged_network_ids')
+    
+    def __init__(self, profile: Dict[str, Any]):
+        self.id: str = profile['_id']
+        self.name: Optional[str] = profile.get('name')
+        self.native_network_id: Optional[str] = profile.get('native_networkconf_id')
+        self.tagged_network_ids: List[str] = profile.get('tagged_networkconf_ids') or []
+
+
+class Client:
+    """A host from /stat/sta (connected) or /rest/user (known, with any DHCP reservation)"""
+    __slots__ = ('mac', 'name', 'ip', 'fixed_ip', 'network_id', 'wired', 'sw_mac', 'sw_port', 'ap_mac', 'online')
+    
+    def __init__(self, client: Dict[str, Any], online: bool = True):
+        self.mac: str = (client.get('mac') or '').lower()
+        self.name: str = client.get('name') or client.get('hostname') or self.mac
+        self.ip: Optional[str] = client.get('ip')
+        self.fixed_ip: Optional[str] = client.get('fixed_ip') if client.get('use_fixedip') else None
+        self.network_id: Optional[str] = client.get('network_id')
+        self.wired = bool(client.get('is_wired', False))
+        self.sw_mac: Optional[str] = (client.get('sw_mac') or '').lower() or None
+        self.sw_port = client.get('sw_port')
+        self.ap_mac: Optional[str] = (client.get('ap_mac') or '').lower() or None
+        self.online = online
+
+
+class PrefixIndex:
+    """Longest-prefix match from IP addresses to networks.
+    
+    Prefixes live in one hash table per IP version and prefix length. A
+    lookup probes the lengths present from longest to shortest, so it costs a
+    handful of dict lookups however many networks there are.
+    """
+    
+    def __init__(self, networks):
+        self.tables: Dict[int, Dict[int, Dict[int, Network]]] = {4: {}, 6: {}}
+        for network in networks:
+            try:
+                subnet = ipaddress.ip_network(network.subnet, strict=False)
+            except ValueError:
+                continue
+            # First network wins when two share a prefix
+            self.tables[subnet.version].setdefault(subnet.prefixlen, {}).setdefault(
+                int(subnet.network_address), network)
+        self.lengths = {version: sorted(table, reverse=True) for version, table in self.tables.items()}
+    
+    def lookup(self, address: Optional[str]) -> Optional[Network]:
+        """The most specific network containing address, or None"""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        value, bits = int(ip), ip.max_prefixlen
+        tables = self.tables[ip.version]
+        for length in self.lengths[ip.version]:
+            shift = bits - length
+            network = tables[length].get(value >> shift << shift)
+            if network is not None:
+                return network
+        return None
+
+
+def _address_key(address: Optional[str]) -> Tuple[int, int]:
+    """Sort key ordering hosts numerically by IP, hosts without one last"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return (1, 0)
+    return (0, int(ip))
+
+
+def _client_list(clients: List[Client], address: Callable[[Client], Optional[str]]) -> str:
+    """Port mapping cell listing wired clients as name (IP, MAC)"""
+    shown = [f"{client.name} ({address(client) or 'No IP'}, {client.mac})".replace('|', '\\|')
+             for client in clients[:PORT_CLIENT_LIMIT]]
+    if len(clients) > PORT_CLIENT_LIMIT:
+        shown.append(f"+{len(clients) - PORT_CLIENT_LIMIT} more")
+    return "<br>".join(shown)
+
+
+def _mermaid_text(text: str) -> str:
+    """Escape user-entered names for a quoted Mermaid label"""
+    return str(text).replace('"', '#quot;')
+
+
+def _device_kind(device: Device) -> str:
+    """Kind a device is counted as when collapsed in a topology diagram"""
+    if device.type in SWITCH_TYPES:
+        return 'switch'
+    if device.type in AP_TYPES:
+        return 'mesh' if device.uplink_type == 'wireless' else 'ap'
+    return 'other'
+
+
+def _plural(count: int, noun: str, plural: Optional[str] = None) -> str:
+    return f"{count} {noun if count == 1 else (plural or noun + 's')}"
+
+
+def _collapsed_label(kinds: Counter) -> str:
+    """Label of an aggregate node, such as ➕ 2 switches and 37 APs (5 mesh) on two lines"""
+    parts = []
+    if kinds['switch']:
+        parts.append(_plural(kinds['switch'], 'switch', 'switches'))
+    aps = kinds['ap'] + kinds['mesh']
+    if aps:
+        mesh = f" ({kinds['mesh']} mesh)" if kinds['mesh'] else ""
+        parts.append(_plural(aps, 'AP') + mesh)
+    if kinds['other']:
+        parts.append(_plural(kinds['other'], 'other device'))
+    return "➕ " + "\n".join(parts)
+
+
+# Diagrams are built as a Graph and then rendered, so the same model can be
+# written as Mermaid inside the Markdown, or as DOT or JSON for offline layout
+# and other tools. Node labels separate their lines with newlines.
+
+class GraphNode:
+    """A diagram node; `kind` and `data` describe what it stands for"""
+    __slots__ = ('id', 'label', 'kind', 'group', 'inline', 'data')
+    
+    def __init__(self, node_id: str, label: str, kind: str, group: Optional['GraphGroup'] = None,
+                 inline: bool = False, data: Optional[Dict[str, Any]] = None):
+        self.id = node_id
+        self.label = label
+        self.kind = kind
+        self.group = group
+        # Declared in the edges that reach it rather than on its own line
+        self.inline = inline
+        self.data = data or {}
+
+
+class GraphEdge:
+    """A diagram edge; undirected edges are drawn without an arrowhead"""
+    __slots__ = ('source', 'target', 'label', 'dashed', 'directed')
+    
+    def __init__(self, source: str, target: str, label: Optional[str] = None,
+                 dashed: bool = False, directed: bool = True):
+        self.source, self.target = source, target
+        self.label = label
+        self.dashed = dashed
+        self.directed = directed
+
+
+class GraphGroup:
+    """A box of nodes, such as one switch's ports; the id may be None"""
+    __slots__ = ('id', 'label', 'items')
+    
+    def __init__(self, group_id: Optional[str], label: str):
+        self.id = group_id
+        self.label = label
+        self.items: List[GraphNode] = []
+
+
+class Graph:
+    """One diagram's nodes, edges and groups, independent of the output format.
+    
+    Items keep the order they were added in, which the Mermaid renderer
+    follows line by line.
+    """
+    
+    def __init__(self, name: str, direction: str = 'TD'):
+        self.name = name
+        self.direction = direction
+        self.items: List[Any] = []
+        self.nodes: Dict[str, GraphNode] = {}
+        self.edges: List[GraphEdge] = []
+        self.groups: List[GraphGroup] = []
+    
+    def node(self, node_id: str, label: str, kind: str, group: Optional[GraphGroup] = None,
+             inline: bool = False, **data) -> GraphNode:
+        node = GraphNode(node_id, label, kind, group, inline, data)
+        self.nodes[node_id] = node
+        if group is not None:
+            group.items.append(node)
+        elif not inline:
+            self.items.append(node)
+        return node
+    
+    def edge(self, source: str, target: str, label: Optional[str] = None,
+             dashed: bool = False, directed: bool = True) -> GraphEdge:
+        edge = GraphEdge(source, target, label, dashed, directed)
+        self.edges.append(edge)
+        self.items.append(edge)
+        return edge
+    
+    def group(self, group_id: Optional[str], label: str) -> GraphGroup:
+        group = GraphGroup(group_id, label)
+        self.groups.append(group)
+        self.items.append(group)
+        return group
+
+
+def render_mermaid(graph: Graph) -> Iterator[str]:
+    """Yield a Mermaid flowchart of the graph, without the code fence"""
+    yield f"graph {graph.direction}"
+    
+    def node_line(node: GraphNode) -> str:
+        return f'{node.id}["{_mermaid_text(node.label).replace(chr(10), "<br/>")}"]'
+    
+    def endpoint(node_id: str) -> str:
+        node = graph.nodes.get(node_id)
+        if node is None:
+            return node_id
+        if node.inline:
+            return node_line(node)
+        if node.group is not None and node.group.id is not None:
+            return f"{node.group.id}.{node_id}"  # Edges are drawn outside the groups
+        return node_id
+    
+    for item in graph.items:
+        if isinstance(item, GraphNode):
+            yield f"    {node_line(item)}"
+        elif isinstance(item, GraphEdge):
+            line = ('-.-' if item.dashed else '---') if not item.directed else ('-.->' if item.dashed else '-->')
+            if item.label is not None:
+                line += f'|"{_mermaid_text(item.label)}"|'
+            yield f"    {endpoint(item.source)} {line} {endpoint(item.target)}"
+        else:
+            title = f'"{_mermaid_text(item.label)}"'
+            yield f"    subgraph {item.id}[{title}]" if item.id is not None else f"    subgraph {title}"
+            for node in item.items:
+                yield f"        {node_line(node)}"
+            yield "    end"
+
+
+def _dot_text(text: str) -> str:
+    return '"' + str(text).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+def render_dot(graph: Graph) -> Iterator[str]:
+    """Yield a Graphviz digraph of the graph, for dot or sfdp"""
+    yield f"digraph {_dot_text(graph.name)} {{"
+    yield f"    rankdir={'LR' if graph.direction == 'LR' else 'TB'};"
+    yield '    node [shape=box, style=rounded, fontname="Helvetica"];'
+    yield '    edge [fontname="Helvetica", fontsize=10];'
+    for position, group in enumerate(graph.groups):
+        yield f"    subgraph {_dot_text(f'cluster_{group.id or position}')} {{"
+        yield f"        label={_dot_text(group.label)};"
+        for node in group.items:
+            yield f"        {_dot_text(node.id)} [label={_dot_text(node.label)}];"
+        yield "    }"
+    for node in graph.nodes.values():
+        if node.group is None:
+            yield f"    {_dot_text(node.id)} [label={_dot_text(node.label)}];"
+    for edge in graph.edges:
+        attributes = []
+        if edge.label is not None:
+            attributes.append(f"label={_dot_text(edge.label)}")
+        if edge.dashed:
+            attributes.append("style=dashed")
+        if not edge.directed:
+            attributes.append("arrowhead=none")
+        attributes = f" [{', '.join(attributes)}]" if attributes else ""
+        yield f"    {_dot_text(edge.source)} -> {_dot_text(edge.target)}{attributes};"
+    yield "}"
+
+
+def graph_dict(graph: Graph) -> Dict[str, Any]:
+    """The graph as plain nodes, edges and groups, ready for json.dump"""
+    groups = {id(group): group.id or f"group{position}" for position, group in enumerate(graph.groups)}
+    return {
+        'name': graph.name,
+        'direction': graph.direction,
+        'groups': [{'id': groups[id(group)], 'label': group.label} for group in graph.groups],
+        'nodes': [{'id': node.id, 'label': node.label, 'kind': node.kind,
+                   'group': groups[id(node.group)] if node.group is not None else None, **node.data}
+                  for node in graph.nodes.values()],
+        'edges': [{'source': edge.source, 'target': edge.target, 'label': edge.label,
+                   'dashed': edge.dashed, 'directed': edge.directed} for edge in graph.edges],
+    }
+
+
+def _dot_file(graphs: List[Graph]) -> Iterator[str]:
+    for graph in graphs:
+        yield from render_dot(graph)
+
+
+def _json_file(graphs: List[Graph]) -> Iterator[str]:
+    yield json.dumps({'graphs': [graph_dict(graph) for graph in graphs]}, indent=1, ensure_ascii=False)
+
+
+# Offline graph formats, by name: file extension and renderer of a section's graphs
+GRAPH_FORMATS = {
+    'dot': ('.dot', _dot_file),
+    'json': ('.json', _json_file),
+}
+
+
+class ResolvedPort:
+    """A port with its override, profile, VLAN, PoE and link peer resolved.
+    
+    Built once per run by UniFiToMermaid.resolve_ports() and shared by every
+    section renderer.
+    """
+    __slots__ = ('port', 'idx', 'name', 'custom_name', 'has_profile', 'profile_name', 'vlan', 'vlan_label',
+                 'tagged_networks', 'poe_mode', 'poe_watts', 'peer')
+    
+    def __init__(self, port: Port, override: PortOverride, profile: Optional[PortProfile],
+                 native_network: Optional[Network], tagged_networks: List[Network],
+                 peer: Optional[Device]):
+        self.port = port
+        self.idx = port.idx
+        self.custom_name: Optional[str] = override.name
+        self.name: str = override.name if override.name is not None else f'Port {port.idx}'
+        # Whether the port has a (known) profile, and its name; unnamed
+        # profiles are labelled by each section in its own way
+        self.has_profile = profile is not None
+        self.profile_name: Optional[str] = profile.name if profile is not None else None
+        self.vlan = native_network.vlan_tag if native_network is not None else None
+        self.vlan_label: str = f"VLAN {self.vlan}" if self.vlan is not None else "Default"
+        self.tagged_networks = tagged_networks
+        self.poe_mode: str = override.poe_mode
+        self.poe_watts: float = port.poe_power if port.poe else 0.0
+        # Device on the other end of this port, from the topology graph
+        self.peer = peer
+    
+    @property
+    def up(self) -> bool:
+        return self.port.up
+
+
+class PathHop:
+    """One device on a host's path to the gateway, with the port the path
+    arrives on and the uplink port it leaves by (None where not known)
+    """
+    __slots__ = ('device', 'port_idx', 'port', 'uplink_idx', 'uplink', 'wireless')
+    
+    def __init__(self, device: Device, port_idx: Any, port: Optional[ResolvedPort],
+                 uplink_idx: Any, uplink: Optional[ResolvedPort], wireless: bool):
+        self.device = device
+        self.port_idx, self.port = port_idx, port
+        self.uplink_idx, self.uplink = uplink_idx, uplink
+        # Arrived over Wi-Fi: the host's own association or a mesh uplink
+        self.wireless = wireless
+
+
+class HostPath:
+    """A host, the network it was placed in and its hops from the first
+    switch port or AP up to the gateway
+    """
+    __slots__ = ('host', 'address', 'network', 'hops')
+    
+    def __init__(self, host: Client, address: Optional[str], network: Optional[Network], hops: List[PathHop]):
+        self.host = host
+        self.address = address
+        self.network = network
+        self.hops = hops
+    
+    @property
+    def complete(self) -> bool:
+        """Whether the path reaches a gateway"""
+        return bool(self.hops) and self.hops[-1].device.type in GATEWAY_TYPES
+
+
+# Firewall compilation. Rules are evaluated like the gateway does: enabled
+# rules in ruleset and rule_index order, first match wins. Networks are bit
+# positions, so one rule updates a whole row of destinations in a single
+# integer operation.
+
+# Port numbers a rule can match
+PORT_MIN, PORT_MAX = 1, 65535
+# Protocols whose rules can name ports; 'other' stands for anything unnamed
+PORT_PROTOCOLS = ('tcp', 'udp')
+OTHER_PROTOCOL = 'other'
+ALLOW_ACTIONS = ('accept', 'allow')
+# Rulesets that filter traffic between internal networks, in evaluation order
+INTERNETWORK_RULESETS = ('LAN_IN', 'GUEST_IN')
+# What the gateway does with inter-network traffic no rule matches
+DEFAULT_FIREWALL_ACTION = 'accept'
+
+
+class PortSet:
+    """Sorted, merged, inclusive port intervals"""
+    __slots__ = ('intervals', '_starts')
+    
+    def __init__(self, intervals):
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        self.intervals: Tuple[Tuple[int, int], ...] = tuple(merged)
+        self._starts = [lo for lo, _ in merged]
+    
+    @classmethod
+    def parse(cls, specs) -> 'PortSet':
+        """Parse port specs such as "22", "8000-8100" or "5000,5001"; unparsable parts are skipped"""
+        intervals = []
+        for spec in specs:
+            for part in str(spec).split(','):
+                lo, _, hi = part.strip().partition('-')
+                try:
+                    lo_port = int(lo)
+                    hi_port = int(hi) if hi else lo_port
+                except ValueError:
+                    continue
+                if PORT_MIN <= lo_port <= hi_port <= PORT_MAX:
+                    intervals.append((lo_port, hi_port))
+        return cls(intervals)
+    
+    def __contains__(self, port: int) -> bool:
+        position = bisect.bisect_right(self._starts, port) - 1
+        return position >= 0 and port <= self.intervals[position][1]
+    
+    def __bool__(self) -> bool:
+        return bool(self.intervals)
+    
+    @property
+    def is_all(self) -> bool:
+        return self.intervals == ((PORT_MIN, PORT_MAX),)
+    
+    def __str__(self) -> str:
+        if self.is_all:
+            return "Any"
+        return ','.join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in self.intervals)
+
+
+ALL_PORTS = PortSet([(PORT_MIN, PORT_MAX)])
+
+
+class FirewallRule:
+    """One enabled rule with its networks, groups and ports resolved"""
+    __slots__ = ('id', 'name', 'ruleset', 'rule_index', 'action', 'allow', 'protocols', 'protocol_excepted',
+                 'protocol_label', 'src_mask', 'dst_mask', 'ports', 'partial', 'source', 'destination')
+    
+    def __init__(self, rule: Dict[str, Any]):
+        self.id: str = rule.get('_id', '')
+        self.name: str = rule.get('name') or self.id
+        self.ruleset: str = rule.get('ruleset', INTERNETWORK_RULESETS[0])
+        self.rule_index: int = rule.get('rule_index') or 0
+        self.action: str = (rule.get('action') or 'accept').lower()
+        self.allow = self.action in ALLOW_ACTIONS
+        
+        protocol = (rule.get('protocol') or 'all').lower()
+        self.protocol_label = f"not {protocol}" if rule.get('protocol_match_excepted') else protocol
+        if protocol == 'all':
+            self.protocols, self.protocol_excepted = frozenset(), True
+        elif protocol == 'tcp_udp':
+            self.protocols, self.protocol_excepted = frozenset(PORT_PROTOCOLS), False
+        else:
+            self.protocols, self.protocol_excepted = frozenset((protocol,)), False
+        if rule.get('protocol_match_excepted'):
+            self.protocol_excepted = not self.protocol_excepted
+        
+        # Filled in by FirewallIndex, which knows the networks and groups
+        self.src_mask = self.dst_mask = 0
+        self.ports = ALL_PORTS
+        self.partial = False
+        self.source = self.destination = "Any"
+    
+    def matches_protocol(self, protocol: str) -> bool:
+        return (protocol in self.protocols) != self.protocol_excepted
+
+
+class FirewallService:
+    """A protocol and port range every rule treats the same way.
+    
+    allowed[i] is the bitset of destination networks network i may reach;
+    conditional[i] marks destinations where some hosts match host-level rules.
+    """
+    __slots__ = ('protocol', 'lo', 'hi', 'allowed', 'conditional')
+    
+    def __init__(self, protocol: str, lo: Optional[int], hi: Optional[int],
+                 allowed: List[int], conditional: List[int]):
+        self.protocol = protocol
+        self.lo, self.hi = lo, hi
+        self.allowed = allowed
+        self.conditional = conditional
+
+
+def _service_label(protocol: str, lo: Optional[int], hi: Optional[int]) -> str:
+    if lo is None or (lo, hi) == (PORT_MIN, PORT_MAX):
+        return protocol
+    return f"{protocol}/{lo}" if lo == hi else f"{protocol}/{lo}-{hi}"
+
+
+class FirewallIndex:
+    """Compiled inter-network firewall policy.
+    
+    Address and port groups are expanded, ports become interval sets and
+    rules keep first-match order. The port space of each protocol is cut at
+    every rule boundary, and each resulting service is evaluated once for all
+    source and destination networks, giving the full network x network x
+    service reachability matrix. Rules on addresses narrower than a whole
+    network cannot decide a network-level verdict; they mark the cells they
+    touch as conditional instead.
+    """
+    
+    def __init__(self, networks: List[Network], rules: List[Dict[str, Any]], groups: Dict[str, Dict[str, Any]],
+                 default_action: str = DEFAULT_FIREWALL_ACTION):
+        self.networks = networks
+        self.position = {network.id: i for i, network in enumerate(networks)}
+        self.by_name = {}
+        for network in networks:
+            self.by_name.setdefault(network.name, network.id)
+        self.full_mask = (1 << len(networks)) - 1
+        self.default_allow = default_action in ALLOW_ACTIONS
+        self._subnets = []
+        for network in networks:
+            try:
+                self._subnets.append(ipaddress.ip_network(network.subnet, strict=False))
+            except ValueError:
+                self._subnets.append(None)
+        
+        ruleset_order = {name: i for i, name in enumerate(INTERNETWORK_RULESETS)}
+        selected = []
+        for i, rule in enumerate(rules):
+            # Rules without a ruleset are LAN_IN rules, for filtering and ordering alike
+            ruleset = rule.get('ruleset', INTERNETWORK_RULESETS[0])
+            if rule.get('enabled', True) and ruleset in ruleset_order:
+                selected.append((ruleset_order[ruleset], rule.get('rule_index') or 0, i, rule))
+        self.disabled = sum(1 for rule in rules if not rule.get('enabled', True))
+        self.rules = [self._compile(rule, groups) for *_, rule in sorted(selected, key=lambda item: item[:3])]
+        
+        # Per source network, the rules that can match it, in order
+        self.rules_by_src: List[List[FirewallRule]] = [[] for _ in networks]
+        for rule in self.rules:
+            for i in self._bits(rule.src_mask):
+                self.rules_by_src[i].append(rule)
+        
+        named = {protocol for rule in self.rules for protocol in rule.protocols}
+        self.protocols = list(PORT_PROTOCOLS) + sorted(named - set(PORT_PROTOCOLS) - {OTHER_PROTOCOL}) + [OTHER_PROTOCOL]
+        self.services: List[FirewallService] = []
+        self._services_by_protocol: Dict[str, List[FirewallService]] = {}
+        self._service_starts: Dict[str, List[int]] = {}
+        self._build_matrix()
+    
+    @staticmethod
+    def _bits(mask: int) -> Iterator[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+    
+    def _address_mask(self, address: str) -> Tuple[int, bool]:
+        """Networks an address or CIDR falls in, and whether it covers less than all of one"""
+        try:
+            target = ipaddress.ip_network(address.strip(), strict=False)
+        except ValueError:
+            return 0, False
+        mask, partial = 0, False
+        for i, subnet in enumerate(self._subnets):
+            if subnet is not None and subnet.version == target.version and subnet.overlaps(target):
+                mask |= 1 << i
+                partial = partial or not target.supernet_of(subnet)
+        return mask, partial
+    
+    def _side(self, rule: Dict[str, Any], side: str, groups: Dict[str, Dict[str, Any]]):
+        """Resolve one side of a rule to (network mask, partial, port specs, label).
+        
+        A side naming a network or group the export does not have matches
+        nothing, so a rule on a deleted group can never decide a verdict.
+        """
+        mask, partial, ports, labels, unknown = 0, False, [], [], []
+        # Whether the side has an address condition at all; without one every network matches
+        addressed = False
+        network_id = rule.get(f'{side}_networkconf_id')
+        if network_id:
+            addressed = True
+            if network_id in self.position:
+                mask |= 1 << self.position[network_id]
+                labels.append(self.networks[self.position[network_id]].name)
+            else:
+                unknown.append(f"network {network_id}")
+        addresses = []
+        for group_id in rule.get(f'{side}_firewallgroup_ids') or ():
+            group = groups.get(group_id)
+            if group is None:
+                unknown.append(f"group {group_id}")
+                continue
+            members = group.get('group_members') or []
+            if group.get('group_type') == 'port-group':
+                ports.extend(members)
+            else:
+                addressed = True
+                addresses.extend(members)
+            labels.append(f"{group.get('name', group_id)} ({', '.join(map(str, members))})")
+        if rule.get(f'{side}_address'):
+            addressed = True
+            addresses.append(rule[f'{side}_address'])
+            labels.append(rule[f'{side}_address'])
+        for address in addresses:
+            address_mask, address_partial = self._address_mask(str(address))
+            mask |= address_mask
+            partial = partial or address_partial
+        if rule.get(f'{side}_port'):
+            ports.append(rule[f'{side}_port'])
+        if unknown:
+            logger.warning(f"⚠️  Firewall rule {rule.get('name') or rule.get('_id', '?')}: unknown "
+                           f"{', '.join(unknown)} in its {side}; the rule is treated as matching nothing")
+            labels.extend(f"unknown {name}" for name in unknown)
+            mask = 0
+        elif not addressed:
+            mask = self.full_mask
+        return mask, partial, ports, ', '.join(labels) or "Any"
+    
+    def _compile(self, raw: Dict[str, Any], groups: Dict[str, Dict[str, Any]]) -> FirewallRule:
+        rule = FirewallRule(raw)
+        rule.src_mask, src_partial, _, rule.source = self._side(raw, 'src', groups)
+        rule.dst_mask, dst_partial, port_specs, rule.destination = self._side(raw, 'dst', groups)
+        rule.partial = src_partial or dst_partial
+        if port_specs:
+            # A port condition that parses to nothing can never match
+            rule.ports = PortSet.parse(port_specs)
+        return rule
+    
+    def _evaluate(self, rules: List[FirewallRule]) -> Tuple[List[int], List[int]]:
+        """First-match verdicts of the given rules for every source network at once"""
+        count = len(self.networks)
+        decided, allowed, conditional = [0] * count, [0] * count, [0] * count
+        for rule in rules:
+            for i in self._bits(rule.src_mask):
+                fresh = rule.dst_mask & ~decided[i]
+                if not fresh:
+                    continue
+                if rule.partial:
+                    conditional[i] |= fresh
+                    continue
+                decided[i] |= fresh
+                if rule.allow:
+                    allowed[i] |= fresh
+        if self.default_allow:
+            allowed = [allowed[i] | (self.full_mask & ~decided[i]) for i in range(count)]
+        return allowed, conditional
+    
+    def _build_matrix(self):
+        for protocol in self.protocols:
+            rules = [rule for rule in self.rules if rule.matches_protocol(protocol)]
+            if protocol in PORT_PROTOCOLS:
+                cuts = {PORT_MIN, PORT_MAX + 1}
+                for rule in rules:
+                    for lo, hi in rule.ports.intervals:
+                        cuts.update((lo, hi + 1))
+                bounds = sorted(cuts)
+                ranges = [(lo, next_lo - 1) for lo, next_lo in zip(bounds, bounds[1:])]
+            else:
+                ranges = [(None, None)]
+            
+            services = self._services_by_protocol[protocol] = []
+            starts = self._service_starts[protocol] = []
+            previous = None
+            for lo, hi in ranges:
+                if lo is None:
+                    # Port conditions cannot match traffic without ports
+                    matching = [rule for rule in rules if rule.ports.is_all]
+                else:
+                    matching = [rule for rule in rules if lo in rule.ports]
+                allowed, conditional = self._evaluate(matching)
+                if previous is not None and previous.allowed == allowed and previous.conditional == conditional:
+                    previous.hi = hi  # Same verdicts as the range before: extend it
+                    continue
+                previous = FirewallService(protocol, lo, hi, allowed, conditional)
+                self.services.append(previous)
+                services.append(previous)
+                starts.append(lo if lo is not None else 0)
+    
+    def network_index(self, network: str) -> int:
+        """Position of a network given by id or name; raises KeyError if unknown"""
+        if network in self.position:
+            return self.position[network]
+        if network in self.by_name:
+            return self.position[self.by_name[network]]
+        raise KeyError(f"Unknown network: {network}")
+    
+    def service(self, protocol: str, port: Optional[int] = None) -> FirewallService:
+        """The service covering a protocol and port"""
+        protocol = protocol.lower()
+        if protocol not in self._services_by_protocol:
+            protocol = OTHER_PROTOCOL
+        services = self._services_by_protocol[protocol]
+        if protocol not in PORT_PROTOCOLS or port is None:
+            return services[0]
+        return services[bisect.bisect_right(self._service_starts[protocol], port) - 1]
+    
+    def can_reach(self, src: str, dst: str, protocol: str = 'tcp', port: Optional[int] = None) -> bool:
+        """Whether src may open connections to dst; without a port, whether any port is allowed"""
+        i, j = self.network_index(src), self.network_index(dst)
+        protocol = protocol.lower()
+        if protocol in PORT_PROTOCOLS and port is None:
+            return any(service.allowed[i] >> j & 1 for service in self._services_by_protocol[protocol])
+        return bool(self.service(protocol, port).allowed[i] >> j & 1)
+    
+    def first_match(self, src: str, dst: str, protocol: str = 'tcp',
+                    port: Optional[int] = None) -> Optional[FirewallRule]:
+        """The first rule matching the traffic, host-level rules included; None means the default applies"""
+        i, j = self.network_index(src), self.network_index(dst)
+        protocol = protocol.lower()
+        for rule in self.rules_by_src[i]:
+            if not (rule.dst_mask >> j & 1) or not rule.matches_protocol(protocol):
+                continue
+            if port is not None and protocol in PORT_PROTOCOLS:
+                if port in rule.ports:
+                    return rule
+            elif rule.ports.is_all:
+                return rule
+        return None
+    
+    def verdicts(self, i: int, j: int) -> List[Tuple[str, bool, bool]]:
+        """(service label, allowed, conditional) from network i to network j, adjacent equal ranges merged"""
+        merged = []
+        previous = None
+        for service in self.services:
+            allowed = bool(service.allowed[i] >> j & 1)
+            conditional = bool(service.conditional[i] >> j & 1)
+            if (previous is not None and previous[0] == service.protocol and previous[3:] == [allowed, conditional]):
+                previous[2] = service.hi
+                continue
+            previous = [service.protocol, service.lo, service.hi, allowed, conditional]
+            merged.append(previous)
+        return [(_service_label(protocol, lo, hi), allowed, conditional)
+                for protocol, lo, hi, allowed, conditional in merged]
+    
+    def summary(self, i: int, j: int) -> str:
+        """Matrix cell text: ✅ or ❌, with the minority services listed as exceptions"""
+        verdicts = self.verdicts(i, j)
+        allowed = [label for label, ok, _ in verdicts if ok]
+        blocked = [label for label, ok, _ in verdicts if not ok]
+        mark = "*" if any(conditional for *_, conditional in verdicts) else ""
+        if not blocked:
+            return f"✅{mark}"
+        if not allowed:
+            return f"❌{mark}"
+        if len(blocked) <= len(allowed):
+            return f"✅{mark} except {', '.join(blocked)}"
+        return f"❌{mark} except {', '.join(allowed)}"
+
+
+# Counters kept by the port history store, with their array typecodes
+HISTORY_COLUMNS = (('tx_bytes', 'Q'), ('rx_bytes', 'Q'), ('speed', 'I'), ('poe_power', 'f'), ('up', 'B'))
+# `up` value of a port that was missing from a snapshot
+HISTORY_ABSENT = 255
+# Snapshots the port mapping's traffic notes are computed over
+HISTORY_WINDOW_DAYS = 30
+# Ports whose statistics NumPy computes at once, bounding the temporary arrays
+HISTORY_BLOCK_PORTS = 64
+# Heatmap cell by peak utilization: (upper bound, cell)
+HEATMAP_LEVELS = ((0.01, '⬜'), (0.25, '🟩'), (0.5, '🟨'), (0.75, '🟧'), (float('inf'), '🟥'))
+HEATMAP_BUCKETS = {'hour': (3600, '%d %Hh'), 'day': (86400, '%m-%d')}
+
+
+def _format_time(epoch: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(epoch))
+
+
+def _format_rate(bytes_per_second: float) -> str:
+    bits = bytes_per_second * 8
+    for unit, scale in (('Gbps', 1e9), ('Mbps', 1e6), ('kbps', 1e3)):
+        if bits >= scale:
+            return f"{bits / scale:.1f} {unit}"
+    return f"{bits:.0f} bps"
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+def _heat_cell(utilization: Optional[float]) -> str:
+    if utilization is None:
+        return '·'
+    for bound, cell in HEATMAP_LEVELS:
+        if utilization < bound:
+            return cell
+    return HEATMAP_LEVELS[-1][1]
+
+
+class PortStats:
+    """Throughput, utilization and PoE draw of one port over a history window.
+    
+    Rates are bytes per second averaged over the intervals with usable
+    counters; utilization is the busier direction over the link speed.
+    """
+    __slots__ = ('samples', 'tx_rate', 'rx_rate', 'util_p50', 'util_p95', 'util_max', 'poe_avg', 'poe_trend')
+    
+    def __init__(self, samples: int, tx_rate: Optional[float], rx_rate: Optional[float],
+                 util_p50: Optional[float], util_p95: Optional[float], util_max: Optional[float],
+                 poe_avg: float, poe_trend: Optional[float]):
+        self.samples = samples
+        self.tx_rate = tx_rate
+        self.rx_rate = rx_rate
+        self.util_p50 = util_p50
+        self.util_p95 = util_p95
+        self.util_max = util_max
+        self.poe_avg = poe_avg
+        self.poe_trend = poe_trend
+    
+    @classmethod
+    def from_series(cls, times: List[float], series: Dict[str, List[Any]]) -> 'PortStats':
+        """Statistics of one port's series, sample by sample; _block_stats()
+        computes the same for many ports at once with NumPy
+        """
+        up, speed, poe = series['up'], series['speed'], series['poe_power']
+        present = [i for i, state in enumerate(up) if state != HISTORY_ABSENT]
+        
+        tx_total = rx_total = elapsed_total = 0.0
+        utilization = []
+        for i, elapsed, d_tx, d_rx in _counter_intervals(times, series, present):
+            tx_total += d_tx
+            rx_total += d_rx
+            elapsed_total += elapsed
+            if up[i] and speed[i]:
+                utilization.append(max(d_tx, d_rx) * 8 / (elapsed * speed[i] * 1e6))
+        utilization.sort()
+        
+        # Least-squares slope of the PoE draw, in watts per day
+        draws = [(times[i] / 86400, poe[i]) for i in present]
+        poe_avg = sum(watts for _, watts in draws) / len(draws) if draws else 0.0
+        poe_trend = None
+        if len(draws) > 1:
+            mean_day = sum(day for day, _ in draws) / len(draws)
+            spread = sum((day - mean_day) ** 2 for day, _ in draws)
+            if spread:
+                poe_trend = sum((day - mean_day) * (watts - poe_avg) for day, watts in draws) / spread
+        
+        return cls(len(present),
+                   tx_total / elapsed_total if elapsed_total else None,
+                   rx_total / elapsed_total if elapsed_total else None,
+                   _percentile(utilization, 0.5) if utilization else None,
+                   _percentile(utilization, 0.95) if utilization else None,
+                   utilization[-1] if utilization else None,
+                   poe_avg, poe_trend)
+
+
+def _load_numpy():
+    """NumPy if it is installed, else None. Imported on first use, as only
+    the port history statistics need it and they work without it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _bucket_peaks(times: List[float], series: Dict[str, List[Any]], first_bucket: float, bucket_seconds: int,
+                  buckets: int) -> List[Optional[float]]:
+    """Peak utilization of one port in each heatmap bucket, None where it had no usable interval"""
+    peaks: List[Optional[float]] = [None] * buckets
+    up, speed = series['up'], series['speed']
+    present = [i for i, state in enumerate(up) if state != HISTORY_ABSENT]
+    for i, elapsed, d_tx, d_rx in _counter_intervals(times, series, present):
+        if up[i] and speed[i]:
+            cell = int((times[i] - first_bucket) // bucket_seconds)
+            utilization = max(d_tx, d_rx) * 8 / (elapsed * speed[i] * 1e6)
+            peaks[cell] = max(peaks[cell] or 0.0, utilization)
+    return peaks
+
+
+def _block_stats(numpy, times, block: Dict[str, Any],
+                 heatmap: Optional[Tuple[float, int, int]]) -> Iterator[Tuple[PortStats, Optional[List[Optional[float]]]]]:
+    """PortStats.from_series() and _bucket_peaks() for a block of ports at
+    once: `block` holds a snapshots x ports array of each counter, `times`
+    the snapshot times. Every step is an array operation over all samples,
+    so the only Python loop is over the ports of the result. Yields
+    (stats, heatmap peaks) per port, the peaks None without a `heatmap` of
+    (first bucket, bucket seconds, buckets).
+    """
+    up, speed = block['up'], block['speed']
+    present = up != HISTORY_ABSENT
+    rows, ports = up.shape
+    
+    # The previous present sample of each sample, as in _counter_intervals()
+    seen = numpy.where(present, numpy.arange(rows)[:, None], -1)
+    prev = numpy.maximum.accumulate(numpy.vstack([numpy.full((1, ports), -1), seen[:-1]]), axis=0)
+    intervals = present & (prev >= 0)
+    prev = numpy.maximum(prev, 0)
+    tx, rx = block['tx_bytes'].astype(numpy.int64), block['rx_bytes'].astype(numpy.int64)
+    d_tx = tx - numpy.take_along_axis(tx, prev, axis=0)
+    d_rx = rx - numpy.take_along_axis(rx, prev, axis=0)
+    elapsed = times[:, None] - times[prev]
+    usable = intervals & (elapsed > 0) & (d_tx >= 0) & (d_rx >= 0)
+    tx_total = numpy.where(usable, d_tx, 0).sum(axis=0)
+    rx_total = numpy.where(usable, d_rx, 0).sum(axis=0)
+    elapsed_total = numpy.where(usable, elapsed, 0.0).sum(axis=0)
+    
+    busy = usable & (up != 0) & (speed != 0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        utilization = numpy.where(busy, numpy.maximum(d_tx, d_rx) * 8 / (elapsed * speed * 1e6), numpy.nan)
+    # Sorting leaves the NaNs of samples without utilization last
+    ordered = numpy.sort(utilization, axis=0)
+    busy_samples = busy.sum(axis=0)
+    
+    def percentile(fraction: float):
+        rank = numpy.maximum(numpy.ceil(busy_samples * fraction).astype(numpy.int64) - 1, 0)
+        return numpy.take_along_axis(ordered, rank[None, :], axis=0)[0]
+    
+    # Least-squares slope of the PoE draw, in watts per day
+    samples = present.sum(axis=0)
+    counted = numpy.maximum(samples, 1)
+    poe = numpy.where(present, block['poe_power'].astype(numpy.float64), 0.0)
+    poe_avg = poe.sum(axis=0) / counted
+    days = numpy.where(present, (times / 86400)[:, None], 0.0)
+    offsets = numpy.where(present, days - days.sum(axis=0) / counted, 0.0)
+    spread = (offsets ** 2).sum(axis=0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        poe_trend = (offsets * (poe - poe_avg)).sum(axis=0) / spread
+    
+    peaks = None
+    if heatmap:
+        first_bucket, bucket_seconds, buckets = heatmap
+        cells = ((times - first_bucket) // bucket_seconds).astype(numpy.int64)
+        # Samples are in time order, so each bucket is a run of rows
+        bounds = numpy.searchsorted(cells, numpy.arange(buckets + 1))
+        filled = bounds[:-1] < bounds[1:]
+        peaks = numpy.full((buckets, ports), numpy.nan)
+        if filled.any():
+            peaks[filled] = numpy.fmax.reduceat(utilization, bounds[:-1][filled], axis=0)
+        peaks = [[peak if peak == peak else None for peak in column] for column in peaks.T.tolist()]
+    
+    columns = zip(samples.tolist(), busy_samples.tolist(), tx_total.tolist(), rx_total.tolist(),
+                  elapsed_total.tolist(), percentile(0.5).tolist(), percentile(0.95).tolist(),
+                  percentile(1.0).tolist(), poe_avg.tolist(), spread.tolist(), poe_trend.tolist())
+    for port, (count, busy_count, tx_bytes, rx_bytes, seconds, p50, p95, peak, watts, days_spread, trend) in enumerate(columns):
+        stats = PortStats(count,
+                          tx_bytes / seconds if seconds else None,
+                          rx_bytes / seconds if seconds else None,
+                          p50 if busy_count else None,
+                          p95 if busy_count else None,
+                          peak if busy_count else None,
+                          watts, trend if count > 1 and days_spread else None)
+        yield stats, peaks[port] if peaks is not None else None
+
+
+def _counter_intervals(times: List[float], series: Dict[str, List[Any]], present: List[int]):
+    """Yield (sample, seconds, tx bytes, rx bytes) between consecutive samples
+    of a port, skipping intervals where a counter went backwards (a reboot)
+    """
+    tx, rx = series['tx_bytes'], series['rx_bytes']
+    for prev, i in zip(present, present[1:]):
+        elapsed = times[i] - times[prev]
+        d_tx, d_rx = tx[i] - tx[prev], rx[i] - rx[prev]
+        if elapsed > 0 and d_tx >= 0 and d_rx >= 0:
+            yield i, elapsed, d_tx, d_rx
+
+
+class PortHistory:
+    """Columnar on-disk store of port counters from successive devices.json snapshots.
+    
+    series.json assigns every (device MAC, port index) a column and keeps the
+    device labels; times.bin holds one timestamp per snapshot. Each counter
+    in HISTORY_COLUMNS has its own file: a snapshots x capacity matrix of
+    fixed-width values, appended one row per snapshot. A port's series is a
+    strided slice of the memory-mapped file, so months of five-minute
+    snapshots are read without parsing any JSON. When more ports appear than
+    the capacity, the files are rewritten at twice the width.
+    """
+    INDEX = 'series.json'
+    TIMES = 'times.bin'
+    
+    def __init__(self, store_dir: Path):
+        self.dir = Path(store_dir)
+        self.capacity = 64
+        self.ports: List[Tuple[str, Any]] = []
+        self.labels: Dict[str, str] = {}
+        try:
+            with open(self.dir / self.INDEX) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            pass  # New store
+        else:
+            self.capacity = index['capacity']
+            self.ports = [tuple(port) for port in index['ports']]
+            self.labels = index['labels']
+        self.columns: Dict[Tuple[str, Any], int] = {port: column for column, port in enumerate(self.ports)}
+        
+        self.times = array.array('d')
+        times_path = self.dir / self.TIMES
+        if times_path.exists():
+            self.times.frombytes(times_path.read_bytes())
+    
+    @property
+    def fingerprint(self) -> str:
+        """Changes with every ingested snapshot"""
+        return f"{len(self.times)}@{self.times[-1] if self.times else 0}"
+    
+    def _path(self, name: str) -> Path:
+        return self.dir / f'{name}.bin'
+    
+    @staticmethod
+    def _empty_row(name: str, typecode: str, width: int) -> array.array:
+        return array.array(typecode, [HISTORY_ABSENT if name == 'up' else 0]) * width
+    
+    def ingest(self, devices: Iterable[Device], at: float) -> int:
+        """Append the port counters of one snapshot taken at `at` (epoch
+        seconds) and return how many ports it had.
+        
+        Raises ValueError if the snapshot is not newer than the last one.
+        """
+        if self.times and at <= self.times[-1]:
+            raise ValueError(f"snapshot at {_format_time(at)} is not newer than the last one "
+                             f"({_format_time(self.times[-1])})")
+        
+        ports: Dict[int, Port] = {}
+        for device in devices:
+            mac = device.mac
+            if not mac:
+                continue
+            self.labels[mac] = device.label
+            for port in device.ports:
+                if port.idx is None:
+                    continue
+                column = self.columns.get((mac, port.idx))
+                if column is None:
+                    column = self.columns[(mac, port.idx)] = len(self.ports)
+                    self.ports.append((mac, port.idx))
+                ports[column] = port
+        
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if len(self.ports) > self.capacity:
+            capacity = self.capacity
+            while capacity < len(self.ports):
+                capacity *= 2
+            self._grow(capacity)
+        
+        rows = len(self.times)
+        for name, typecode in HISTORY_COLUMNS:
+            row = self._empty_row(name, typecode, self.capacity)
+            for column, port in ports.items():
+                value = port.up if name == 'up' else getattr(port, name)
+                row[column] = value if typecode == 'f' else max(0, int(value))
+            with open(self._path(name), 'ab') as f:
+                f.truncate(rows * self.capacity * row.itemsize)  # Drop a row left by an interrupted ingest
+                row.tofile(f)
+        
+        # The snapshot only counts once its time is recorded
+        self.times.append(at)
+        with open(self.dir / self.TIMES, 'ab') as f:
+            f.truncate(rows * self.times.itemsize)
+            self.times[-1:].tofile(f)
+        write_if_changed(self.dir / self.INDEX, json.dumps(
+            {'capacity': self.capacity, 'ports': self.ports, 'labels': self.labels}))
+        return len(ports)
+    
+    def _grow(self, capacity: int):
+        """Rewrite every column file with wider rows"""
+        rows = len(self.times)
+        for name, typecode in HISTORY_COLUMNS:
+            path = self._path(name)
+            if not path.exists():
+                continue
+            padding = self._empty_row(name, typecode, capacity - self.capacity)
+            width = self.capacity * padding.itemsize
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for _ in range(rows):
+                    dst.write(src.read(width))
+                    padding.tofile(dst)
+            os.replace(tmp_path, path)
+        self.capacity = capacity
+    
+    @contextlib.contextmanager
+    def _views(self) -> Iterator[Dict[str, memoryview]]:
+        """Memory-map every column file as a flat typed view of the complete rows"""
+        import mmap
+        
+        rows = len(self.times)
+        with contextlib.ExitStack() as stack:
+            views = {}
+            for name, typecode in HISTORY_COLUMNS:
+                f = stack.enter_context(open(self._path(name), 'rb'))
+                mapped = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                raw = memoryview(mapped)
+                stack.callback(raw.release)
+                views[name] = raw[:rows * self.capacity * array.array(typecode).itemsize].cast(typecode)
+                stack.callback(views[name].release)
+            yield views
+    
+    def _window_start(self, window: Optional[float]) -> int:
+        return bisect.bisect_left(self.times, self.times[-1] - window) if window else 0
+    
+    def _series(self, views: Dict[str, memoryview], column: int, start: int) -> Dict[str, List[Any]]:
+        """One port's counters from row `start` on, as strided slices"""
+        offset = start * self.capacity + column
+        return {name: view[offset::self.capacity].tolist() for name, view in views.items()}
+    
+    def _iter_stats(self, columns: List[int], start: int, heatmap: Optional[Tuple[float, int, int]] = None
+                    ) -> Iterator[Tuple[PortStats, Optional[List[Optional[float]]]]]:
+        """Yield (PortStats, heatmap peaks) of each column in turn, from row
+        `start` on; peaks are None without a `heatmap` of (first bucket,
+        bucket seconds, buckets). With NumPy the memory-mapped matrices are
+        computed on a block of columns at a time, else one port's series at
+        a time in Python.
+        """
+        numpy = _load_numpy()
+        if numpy is None:
+            times = self.times[start:].tolist()
+            with self._views() as views:
+                for column in columns:
+                    series = self._series(views, column, start)
+                    yield PortStats.from_series(times, series), (
+                        _bucket_peaks(times, series, *heatmap) if heatmap else None)
+            return
+        
+        rows = len(self.times)
+        matrices = {name: numpy.memmap(self._path(name), dtype=typecode, mode='r', shape=(rows, self.capacity))
+                    for name, typecode in HISTORY_COLUMNS}
+        times = numpy.array(self.times[start:], dtype=numpy.float64)
+        for offset in range(0, len(columns), HISTORY_BLOCK_PORTS):
+            block = columns[offset:offset + HISTORY_BLOCK_PORTS]
+            yield from _block_stats(numpy, times, {name: matrix[start:, block] for name, matrix in matrices.items()},
+                                    heatmap)
+    
+    def stats(self, window: Optional[float] = None) -> Dict[Tuple[str, Any], PortStats]:
+        """Statistics of every port seen in the last `window` seconds of
+        snapshots (all of them by default), by (device MAC, port index)
+        """
+        if not self.times:
+            return {}
+        ports = list(self.columns)
+        result = {}
+        for port, (stats, _) in zip(ports, self._iter_stats([self.columns[port] for port in ports],
+                                                             self._window_start(window))):
+            if stats.samples:
+                result[port] = stats
+        return result
+    
+    def iter_report(self, bucket: str = 'day', buckets: int = 14) -> Iterator[str]:
+        """Yield a Markdown report: per-port rates and percentiles over the
+        heatmap period, then one heatmap table of peak utilization per device
+        """
+        if not self.times:
+            yield "No snapshots recorded yet."
+            return
+        
+        bucket_seconds, bucket_format = HEATMAP_BUCKETS[bucket]
+        last = self.times[-1]
+        first_bucket = (last // bucket_seconds - buckets + 1) * bucket_seconds
+        start = bisect.bisect_left(self.times, first_bucket)
+        times = self.times[start:].tolist()
+        
+        yield "# Port Usage"
+        yield ""
+        yield f"*{len(times)} snapshots from {_format_time(times[0])} to {_format_time(last)}*"
+        yield ""
+        
+        # Per device, the ports with any usable interval and their bucket peaks
+        summary_rows = []
+        heatmaps: Dict[str, List[Tuple[Any, List[Optional[float]]]]] = {}
+        by_device = sorted(self.columns, key=lambda port: (self.labels.get(port[0], ''), port))
+        port_stats = self._iter_stats([self.columns[port] for port in by_device], start,
+                                      (first_bucket, bucket_seconds, buckets))
+        for (mac, port_idx), (stats, peaks) in zip(by_device, port_stats):
+            if stats.util_max is None and stats.tx_rate is None:
+                continue
+            label = self.labels.get(mac, mac)
+            p50 = f"{stats.util_p50:.0%}" if stats.util_p50 is not None else "-"
+            p95 = f"{stats.util_p95:.0%}" if stats.util_p95 is not None else "-"
+            peak = f"{stats.util_max:.0%}" if stats.util_max is not None else "-"
+            trend = f"{stats.poe_trend:+.2f} W/day" if stats.poe_trend else "-"
+            summary_rows.append(f"| {label} | {port_idx} | {_format_rate(stats.rx_rate or 0)} | "
+                                f"{_format_rate(stats.tx_rate or 0)} | {p50} | {p95} | {peak} | "
+                                f"{stats.poe_avg:.1f}W | {trend} |")
+            heatmaps.setdefault(label, []).append((port_idx, peaks))
+        
+        yield "## Ports"
+        yield ""
+        yield "| Device | Port | Avg RX | Avg TX | p50 | p95 | Peak | PoE Avg | PoE Trend |"
+        yield "|--------|------|--------|--------|-----|-----|------|---------|-----------|"
+        yield from summary_rows
+        yield ""
+        
+        yield f"## Utilization by {bucket}"
+        yield ""
+        legend = ", ".join(f"{cell} <{bound:.0%}" for bound, cell in HEATMAP_LEVELS[:-1])
+        yield f"Peak utilization per {bucket}: {legend}, {HEATMAP_LEVELS[-1][1]} higher, · no data"
+        headers = [time.strftime(bucket_format, time.gmtime(first_bucket + n * bucket_seconds)) for n in range(buckets)]
+        for label, ports in heatmaps.items():
+            yield ""
+            yield f"### {label}"
+            yield ""
+            yield "| Port | " + " | ".join(headers) + " |"
+            yield "|------|" + "|".join("---" for _ in headers) + "|"
+            for port_idx, peaks in ports:
+                yield f"| {port_idx} | " + " | ".join(_heat_cell(peak) for peak in peaks) + " |"
+
+
+# Record kinds compared by the diff command, in report order
+DIFF_KINDS = ('networks', 'devices', 'ports', 'firewall rules')
+# Raw firewall rule keys that do not describe the rule itself
+RULE_VOLATILE_KEYS = ('_id', 'site_id')
+
+
+def _record_digest(fields: Dict[str, Any]) -> bytes:
+    return hashlib.blake2b(json.dumps(fields, sort_keys=True, default=str).encode(), digest_size=16).digest()
+
+
+def _report_value(value: Any) -> str:
+    """A record field as a Markdown table cell"""
+    if value is None or value == [] or value == '':
+        return "-"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, list):
+        value = ", ".join(map(str, value))
+    return str(value).replace('|', '\\|')
+
+
+class SnapshotRecords:
+    """Normalized records of one loaded export, with a digest of each.
+    
+    Every kind in DIFF_KINDS maps a stable key (network or rule id, device
+    MAC, device MAC and port index) to a display label and a flat dict of
+    fields. Fields refer to other records by key, so renaming a network or
+    device changes only that record rather than every port and rule using
+    it; display() turns keys back into names for the report.
+    """
+    
+    def __init__(self, parser: 'UniFiToMermaid'):
+        self.labels: Dict[str, Dict[str, str]] = {kind: {} for kind in DIFF_KINDS}
+        self.fields: Dict[str, Dict[str, Dict[str, Any]]] = {kind: {} for kind in DIFF_KINDS}
+        self.digests: Dict[str, Dict[str, bytes]] = {kind: {} for kind in DIFF_KINDS}
+        
+        for network in parser.networks.values():
+            self._add('networks', network.id, network.name, {
+                'name': network.name, 'vlan': network.vlan, 'subnet': network.subnet,
+                'zone': network.zone_id, 'internet access': network.internet_access,
+            })
+        
+        topology = parser.topology
+        for device in parser.devices.values():
+            key = (device.mac or device.id).lower()
+            parent = topology.parent(device)
+            self._add('devices', key, device.label, {
+                'name': device.label, 'type': device.type, 'model': device.model,
+                'uplink': (parent.mac or parent.id).lower() if parent is not None else None,
+                'uplink port': topology.parent_link[device.id].port_of(parent) if parent is not None else None,
+            })
+            for port in parser.resolved_ports.get(device.id, ()):
+                self._add('ports', f"{key}/{port.idx}", f"{device.label} port {port.idx}", {
+                    'name': port.custom_name, 'profile': port.profile_name, 'vlan': port.vlan_label,
+                    'tagged': [network.id for network in port.tagged_networks],
+                    'poe': port.poe_mode if port.port.poe else None,
+                    'connected': (port.peer.mac or port.peer.id).lower() if port.peer is not None else None,
+                })
+        
+        self.group_names = {group_id: group.get('name', group_id) for group_id, group in parser.firewall_groups.items()}
+        for position, rule in enumerate(parser.firewall_rules):
+            fields = {name: value for name, value in rule.items() if name not in RULE_VOLATILE_KEYS}
+            label = " ".join(str(part) for part in (rule.get('ruleset'), rule.get('rule_index'), rule.get('name'))
+                             if part not in (None, ''))
+            self._add('firewall rules', rule.get('_id') or f"#{position}", label or f"Rule {position + 1}", fields)
+    
+    def _add(self, kind: str, key: str, label: str, fields: Dict[str, Any]):
+        self.labels[kind][key] = label
+        self.fields[kind][key] = fields
+        self.digests[kind][key] = _record_digest(fields)
+    
+    def display(self, field: str, value: Any) -> str:
+        """A field value as a Markdown table cell, with record keys shown by name"""
+        if field in ('connected', 'uplink'):
+            value = self.labels['devices'].get(value, value)
+        elif field == 'tagged' or field.endswith('networkconf_id'):
+            names = self.labels['networks']
+            value = [names.get(key, key) for key in value] if isinstance(value, list) else names.get(value, value)
+        elif field.endswith('firewallgroup_ids'):
+            value = [self.group_names.get(key, key) for key in value or ()]
+        return _report_value(value)
+
+
+class SnapshotDiff:
+    """Added, removed and changed records between two snapshots.
+    
+    Records are matched by key and compared by digest, so the cost is linear
+    in the number of records; fields are only compared for changed ones.
+    """
+    
+    def __init__(self, old: SnapshotRecords, new: SnapshotRecords):
+        self.old, self.new = old, new
+        self.added: Dict[str, List[str]] = {}
+        self.removed: Dict[str, List[str]] = {}
+        self.changed: Dict[str, List[str]] = {}
+        for kind in DIFF_KINDS:
+            before, after = old.digests[kind], new.digests[kind]
+            self.added[kind] = [key for key in after if key not in before]
+            self.removed[kind] = [key for key in before if key not in after]
+            self.changed[kind] = [key for key, digest in after.items() if key in before and before[key] != digest]
+    
+    def __bool__(self) -> bool:
+        return any(self.added[kind] or self.removed[kind] or self.changed[kind] for kind in DIFF_KINDS)
+    
+    def field_changes(self, kind: str, key: str) -> List[Tuple[str, Any, Any]]:
+        """(field, before, after) for every field of a changed record that differs"""
+        before, after = self.old.fields[kind][key], self.new.fields[kind][key]
+        return [(name, before.get(name), after.get(name)) for name in dict.fromkeys([*before, *after])
+                if before.get(name) != after.get(name)]
+    
+    def iter_report(self, old_name: str, new_name: str) -> Iterator[str]:
+        """Yield the Markdown change report line by line"""
+        yield "# Network Changes"
+        yield ""
+        yield f"*{old_name} → {new_name}*"
+        yield ""
+        if not self:
+            yield "No changes."
+            return
+        
+        yield "| Records | Added | Removed | Changed |"
+        yield "|---------|-------|---------|---------|"
+        for kind in DIFF_KINDS:
+            yield f"| {kind.capitalize()} | {len(self.added[kind])} | {len(self.removed[kind])} | {len(self.changed[kind])} |"
+        
+        for kind in DIFF_KINDS:
+            if not (self.added[kind] or self.removed[kind] or self.changed[kind]):
+                continue
+            yield ""
+            yield f"## {kind.capitalize()}"
+            for title, keys, records in (("Added", self.added[kind], self.new),
+                                         ("Removed", self.removed[kind], self.old)):
+                if not keys:
+                    continue
+                yield ""
+                yield f"**{title}:**"
+                yield ""
+                for key in keys:
+                    shown = ((name, records.display(name, value)) for name, value in records.fields[kind][key].items())
+                    summary = ", ".join(f"{name} {value}" for name, value in shown if value != "-")
+                    yield f"- {records.labels[kind][key]} ({summary})" if summary else f"- {records.labels[kind][key]}"
+            if self.changed[kind]:
+                yield ""
+                yield "**Changed:**"
+                yield ""
+                yield "| Record | Field | Before | After |"
+                yield "|--------|-------|--------|-------|"
+                for key in self.changed[kind]:
+                    for name, before, after in self.field_changes(kind, key):
+                        yield (f"| {self.new.labels[kind][key]} | {name} | {self.old.display(name, before)} | "
+                               f"{self.new.display(name, after)} |")
+
+
+def _file_fingerprint(path: Path, known: Optional[Tuple[int, int, str]] = None) -> Optional[Tuple[int, int, str]]:
+    """(size, mtime_ns, sha256) of a file, or None if it is missing. The hash
+    in `known` is reused when size and mtime match, so unchanged files are not
+    read.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return (stat.st_size, stat.st_mtime_ns, sha.hexdigest())
+
+
+def _snapshot_cache_path(config_dir: Path) -> Path:
+    """Where the snapshot cache of an export directory lives: under
+    $XDG_CACHE_HOME (default ~/.cache), named by the directory's resolved path
+    """
+    base = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache').joinpath(*SNAPSHOT_CACHE_DIR)
+    key = hashlib.sha256(str(config_dir.resolve()).encode('utf-8')).hexdigest()[:32]
+    return base / f"{key}.cache"
+
+
+def _same_fingerprints(current: Dict[str, Any], cached: Dict[str, Any]) -> bool:
+    """Whether every input has the same content (or is missing in both)"""
+    return current.keys() == cached.keys() and all(
+        (current[name] is None) == (cached[name] is None) and (current[name] is None or current[name][2] == cached[name][2])
+        for name in current)
+
+
+class _LazyAttribute:
+    """A model attribute that is loaded on first access.
+    
+    The first read calls the named loader method, which sets the attribute on
+    the instance; that value then shadows this descriptor, so later reads are
+    plain attribute lookups.
+    """
+    
+    def __init__(self, loader: str, *args):
+        self.loader = loader
+        self.args = args
+    
+    def __set_name__(self, owner, name: str):
+        self.name = name
+    
+    def __get__(self, model, owner=None):
+        if model is None:
+            return self
+        getattr(model, self.loader)(*self.args)
+        return model.__dict__[self.name]
+
+
+class UniFiToMermaid:
+    # Export records, each read from its file on first access by load_file()
+    networks: Dict[str, Network] = _LazyAttribute('load_file', 'networks.json')
+    devices: Dict[str, Device] = _LazyAttribute('load_file', 'devices.json')
+    port_profiles: Dict[str, PortProfile] = _LazyAttribute('load_file', 'port-profiles.json')
+    firewall_rules: List[Dict[str, Any]] = _LazyAttribute('load_file', 'firewall-rules.json')
+    firewall_groups: Dict[str, Dict[str, Any]] = _LazyAttribute('load_file', 'firewall-groups.json')
+    clients: Dict[str, Client] = _LazyAttribute('load_file', 'connected-clients.json')
+    # Known clients with a DHCP reservation, by MAC
+    reservations: Dict[str, Client] = _LazyAttribute('load_file', 'known-clients.json')
+    
+    # Lookup indexes, built by build_indexes()
+    devices_by_mac: Dict[str, Device] = _LazyAttribute('build', 'build_indexes')
+    devices_by_type: Dict[str, List[Device]] = _LazyAttribute('build', 'build_indexes')
+    gateway: Optional[Device] = _LazyAttribute('build', 'build_indexes')
+    _device_order: Dict[str, int] = _LazyAttribute('build', 'build_indexes')
+    
+    # Physical links and the breadth-first walk from the gateways
+    topology: TopologyGraph = _LazyAttribute('build', 'build_topology')
+    
+    # Compiled inter-network firewall policy, built by build_firewall_index()
+    firewall: FirewallIndex = _LazyAttribute('build', 'build_firewall_index')
+    
+    # Hosts placed into networks by place_clients()
+    clients_by_network: Dict[str, List[Client]] = _LazyAttribute('build', 'place_clients')
+    unplaced_clients: List[Client] = _LazyAttribute('build', 'place_clients')
+    # Connected clients by (switch MAC, port index) and by AP MAC
+    clients_by_port: Dict[Tuple[str, Any], List[Client]] = _LazyAttribute('build', 'place_clients')
+    clients_by_ap: Dict[str, List[Client]] = _LazyAttribute('build', 'place_clients')
+    
+    # Per-device resolved port tables, and every port by (device id, port index), built by resolve_ports()
+    resolved_ports: Dict[str, List[ResolvedPort]] = _LazyAttribute('build', 'resolve_ports')
+    resolved_port_index: Dict[Tuple[str, Any], ResolvedPort] = _LazyAttribute('build', 'resolve_ports')
+    
+    # Hosts by MAC, IP address and lower-cased name, and networks by prefix, built by index_hosts()
+    hosts_by_key: Dict[str, Client] = _LazyAttribute('build', 'index_hosts')
+    prefix_index: PrefixIndex = _LazyAttribute('build', 'index_hosts')
+    
+    def __init__(self, config_dir: str = '.', stream: bool = False, profiler: Optional[StageProfiler] = None,
+                 node_budget: int = MERMAID_NODE_BUDGET, snapshot_cache: bool = True):
+        self.config_dir = Path(config_dir)
+        self.stream = stream
+        self.profiler = profiler
+        # Most nodes per diagram before detail is collapsed; 0 draws everything
+        self.node_budget = node_budget
+        # Read and write the binary snapshot cache in load_configs()
+        self.snapshot_cache = snapshot_cache
+        
+        # Port traffic statistics by (device MAC, port index), from load_history()
+        self.port_stats: Dict[Tuple[str, Any], PortStats] = {}
+        
+    def load_configs(self, sections: Optional[Iterable[str]] = None):
+        """Load the UniFi configuration files.
+        
+        With snapshot_cache on, the loaded model is taken from the binary
+        cache in the user's cache directory when every input still matches it, and the
+        cache is rewritten after a full parse. Given section names, only the
+        required files among their SECTION_INPUTS are checked and nothing is
+        parsed up front: each file is read when a generator first touches
+        it, so unrelated files are never read. The snapshot cache, which
+        holds the whole model, is then left alone. Raises ConfigError if a
+        required file is missing or invalid.
+        """
+        inputs = None
+        if self.snapshot_cache and sections is None:
+            with self._stage('load snapshot cache') as stage:
+                inputs, state = self._read_snapshot_cache()
+                stage['items'] = len(state['devices']) if state is not None else 0
+            if state is not None:
+                vars(self).update(state)
+                logger.info(f"✅ Loaded {len(self.devices)} devices and {len(self.networks)} networks "
+                            f"from the snapshot cache")
+                return
+        
+        needed = set(REQUIRED_FILES + OPTIONAL_FILES)
+        if sections is not None:
+            needed = {filename for name in sections for filename in SECTION_INPUTS[name]}
+        for filename in REQUIRED_FILES:
+            if filename in needed and not (self.config_dir / filename).exists():
+                raise ConfigError(f"Required file not found: {filename}")
+        if sections is not None:
+            logger.info(f"✅ Loading on demand: {', '.join(name for name in FILE_ATTRIBUTES if name in needed)}")
+            return
+        
+        for filename in REQUIRED_FILES + OPTIONAL_FILES:
+            self.load_file(filename)
+        self._finish_loading()
+        
+        if inputs is not None:
+            self._write_snapshot_cache(inputs)
+    
+    def load_file(self, filename: str):
+        """Read one export file into its records.
+        
+        A missing or invalid optional file leaves its records empty. Raises
+        ConfigError if a required file is missing or holds invalid JSON.
+        """
+        path = self.config_dir / filename
+        with self._stage(f'load {filename}') as stage:
+            try:
+                if filename == 'devices.json' and self.stream:
+                    # Walk the data array one device at a time and convert it to a
+                    # record straight away, so huge exports never sit in memory whole
+                    self.devices = {}
+                    for dev in iter_json_array(path):
+                        self.devices[dev['_id']] = Device(dev)
+                    stage['items'] = len(self.devices)
+                    logger.info(f"✅ Streamed {len(self.devices)} devices")
+                    return
+                with open(path) as f:
+                    stage['items'] = self.apply_payload(filename, json.load(f))
+                return
+            except FileNotFoundError as e:
+                if filename in REQUIRED_FILES:
+                    raise ConfigError(f"Required configuration file not found: {e}") from e
+                logger.warning(f"⚠️  Optional file not found: {filename} (will use defaults)")
+            except json.JSONDecodeError as e:
+                if filename in REQUIRED_FILES:
+                    raise ConfigError(f"Invalid JSON in configuration file: {e}") from e
+                logger.warning(f"⚠️  Invalid JSON in {filename}: {e}")
+            self.apply_defaults(filename)
+    
+    def _snapshot_inputs(self, known: Dict[str, Any]) -> Dict[str, Any]:
+        """Fingerprints of this script and every export file the model is loaded from"""
+        inputs = {'script': _file_fingerprint(Path(__file__), known.get('script'))}
+        for filename in REQUIRED_FILES + OPTIONAL_FILES:
+            inputs[filename] = _file_fingerprint(self.config_dir / filename, known.get(filename))
+        return inputs
+    
+    def _read_snapshot_cache(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Return the current input fingerprints and, if the cache matches
+        them, the cached state
+        """
+        path = _snapshot_cache_path(self.config_dir)
+        try:
+            with open(path, 'rb') as f:
+                # Only unpickle a cache this user wrote and nobody else can change
+                stat = os.fstat(f.fileno())
+                if (hasattr(os, 'getuid') and stat.st_uid != os.getuid()) or stat.st_mode & 0o022:
+                    logger.warning(f"⚠️  Ignoring {path}: not private to this user")
+                    return self._snapshot_inputs({}), None
+                # The JSON header line is checked before the state is read
+                header = json.loads(f.readline())
+                if header.get('version') != SNAPSHOT_CACHE_VERSION:
+                    return self._snapshot_inputs({}), None
+                inputs = self._snapshot_inputs(header['inputs'])
+                if not _same_fingerprints(inputs, header['inputs']):
+                    logger.debug(f"   Inputs changed since {path} was written")
+                    return inputs, None
+                return inputs, pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:  # A damaged cache only costs a re-parse
+            logger.debug(f"   Ignoring unreadable {path}: {e}")
+        return self._snapshot_inputs({}), None
+    
+    def _write_snapshot_cache(self, inputs: Dict[str, Any]):
+        path = _snapshot_cache_path(self.config_dir)
+        state = {name: value for name, value in vars(self).items() if name not in SNAPSHOT_RUN_OPTIONS}
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                f.write(json.dumps({'version': SNAPSHOT_CACHE_VERSION, 'inputs': inputs}).encode('utf-8') + b'\n')
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:  # e.g. no writable home directory
+            logger.debug(f"   Snapshot cache not written: {e}")
+    
+    def load_payloads(self, payloads: Dict[str, Any]):
+        """Load already-parsed API responses keyed by export file name.
+        
+        Lets an exporter feed the parser directly without writing the files
+        to disk first. Raises ConfigError if a required payload is missing.
+        """
+        for filename in REQUIRED_FILES:
+            if filename not in payloads:
+                raise ConfigError(f"Required payload missing: {filename}")
+        for filename in REQUIRED_FILES + OPTIONAL_FILES:
+            if filename in payloads:
+                with self._stage(f'load {filename}') as stage:
+                    stage['items'] = self.apply_payload(filename, payloads[filename])
+            else:
+                self.apply_defaults(filename)
+        self._finish_loading()
+    
+    def apply_defaults(self, filename: str):
+        """Leave the records of a missing export file empty"""
+        setattr(self, FILE_ATTRIBUTES[filename], [] if filename == 'firewall-rules.json' else {})
+    
+    def apply_payload(self, filename: str, data: Dict[str, Any]) -> int:
+        """Convert one parsed export file into records and return how many there were"""
+        records = data.get('data', [])
+        if filename == 'networks.json':
+            self.networks = {net['_id']: Network(net) for net in records}
+            logger.info(f"✅ Loaded {len(self.networks)} networks")
+        elif filename == 'devices.json':
+            self.devices = {dev['_id']: Device(dev) for dev in records}
+            logger.info(f"✅ Loaded {len(self.devices)} devices")
+        elif filename == 'port-profiles.json':
+            self.port_profiles = {prof['_id']: PortProfile(prof) for prof in records}
+            logger.info(f"✅ Loaded {len(self.port_profiles)} port profiles")
+        elif filename == 'firewall-rules.json':
+            self.firewall_rules = records
+            logger.info(f"✅ Loaded {len(self.firewall_rules)} firewall rules")
+        elif filename == 'firewall-groups.json':
+            self.firewall_groups = {grp['_id']: grp for grp in records}
+            logger.info(f"✅ Loaded {len(self.firewall_groups)} firewall groups")
+        elif filename == 'connected-clients.json':
+            self.clients = {}
+            for record in records:
+                client = Client(record)
+                self.clients[client.mac] = client
+            logger.info(f"✅ Loaded {len(self.clients)} connected clients")
+        elif filename == 'known-clients.json':
+            self.reservations = {}
+            for record in records:
+                client = Client(record, online=False)
+                if client.fixed_ip:
+                    self.reservations[client.mac] = client
+            logger.info(f"✅ Loaded {len(self.reservations)} DHCP reservations")
+        return len(records)
+    
+    def load_history(self, history: PortHistory, window: Optional[float] = HISTORY_WINDOW_DAYS * 86400):
+        """Attach port traffic statistics from a port history store"""
+        with self._stage('load port history') as stage:
+            self.port_stats = history.stats(window)
+            stage['items'] = len(self.port_stats)
+        logger.info(f"✅ Loaded traffic history of {len(self.port_stats)} ports")
+    
+    def _finish_loading(self):
+        for step in BUILD_STEPS:
+            self.build(step)
+        logger.info("✅ All available configuration files loaded successfully")
+        
+        peak_mb = peak_memory_mb()
+        if peak_mb is not None:
+            logger.debug(f"📈 Peak memory after load: {peak_mb:.1f} MB")
+    
+    def build(self, step: str):
+        """Run one of the BUILD_STEPS, loading any input it reads that is not loaded yet"""
+        with self._stage(BUILD_STEPS[step][0]) as stage:
+            stage['items'] = getattr(self, step)()
+    
+    def prepare(self, sections: Iterable[str]):
+        """Load every file the named sections read and run every build step
+        covered by those files, so nothing is left to load on first access
+        """
+        needed = {filename for name in sections for filename in SECTION_INPUTS[name]}
+        for filename, attribute in FILE_ATTRIBUTES.items():
+            if filename in needed:
+                getattr(self, attribute)
+        for _, attribute, inputs in BUILD_STEPS.values():
+            if needed.issuperset(inputs):
+                getattr(self, attribute)
+    
+    def is_loaded(self, attribute: str) -> bool:
+        """Whether a lazily loaded model attribute has been loaded yet"""
+        return attribute in vars(self)
+    
+    def _stage(self, name: str, items: Optional[int] = None):
+        """Profile a block when a profiler is attached; otherwise a no-op"""
+        if self.profiler is None:
+            return contextlib.nullcontext({})
+        return self.profiler.stage(name, items)
+
+    def build_indexes(self):
+        """Build device lookup indexes in a single pass over the loaded devices.
+        
+        Generators use these instead of rescanning every device, so generation
+        stays linear in the number of devices and ports. Returns the device
+        count.
+        """
+        self.devices_by_mac = {}
+        self.devices_by_type = {}
+        self.gateway = None
+        self._device_order = {}
+        
+        for position, device in enumerate(self.devices.values()):
+            self._device_order[device.id] = position
+            
+            if device.mac:
+                # Keep the first device seen for a MAC, like the old linear scans did
+                self.devices_by_mac.setdefault(device.mac, device)
+            
+            self.devices_by_type.setdefault(device.type, []).append(device)
+            if self.gateway is None and device.type in GATEWAY_TYPES:
+                self.gateway = device
+        return len(self.devices)
+    
+    def build_topology(self):
+        """Build the physical link graph and walk it from the gateways; returns the link count"""
+        self.topology = TopologyGraph(list(self.devices.values()), self.devices_by_mac,
+                                      self.devices_of_type(GATEWAY_TYPES))
+        for link in self.topology.loop_links:
+            logger.warning(f"⚠️  Loop: {link.a.label} port {link.a_port or '?'} ↔ "
+                           f"{link.b.label} port {link.b_port or '?'}")
+        for device in self.topology.component_roots:
+            logger.debug(f"   ❓ No path from a gateway to {device.label}")
+        return len(self.topology.links)
+    
+    def build_firewall_index(self):
+        """Compile the firewall rules and groups against the loaded networks; returns the service count"""
+        self.firewall = FirewallIndex(list(self.networks.values()), self.firewall_rules, self.firewall_groups)
+        return len(self.firewall.services)
+    
+    def reserved_ip(self, host: Client) -> Optional[str]:
+        """A host's fixed IP: its DHCP reservation's if it has one, else its own record's"""
+        reservation = self.reservations.get(host.mac)
+        return reservation.fixed_ip if reservation is not None else host.fixed_ip
+    
+    def host_address(self, host: Client) -> Optional[str]:
+        """The address a host is placed and shown by: its current IP, else its reserved one"""
+        return host.ip or self.reserved_ip(host)
+    
+    def place_clients(self):
+        """Assign connected clients and reservations to networks by longest-prefix match.
+        
+        Also indexes connected clients by the switch port or AP they sit on.
+        A connected client is placed by its own IP, or by its reservation's
+        fixed IP if it has none; reservations for hosts that are not
+        connected are placed as offline hosts. Clients whose address matches
+        no subnet fall back to their reported network_id. Returns the number
+        of hosts placed.
+        """
+        hosts = dict(self.clients)
+        for mac, reservation in self.reservations.items():
+            hosts.setdefault(mac, reservation)
+        
+        self.clients_by_port = {}
+        self.clients_by_ap = {}
+        for client in self.clients.values():
+            if client.wired and client.sw_mac:
+                self.clients_by_port.setdefault((client.sw_mac, client.sw_port), []).append(client)
+            elif client.ap_mac:
+                self.clients_by_ap.setdefault(client.ap_mac, []).append(client)
+        
+        index = PrefixIndex(self.networks.values())
+        self.clients_by_network = {}
+        self.unplaced_clients = []
+        for client in hosts.values():
+            address = self.host_address(client)
+            network = index.lookup(address) if address else None
+            if network is None:
+                network = self.networks.get(client.network_id)
+            if network is None:
+                self.unplaced_clients.append(client)
+            else:
+                self.clients_by_network.setdefault(network.id, []).append(client)
+        return len(hosts)
+    
+    def resolve_ports(self):
+        """Resolve every port's override, profile, VLAN, PoE and peer in one pass; returns the port count"""
+        self.resolved_ports = {}
+        self.resolved_port_index = {}
+        for device in self.devices.values():
+            self.refresh_device_ports(device)
+        return sum(len(ports) for ports in self.resolved_ports.values())
+    
+    def refresh_device_ports(self, device: Device):
+        """Resolve one device's ports again, in its port table and in resolved_port_index"""
+        for port in self.resolved_ports.get(device.id, ()):
+            self.resolved_port_index.pop((device.id, port.idx), None)
+        ports = self.resolved_ports[device.id] = self._resolve_device_ports(device)
+        for port in ports:
+            # The first port reported with an index wins, as in the port tables
+            self.resolved_port_index.setdefault((device.id, port.idx), port)
+    
+    def _resolve_device_ports(self, device: Device) -> List[ResolvedPort]:
+        """Resolve one device's ports against the port profiles, networks and topology"""
+        resolved = []
+        for port in device.ports:
+            if not port.idx:
+                continue
+            override = device.overrides.get(port.idx, DEFAULT_OVERRIDE)
+            
+            profile = self.port_profiles.get(override.portconf_id) if override.portconf_id else None
+            native_network = None
+            tagged_networks = []
+            if profile is not None:
+                if profile.native_network_id:
+                    native_network = self.networks.get(profile.native_network_id)
+                tagged_networks = [self.networks[net_id] for net_id in profile.tagged_network_ids
+                                   if net_id in self.networks]
+            
+            resolved.append(ResolvedPort(port, override, profile, native_network, tagged_networks,
+                                         self.topology.port_peers.get((device.id, port.idx))))
+        return resolved
+    
+    def index_hosts(self):
+        """Index connected clients and reserved hosts for find_host(), and the
+        networks by prefix for trace_host().
+        
+        MACs win over IP addresses and addresses over names, so no host's
+        name can shadow another's MAC; within each, connected clients win
+        over reservations and earlier hosts over later ones. Returns the
+        number of keys.
+        """
+        hosts = list(self.clients.values())
+        hosts.extend(reservation for mac, reservation in self.reservations.items() if mac not in self.clients)
+        self.prefix_index = PrefixIndex(self.networks.values())
+        self.hosts_by_key = {}
+        for host in hosts:
+            if host.mac:
+                self.hosts_by_key.setdefault(host.mac, host)
+        for host in hosts:
+            for address in (host.ip, self.reserved_ip(host)):
+                if address:
+                    self.hosts_by_key.setdefault(address, host)
+        for host in hosts:
+            self.hosts_by_key.setdefault(host.name.lower(), host)
+        return len(self.hosts_by_key)
+    
+    def devices_of_type(self, types) -> List[Device]:
+        """Return devices of the given types in load order"""
+        groups = [self.devices_by_type[t] for t in types if self.devices_by_type.get(t)]
+        if len(groups) == 1:
+            return list(groups[0])
+        merged = [device for group in groups for device in group]
+        merged.sort(key=lambda device: self._device_order[device.id])
+        return merged
+    
+    def connected_device(self, device: Device, port_idx: Any) -> Optional[Device]:
+        """Return the device on the other end of the given port, if any"""
+        return self.topology.port_peers.get((device.id, port_idx))
+    
+    def find_host(self, term: str) -> Optional[Client]:
+        """The connected client or reserved host with this MAC, IP address or name (case-insensitive)"""
+        key = term.strip().lower()
+        return self.hosts_by_key.get(key) or self.hosts_by_key.get(key.replace('-', ':'))
+    
+    def trace_host(self, term: str) -> Optional[HostPath]:
+        """Trace a host, found by find_host(), from its switch port or AP up
+        each uplink to the gateway. Every hop is an index lookup, so a trace
+        costs the path's length whatever the size of the site. Returns None
+        if no host matches; offline hosts have no hops.
+        """
+        host = self.find_host(term)
+        if host is None:
+            return None
+        address = self.host_address(host)
+        network = self.prefix_index.lookup(address) if address else None
+        if network is None:
+            network = self.networks.get(host.network_id)
+        
+        device, port_idx, wireless = None, None, False
+        if host.online and host.wired and host.sw_mac:
+            device, port_idx = self.devices_by_mac.get(host.sw_mac), host.sw_port
+        elif host.online and host.ap_mac:
+            device, wireless = self.devices_by_mac.get(host.ap_mac), True
+        
+        hops = []
+        while device is not None:
+            link = self.topology.parent_link.get(device.id)
+            uplink_idx = link.port_of(device) if link is not None else None
+            hops.append(PathHop(device, port_idx, self._resolved_port(device, port_idx),
+                                uplink_idx, self._resolved_port(device, uplink_idx), wireless))
+            if link is None:
+                break
+            device = link.other(device)
+            port_idx, wireless = link.port_of(device), link.wireless
+        return HostPath(host, address, network, hops)
+    
+    def _resolved_port(self, device: Device, port_idx: Any) -> Optional[ResolvedPort]:
+        if port_idx is None:
+            return None
+        return self.resolved_port_index.get((device.id, port_idx))
+    
+    def node_id(self, device: Device) -> str:
+        """Mermaid node id of a device in the physical topology"""
+        if device is self.gateway:
+            return "Gateway"
+        # The full id: ObjectIds start with a timestamp, so prefixes collide
+        return f"{device.type.upper()}_{device.id}"
+
+    def generate_physical_topology(self) -> str:
+        """Generate physical network topology - actual cable/wireless connections"""
+        return '\n'.join(self.iter_physical_topology())
+    
+    def iter_physical_topology(self) -> Iterator[str]:
+        """Yield the physical topology diagram line by line"""
+        yield "```mermaid"
+        yield from render_mermaid(self.physical_topology_graph())
+        yield "```"
+    
+    def physical_topology_graph(self, node_budget: Optional[int] = None) -> Graph:
+        """Build the physical topology; node_budget overrides the parser's, 0 keeps every device"""
+        graph = Graph('physical_topology')
+        
+        # Add Internet connection
+        graph.node('Internet', "🌐 Internet", 'internet')
+        
+        # Find UDM/Gateway
+        logger.debug("🔍 Looking for gateway device...")
+        gateway = self.gateway
+                
+        if gateway:
+            logger.debug(f"   ✅ Gateway found: {gateway.label}")
+            gateway_name = gateway.name if gateway.name is not None else 'UDM SE'
+            gateway_model = gateway.model or 'UDM SE'
+            gateway_id = "Gateway"
+            graph.node(gateway_id, f"{gateway_name}\n{gateway_model}", 'gateway',
+                       device=gateway.id, mac=gateway.mac, model=gateway.model)
+        else:
+            logger.warning("   ❌ No gateway device found!")
+            gateway_id = "Gateway"
+            graph.node(gateway_id, "UDM SE\nGateway", 'gateway')
+        graph.edge('Internet', gateway_id)
+        
+        # Add devices in breadth-first order, each with the link to its parent.
+        # Large sites collapse detail to stay within the node budget.
+        topology = self.topology
+        drawn, collapsed = self.plan_topology_detail(topology.order, reserved=1, node_budget=node_budget)  # Internet
+        for device in topology.order:
+            if device is gateway or (drawn is not None and device.id not in drawn):
+                continue
+            device_id = self.node_id(device)
+            self._add_device_node(graph, device)
+            
+            link = topology.parent_link.get(device.id)
+            if link is not None:
+                self._add_link_edge(graph, self.node_id(link.other(device)), device, link)
+            elif device.type in GATEWAY_TYPES:
+                graph.edge('Internet', device_id)
+            else:
+                # Top of a chain no gateway reaches; the real uplink is unknown
+                graph.edge(gateway_id, device_id, "Uplink unknown", dashed=True, directed=False)
+        self._add_collapsed_nodes(graph, collapsed)
+        
+        # Links that close a loop (usually blocked by STP)
+        self._add_loop_edges(graph, drawn)
+        return graph
+    
+    def _add_device_node(self, graph: Graph, device: Device):
+        """Add a device's node to a topology diagram"""
+        device_id = self.node_id(device)
+        device_name = device.label
+        data = {'device': device.id, 'mac': device.mac, 'model': device.model}
+        
+        if device.type in SWITCH_TYPES:  # UniFi switches
+            graph.node(device_id, f"{device_name}\nSwitch ({len(device.ports)} ports)", 'switch', **data)
+        elif device.type in AP_TYPES:  # UniFi Access Points
+            # Check if it's wired or wireless uplink
+            if device.uplink_type == 'wireless':
+                connection_type = "📶 Wireless Mesh"
+            else:
+                connection_type = "🔌 Ethernet"
+            graph.node(device_id, f"{device_name}\nAccess Point\n{connection_type}", 'ap', **data)
+        else:
+            kind = 'gateway' if device.type in GATEWAY_TYPES else 'device'
+            graph.node(device_id, f"{device_name}\n{device.model or device.type.upper()}", kind, **data)
+    
+    def _add_link_edge(self, graph: Graph, parent_id: str, device: Device, link: Link):
+        """Add the edge from a parent node down to a device over its parent link"""
+        device_id = self.node_id(device)
+        if link.wireless:
+            graph.edge(parent_id, device_id, "Mesh", dashed=True)
+            return
+        parent_port = link.port_of(link.other(device))
+        port_label = f"Port {parent_port}" if parent_port else "Ethernet"
+        graph.edge(parent_id, device_id, port_label, directed=False)
+    
+    def _add_loop_edges(self, graph: Graph, drawn: Optional[Set[str]], scope: Optional[Set[str]] = None):
+        """Add the loop links with both ends drawn (and, if given, inside scope)"""
+        for link in self.topology.loop_links:
+            if drawn is not None and (link.a.id not in drawn or link.b.id not in drawn):
+                continue
+            if scope is not None and (link.a.id not in scope or link.b.id not in scope):
+                continue
+            a_port = f"Port {link.a_port}" if link.a_port else "?"
+            b_port = f"Port {link.b_port}" if link.b_port else "?"
+            graph.edge(self.node_id(link.a), self.node_id(link.b), f"⚠️ Loop {a_port} ↔ {b_port}",
+                       dashed=True, directed=False)
+    
+    def plan_topology_detail(self, devices: List[Device], reserved: int = 0, node_budget: Optional[int] = None
+                             ) -> Tuple[Optional[Set[str]], Dict[Optional[str], Counter]]:
+        """Choose which of `devices`, a breadth-first walk, a diagram draws.
+        
+        Returns the ids of the drawn devices, or None when all of them fit the
+        node budget alongside `reserved` fixed nodes, and the kinds of device
+        collapsed under each drawn device id. Access points are folded into
+        one node per switch first; if that is still too many nodes, the
+        deepest switch tiers are folded into their parents as well.
+        node_budget overrides the parser's.
+        """
+        budget = self.node_budget if node_budget is None else node_budget
+        if not budget or len(devices) + reserved <= budget:
+            return None, {}
+        
+        depths = [self.topology.depth[device.id] for device in devices]
+        for limit in range(max(depths), min(depths) - 1, -1):
+            drawn, collapsed = self._collapse_topology(devices, limit)
+            if len(drawn) + len(collapsed) + reserved <= budget:
+                break
+        return drawn, collapsed
+    
+    def _collapse_topology(self, devices: List[Device], limit: int
+                           ) -> Tuple[Set[str], Dict[Optional[str], Counter]]:
+        """Draw non-AP devices down to depth `limit`; count the rest under their
+        nearest drawn ancestor (None when there is none, e.g. an orphaned AP)
+        """
+        depth = self.topology.depth
+        drawn: Set[str] = set()
+        collapsed: Dict[Optional[str], Counter] = {}
+        # Nearest drawn ancestor of every device seen so far
+        anchor: Dict[str, Optional[str]] = {}
+        for device in devices:
+            parent = self.topology.parent(device)
+            if parent is not None and parent.id in anchor:
+                top, visible = anchor[parent.id], parent.id in drawn
+            else:
+                top, visible = None, True  # Top of the walk or of this subtree
+            if visible and device.type not in AP_TYPES and depth[device.id] <= limit:
+                drawn.add(device.id)
+                anchor[device.id] = device.id
+            else:
+                anchor[device.id] = top
+                collapsed.setdefault(top, Counter())[_device_kind(device)] += 1
+        return drawn, collapsed
+    
+    def _add_collapsed_nodes(self, graph: Graph, collapsed: Dict[Optional[str], Counter]):
+        """Add one aggregate node per drawn device with collapsed devices below it"""
+        for anchor_id, kinds in collapsed.items():
+            if anchor_id is None:
+                graph.node('UNLINKED_MORE', _collapsed_label(kinds), 'collapsed', devices=sum(kinds.values()))
+                graph.edge('Gateway', 'UNLINKED_MORE', "Uplink unknown", dashed=True, directed=False)
+                continue
+            parent_id = self.node_id(self.devices[anchor_id])
+            graph.node(f'{parent_id}_MORE', _collapsed_label(kinds), 'collapsed', devices=sum(kinds.values()))
+            graph.edge(parent_id, f'{parent_id}_MORE', directed=False)
+
+    def generate_logical_topology(self) -> str:
+        """Generate logical network topology - VLANs and subnets"""
+        return '\n'.join(self.iter_logical_topology())
+    
+    def iter_logical_topology(self) -> Iterator[str]:
+        """Yield the logical topology diagram line by line"""
+        yield "```mermaid"
+        yield from render_mermaid(self.logical_topology_graph())
+        yield "```"
+    
+    def logical_topology_graph(self) -> Graph:
+        """Build the logical topology: networks, their hosts and the first firewall rules"""
+        graph = Graph('logical_topology')
+        
+        # Find gateway for logical connections
+        gateway = self.gateway
+        
+        if gateway:
+            gateway_name = gateway.name if gateway.name is not None else 'UDM SE'
+            graph.node('Router', f"{gateway_name}\nRouter/Firewall", 'gateway', device=gateway.id, mac=gateway.mac)
+        else:
+            graph.node('Router', "UDM SE\nRouter/Firewall", 'gateway')
+        
+        # Add VLANs/Networks as logical segments
+        vlan_nodes = []
+        for network in self.networks.values():
+            vlan = network.vlan
+            
+            vlan_label = f"VLAN {vlan}" if vlan else "Default"
+            node_id = f"VLAN{vlan if vlan else '1'}"
+            
+            graph.node(node_id, f"{network.name}\n{vlan_label}\n{network.subnet}", 'network',
+                       network=network.id, vlan=vlan, subnet=network.subnet)
+            graph.edge('Router', node_id)
+            vlan_nodes.append((node_id, network))
+        
+        # Add hosts to their networks, summarized on busy networks
+        for node_id, network in vlan_nodes:
+            hosts = self.clients_by_network.get(network.id)
+            if not hosts:
+                continue
+            if len(hosts) > CLIENT_DETAIL_LIMIT:
+                wired = sum(1 for host in hosts if host.wired and host.online)
+                offline = sum(1 for host in hosts if not host.online)
+                reserved = sum(1 for host in hosts if self.reserved_ip(host))
+                online = len(hosts) - offline
+                graph.node(f'{node_id}_HOSTS', f"👥 {online} clients ({wired} wired, {online - wired} wireless)"
+                                               f"\n📌 {reserved} reserved, {offline} offline",
+                           'clients', clients=len(hosts))
+                graph.edge(node_id, f'{node_id}_HOSTS')
+                continue
+            addresses = {host.mac: self.host_address(host) for host in hosts}
+            for host in sorted(hosts, key=lambda host: _address_key(addresses[host.mac])):
+                icon = "📌" if not host.online else "🖥️" if host.wired else "📱"
+                host_id = f"HOST_{host.mac.replace(':', '')}"
+                address = addresses[host.mac]
+                graph.node(host_id, f"{icon} {host.name}\n{address or 'No IP'}", 'client',
+                           mac=host.mac, ip=address, online=host.online)
+                graph.edge(node_id, host_id)
+        
+        if self.unplaced_clients:
+            graph.node('UNPLACED', f"❓ {len(self.unplaced_clients)} clients outside known subnets", 'clients',
+                       clients=len(self.unplaced_clients))
+            graph.edge('Router', 'UNPLACED')
+        
+        # Add firewall rules as logical connections
+        if self.firewall_rules:
+            rules = graph.group(None, "Firewall Rules")
+            for i, rule in enumerate(self.firewall_rules[:3]):  # Show first 3 rules
+                if rule.get('enabled', True):
+                    rule_name = rule.get('name', f'Rule {i+1}')
+                    action = rule.get('action', 'allow')
+                    icon = "✅" if action == 'allow' else "❌"
+                    graph.node(f'FW{i}', f"{icon} {rule_name}", 'rule', rules, action=action)
+        return graph
+
+    def generate_switch_details(self) -> str:
+        """Generate detailed switch port configuration"""
+        return '\n'.join(self.iter_switch_details())
+    
+    def iter_switch_details(self) -> Iterator[str]:
+        """Yield the switch details section line by line"""
+        switches = self.devices_of_type(SWITCH_TYPES)
+        
+        if not switches:
+            yield "No switches found in configuration."
+            return
+        
+        yield from self.iter_switch_details_chunk([switch.id for switch in switches])
+    
+    def render_switch_details_chunk(self, device_ids: List[str]) -> str:
+        """Render the switch details of the given switches, in order"""
+        return '\n'.join(self.iter_switch_details_chunk(device_ids))
+    
+    def iter_switch_details_chunk(self, device_ids: List[str]) -> Iterator[str]:
+        for position, device_id in enumerate(device_ids):
+            switch = self.devices[device_id]
+            switch_name = switch.name if switch.name is not None else (switch.model or 'Switch')
+            
+            if position:
+                yield ""
+            yield f"## {switch_name}"
+            yield ""
+            yield from self._iter_switch_graph(switch, self._group_idle_ports(switch))
+    
+    def _group_idle_ports(self, switch: Device, node_budget: Optional[int] = None) -> bool:
+        """Whether a switch's port diagram has more port nodes than the node budget"""
+        budget = self.node_budget if node_budget is None else node_budget
+        return bool(budget) and len(self.resolved_ports.get(switch.id, ())) > budget
+    
+    def _iter_switch_graph(self, switch: Device, group_idle: bool = False) -> Iterator[str]:
+        """Yield one switch's port diagram"""
+        yield "```mermaid"
+        yield from render_mermaid(self.switch_graph(switch, group_idle))
+        yield "```"
+    
+    def switch_graph(self, switch: Device, group_idle: bool = False) -> Graph:
+        """Build one switch's port diagram; with group_idle, runs of idle ports
+        with the same settings share one node
+        """
+        switch_name = switch.name if switch.name is not None else (switch.model or 'Switch')
+        switch_id = f"SW_{switch.id[:8]}"
+        graph = Graph(switch_name)
+        ports_group = graph.group(switch_id, switch_name)
+        
+        def node_key(port: ResolvedPort):
+            if group_idle and not port.up:
+                return (port.profile_name, port.vlan_label, port.poe_mode if port.port.poe else None)
+            return port.idx
+        
+        # Generate port information
+        active_ports = []
+        for _, run in itertools.groupby(self.resolved_ports.get(switch.id, []), key=node_key):
+            run = list(run)
+            port = run[0]
+            status_icon = "🟢" if port.up else "🔴"
+            port_type = port.profile_name or "Access"
+            poe_info = f"\nPoE: {port.poe_mode}" if port.port.poe else ""
+            
+            if len(run) == 1:
+                port_node_id = f"P{port.idx}"
+                port_label = f"{status_icon} {port.name}\n{port_type}\n{port.vlan_label}{poe_info}"
+            else:
+                port_node_id = f"P{port.idx}_{run[-1].idx}"
+                port_label = (f"{status_icon} Ports {port.idx}–{run[-1].idx} idle\n{port_type}\n"
+                              f"{port.vlan_label}{poe_info}")
+            
+            graph.node(port_node_id, port_label, 'port', ports_group, device=switch.id,
+                       ports=[member.idx for member in run], up=port.up, vlan=port.vlan, profile=port.profile_name)
+            
+            if port.up:
+                active_ports.append((port_node_id, port))
+        
+        # Add connections to VLANs for active ports
+        for port_node_id, port in active_ports:
+            if port.vlan is not None:
+                vlan_id = f"VLAN{port.vlan}_EXT"
+                graph.node(vlan_id, f"External {port.vlan_label}", 'network', inline=True, vlan=port.vlan)
+                graph.edge(port_node_id, vlan_id, dashed=True)
+        return graph
+
+    def generate_firewall_matrix(self) -> str:
+        """Generate firewall rules visualization"""
+        return '\n'.join(self.iter_firewall_matrix())
+    
+    def iter_firewall_matrix(self) -> Iterator[str]:
+        """Yield the firewall section line by line"""
+        if not self.firewall_rules:
+            # Generate VLAN isolation matrix instead
+            yield from self.iter_vlan_isolation_matrix()
+            return
+            
+        firewall = self.firewall
+        networks = firewall.networks
+        default = "allowed" if firewall.default_allow else "blocked"
+        yield (f"Reachability between networks from {len(firewall.rules)} enabled rules in evaluation order "
+               f"(first match wins; traffic no rule matches is {default}).")
+        yield ""
+        
+        # Network x network matrix; each cell summarizes every service
+        yield "| From \\ To | " + " | ".join(network.name for network in networks) + " |"
+        yield "|" + "---|" * (len(networks) + 1)
+        for i, source in enumerate(networks):
+            cells = ["—" if i == j else firewall.summary(i, j) for j in range(len(networks))]
+            yield f"| **{source.name}** | " + " | ".join(cells) + " |"
+        yield ""
+        yield "✅ allowed, ❌ blocked. `*` rules on single addresses or address groups treat some hosts differently."
+        yield ""
+        
+        # The compiled rules, groups expanded
+        yield "### Rules"
+        yield ""
+        yield "| # | Rule | Action | Protocol | Source | Destination | Ports |"
+        yield "|---|------|--------|----------|--------|-------------|-------|"
+        for position, rule in enumerate(firewall.rules, 1):
+            action = f"✅ {rule.action}" if rule.allow else f"❌ {rule.action}"
+            yield (f"| {position} | {rule.name} | {action} | {rule.protocol_label} | {rule.source} | "
+                   f"{rule.destination} | {rule.ports or 'None'} |")
+        if firewall.disabled:
+            yield ""
+            yield f"*{firewall.disabled} disabled rules not shown.*"
+
+    def generate_vlan_isolation_matrix(self) -> str:
+        """Generate VLAN isolation matrix when no explicit firewall rules exist"""
+        return '\n'.join(self.iter_vlan_isolation_matrix())
+    
+    def iter_vlan_isolation_matrix(self) -> Iterator[str]:
+        if not self.networks:
+            yield "No network configuration found."
+            return
+            
+        yield "## Firewall Zone Configuration"
+        yield ""
+        yield "*UDM SE uses zone-based firewall. Zone details not accessible via API.*"
+        yield ""
+        
+        # Create VLAN and zone table
+        vlans = []
+        zones = {}
+        
+        for network in self.networks.values():
+            zone_id = network.zone_id
+            vlans.append((network.vlan, network.name, network.subnet, zone_id, network.internet_access))
+            
+            # Group networks by zone
+            if zone_id != 'No Zone':
+                if zone_id not in zones:
+                    zones[zone_id] = []
+                zones[zone_id].append(network.name)
+        
+        vlans.sort(key=lambda x: x[0] if x[0] is not None else 999)  # Sort by VLAN number
+        
+        # Create table header
+        yield "| VLAN | Network Name | Subnet | Internet Access | Firewall Zone |"
+        yield "|------|--------------|--------|-----------------|---------------|"
+        
+        for vlan, name, subnet, zone_id, internet_access in vlans:
+            vlan_display = str(vlan) if vlan is not None else "WAN"
+            internet_icon = "🌐 Yes" if internet_access else "🚫 No"
+            zone_short = zone_id[:8] + "..." if len(zone_id) > 12 else zone_id
+            yield f"| {vlan_display} | {name} | {subnet} | {internet_icon} | {zone_short} |"
+        
+        yield ""
+        
+        # Show firewall zone groupings
+        if zones:
+            yield "### Firewall Zone Groupings:"
+            for zone_id, networks in zones.items():
+                zone_short = zone_id[:12] + "..." if len(zone_id) > 16 else zone_id
+                network_list = ", ".join(networks)
+                yield f"- **Zone {zone_short}**: {network_list}"
+            yield ""
+        
+        yield "### Typical UDM SE Zone-Based Firewall Behavior:"
+        yield "- **Same Zone**: Networks in same zone can communicate freely"
+        yield "- **Different Zones**: Communication blocked by default"
+        yield "- **WAN Zones**: Handle internet/external access"
+        yield "- **Custom Rules**: Can be created between zones in UniFi UI"
+        yield ""
+        
+        # Add cross-VLAN access requirements for your setup
+        yield "### Required Cross-Zone Access for Your Setup:"
+        
+        # Find which zones contain your key services
+        mgmt_networks = [name for vlan, name, _, _, _ in vlans if 'management' in name.lower() or vlan == 1]
+        secure_networks = [name for vlan, name, _, _, _ in vlans if 'secure' in name.lower() or vlan == 20]
+        services_networks = [name for vlan, name, _, _, _ in vlans if 'service' in name.lower() or vlan == 30]
+        
+        if secure_networks and mgmt_networks:
+            yield f"- **{secure_networks[0]} → {mgmt_networks[0]}**: Ports 53, 88, 389, 445, 464 (for AD authentication)"
+        
+        if services_networks and mgmt_networks:
+            yield f"- **{services_networks[0]} → {mgmt_networks[0]}**: Ports 389, 636 (for Keycloak LDAP)"
+        
+        yield ""
+        yield "*Configure these rules in UniFi Network → Settings → Policy Engine → Firewall*"
+
+
+    def generate_port_mapping(self) -> str:
+        """Generate detailed port mapping for cable management"""
+        return '\n'.join(self.iter_port_mapping())
+    
+    def iter_port_mapping(self) -> Iterator[str]:
+        """Yield the port mapping section line by line"""
+        devices = self.devices_of_type(SWITCH_TYPES + GATEWAY_TYPES)
+        
+        if not devices:
+            yield "No switches or gateways found for port mapping."
+            return
+        
+        yield from self.iter_port_mapping_chunk([device.id for device in devices])
+    
+    def render_port_mapping_chunk(self, device_ids: List[str]) -> str:
+        """Render the port mapping tables of the given switches and gateways, in order"""
+        return '\n'.join(self.iter_port_mapping_chunk(device_ids))
+    
+    def iter_port_mapping_chunk(self, device_ids: List[str]) -> Iterator[str]:
+        # Process each device with ports (switches and gateways)
+        for device_id in device_ids:
+            device = self.devices[device_id]
+            device_type = device.type
+            device_name = device.label
+            device_model = device.model
+            
+            # Add device type indicator
+            if device_type in GATEWAY_TYPES:
+                type_label = "Gateway/Router"
+            else:
+                type_label = "Switch"
+                
+            yield f"## {device_name} ({type_label})"
+            if device_model:
+                yield f"*Model: {device_model}*"
+            yield ""
+            
+            yield from self._iter_port_table(device)
+            yield ""
+            yield "---"
+            yield ""
+
+    def _iter_port_table(self, device: Device) -> Iterator[str]:
+        """Yield one device's port table and its summary line"""
+        device_type = device.type
+        
+        # Create port mapping table
+        yield "| Port | Status | Speed | Device Connected | Device Type | VLAN | Profile | PoE | Notes |"
+        yield "|------|--------|-------|------------------|-------------|------|---------|-----|-------|"
+        
+        port_table = device.ports
+        device_mac = device.mac or ''
+        
+        # Process each port
+        for resolved in sorted(self.resolved_ports.get(device.id, []), key=lambda x: x.idx):
+            port = resolved.port
+            port_idx = resolved.idx
+                
+            # Port status
+            is_up = port.up
+            status = "🟢 Up" if is_up else "🔴 Down"
+            
+            # Port speed
+            speed = port.speed
+            speed_str = f"{speed}M" if speed else "N/A"
+            
+            # Connected device info
+            connected_device = "Not Connected"
+            device_connected_type = ""
+            
+            if is_up:
+                other_device = resolved.peer
+                port_clients = self.clients_by_port.get((device_mac, port_idx)) if not other_device else None
+                if port_clients:
+                    connected_device = _client_list(port_clients, self.host_address)
+                    device_connected_type = "Client" if len(port_clients) == 1 else f"Clients ({len(port_clients)})"
+                elif other_device:
+                    connected_device = other_device.label
+                    other_type = other_device.type
+                    if other_type == 'uap':
+                        device_connected_type = "Access Point"
+                    elif other_type in SWITCH_TYPES:
+                        device_connected_type = "Switch"
+                    elif other_type in ['udm', 'usg']:
+                        device_connected_type = "Gateway"
+                    else:
+                        device_connected_type = other_type.upper()
+                
+                # Special handling for gateway ports
+                if device_type in GATEWAY_TYPES and connected_device == "Not Connected":
+                    if port_idx == 1:
+                        connected_device = "Internet/WAN"
+                        device_connected_type = "ISP Connection"
+                    elif port.has_traffic:
+                        connected_device = "LAN Device"
+                        device_connected_type = "Network"
+                
+                # For switches, check for uplink or unknown devices
+                elif device_type in SWITCH_TYPES and connected_device == "Not Connected":
+                    # Without uplink or LLDP data, assume the usual port 1 uplink
+                    if port_idx == 1 and self.topology.uplink_port(device) is None:
+                        connected_device = "Gateway/Router"
+                        device_connected_type = "Uplink"
+                    elif port.has_traffic:
+                        connected_device = "Unknown Device"
+                        device_connected_type = "Unknown"
+            
+            # VLAN and profile info
+            if not resolved.has_profile:
+                profile_name = "Default"
+            else:
+                profile_name = resolved.profile_name if resolved.profile_name is not None else "Custom"
+            
+            # PoE information
+            poe_info = "No"
+            if port.poe:
+                if resolved.poe_watts > 0:
+                    poe_info = f"Yes ({resolved.poe_watts:.1f}W)"
+                else:
+                    poe_info = f"Yes ({resolved.poe_mode})"
+            
+            # Additional notes
+            notes = []
+            if resolved.custom_name and resolved.custom_name != f'Port {port_idx}':
+                notes.append(f"Named: {resolved.custom_name}")
+            if port.full_duplex:
+                notes.append("Full Duplex")
+            stats = self.port_stats.get((device_mac, port_idx))
+            if stats is not None and stats.util_p95 is not None:
+                notes.append(f"📈 p95 {stats.util_p95:.0%}, avg {_format_rate(stats.rx_rate)} in"
+                             f" / {_format_rate(stats.tx_rate)} out")
+            if stats is not None and port.poe and stats.poe_trend:
+                notes.append(f"PoE {stats.poe_avg:.1f}W avg, {stats.poe_trend:+.2f} W/day")
+            if is_up and resolved.peer is not None and resolved.peer.type in AP_TYPES:
+                wireless = len(self.clients_by_ap.get(resolved.peer.mac or '', ()))
+                if wireless:
+                    notes.append(f"📶 {wireless} wireless clients")
+            
+            notes_str = ", ".join(notes) if notes else ""
+            
+            # Add row to table
+            yield f"| {port_idx} | {status} | {speed_str} | {connected_device} | {device_connected_type} | {resolved.vlan_label} | {profile_name} | {poe_info} | {notes_str} |"
+        
+        yield ""
+        
+        # Add summary statistics
+        total_ports = len(port_table)
+        active_ports = sum(1 for p in port_table if p.up)
+        poe_ports = sum(1 for p in port_table if p.poe)
+        
+        yield f"**Summary:** {active_ports}/{total_ports} ports active"
+        if poe_ports > 0:
+            total_poe_power = sum(p.poe_power for p in port_table)
+            yield f", {poe_ports} PoE ports ({total_poe_power:.1f}W total)"
+
+    def page_devices(self) -> List[Device]:
+        """Switches and gateways that get their own page, in cabling order"""
+        return [device for device in self.topology.order if device.type in SWITCH_TYPES + GATEWAY_TYPES]
+    
+    def page_name(self, device: Device) -> str:
+        """File name of a device's page; the id suffix keeps duplicate names apart"""
+        slug = re.sub(r'[^a-z0-9]+', '-', device.label.lower()).strip('-') or device.type
+        return f"{slug}-{device.id[-6:]}.md"
+    
+    def _page_link(self, device: Device) -> str:
+        if device.type in SWITCH_TYPES + GATEWAY_TYPES:
+            return f"[{device.label}]({self.page_name(device)})"
+        return device.label
+    
+    def iter_device_index(self) -> Iterator[str]:
+        """Yield the index page linking every device page"""
+        yield "# Devices"
+        yield ""
+        yield "One page per switch and gateway, in cabling order from the gateway."
+        yield ""
+        yield "| Device | Type | Model | Uplink | Tier | Ports Active | Devices Below |"
+        yield "|--------|------|-------|--------|------|--------------|---------------|"
+        topology = self.topology
+        for device in self.page_devices():
+            type_label = "Gateway/Router" if device.type in GATEWAY_TYPES else "Switch"
+            parent = topology.parent(device)
+            if parent is None:
+                uplink = "Internet" if device.type in GATEWAY_TYPES else "Unknown"
+            else:
+                port = topology.parent_link[device.id].port_of(parent)
+                uplink = self._page_link(parent) + (f" (port {port})" if port else "")
+            active = sum(1 for port in device.ports if port.up)
+            below = len(topology.subtree(device)) - 1
+            yield (f"| {self._page_link(device)} | {type_label} | {device.model or ''} | {uplink} | "
+                   f"{topology.depth[device.id]} | {active}/{len(device.ports)} | {below} |")
+        yield ""
+        yield "*Generated automatically from UniFi configuration*"
+    
+    def device_topology_graph(self, device: Device) -> Graph:
+        """Build the part of the physical topology below a switch or gateway"""
+        topology = self.topology
+        graph = Graph(device.label)
+        link = topology.parent_link.get(device.id)
+        if link is not None:
+            graph.node('UPLINK', f"⬆️ {link.other(device).label}", 'uplink', device=link.other(device).id)
+        subtree = topology.subtree(device)
+        drawn, collapsed = self.plan_topology_detail(subtree, reserved=1 if link is not None else 0)
+        for member in subtree:
+            if drawn is not None and member.id not in drawn:
+                continue
+            self._add_device_node(graph, member)
+            member_link = topology.parent_link.get(member.id)
+            if member is device:
+                if member_link is not None:
+                    self._add_link_edge(graph, 'UPLINK', member, member_link)
+            else:
+                self._add_link_edge(graph, self.node_id(member_link.other(member)), member, member_link)
+        self._add_collapsed_nodes(graph, collapsed)
+        self._add_loop_edges(graph, drawn, scope={member.id for member in subtree})
+        return graph
+    
+    def iter_device_page(self, device: Device) -> Iterator[str]:
+        """Yield one switch or gateway page: its part of the physical
+        topology, the devices cabled below it, its ports and port diagram
+        """
+        topology = self.topology
+        is_gateway = device.type in GATEWAY_TYPES
+        
+        yield f"# {device.label}"
+        yield ""
+        details = "Gateway/Router" if is_gateway else "Switch"
+        if device.model:
+            details += f", model {device.model}"
+        yield f"*{details}* · [All devices](index.md)"
+        yield ""
+        
+        link = topology.parent_link.get(device.id)
+        if link is not None:
+            parent = link.other(device)
+            port = link.port_of(parent)
+            yield f"**Uplink:** {self._page_link(parent)}" + (f", port {port}" if port else "")
+            yield ""
+        
+        # This device's subtree, collapsed to the node budget like the full diagram
+        yield "## Topology"
+        yield ""
+        yield "```mermaid"
+        yield from render_mermaid(self.device_topology_graph(device))
+        yield "```"
+        yield ""
+        
+        children = topology.children.get(device.id, [])
+        if children:
+            yield "## Downstream"
+            yield ""
+            yield "| Port | Device | Type |"
+            yield "|------|--------|------|"
+            for child in children:
+                port = topology.parent_link[child.id].port_of(device)
+                if child.type in AP_TYPES:
+                    child_type = "Access Point"
+                elif child.type in SWITCH_TYPES:
+                    child_type = "Switch"
+                else:
+                    child_type = child.model or child.type.upper()
+                yield f"| {port or '-'} | {self._page_link(child)} | {child_type} |"
+            yield ""
+        
+        yield "## Ports"
+        yield ""
+        yield from self._iter_port_table(device)
+        
+        if device.type in SWITCH_TYPES:
+            yield ""
+            yield ""
+            yield "## Port Configuration"
+            yield ""
+            yield from self._iter_switch_graph(device, self._group_idle_ports(device))
+
+    def iter_sections(self, names, workers: int = 1) -> Iterator[Tuple[str, Iterator[str]]]:
+        """Yield (name, lines) for each named section, in order.
+        
+        Each section's lines must be consumed before moving on to the next one.
+        With more than one worker, sections render in parallel on a process
+        pool and the per-device work of the port mapping and switch details is
+        split into chunks. Chunks are yielded in order as they complete, with
+        only a few in flight per worker, so the output is identical to a
+        serial run and memory stays bounded.
+        """
+        if workers <= 1:
+            for name in names:
+                yield name, getattr(self, f'iter_{name}')()
+            return
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Plan tasks: whole sections, or device chunks for the split sections
+        tasks = []
+        for name in names:
+            devices = self.devices_of_type(SPLIT_SECTIONS[name][0]) if name in SPLIT_SECTIONS else []
+            if not devices:
+                tasks.append((name, None))
+                continue
+            # A few chunks per worker keeps them busy when switch sizes vary
+            chunk_size = max(1, -(-len(devices) // (workers * 4)))
+            for start in range(0, len(devices), chunk_size):
+                tasks.append((name, [device.id for device in devices[start:start + chunk_size]]))
+        
+        # Load up front what the sections read, rather than once per worker
+        self.prepare(names)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # Forked workers inherit the model without pickling it
+            _init_render_worker(self)
+            pool_args = {'mp_context': multiprocessing.get_context('fork')}
+        else:
+            pool_args = {'initializer': _init_render_worker, 'initargs': (self,)}
+        
+        with ProcessPoolExecutor(max_workers=workers, **pool_args) as pool:
+            results = _ordered_results(pool, tasks, window=workers * 2)
+            for name, group in itertools.groupby(results, key=lambda result: result[0]):
+                yield name, _join_chunks(name, (text for _, text in group))
+    
+    def section_graphs(self, name: str, node_budget: Optional[int] = None) -> List[Graph]:
+        """The graphs one of the GRAPH_SECTIONS draws.
+        
+        node_budget overrides the parser's; 0 keeps full detail, as wanted
+        when the graphs are laid out offline rather than by Mermaid.
+        """
+        if name == 'physical_topology':
+            return [self.physical_topology_graph(node_budget)]
+        if name == 'logical_topology':
+            return [self.logical_topology_graph()]
+        if name == 'switch_details':
+            return [self.switch_graph(switch, self._group_idle_ports(switch, node_budget))
+                    for switch in self.devices_of_type(SWITCH_TYPES)]
+        raise ValueError(f"Not a graph section: {name}")
+    
+    def generate_sections(self, names, workers: int = 1) -> Dict[str, str]:
+        """Generate the named sections and return them as a dictionary"""
+        return {name: '\n'.join(lines) for name, lines in self.iter_sections(names, workers)}
+
+    def generate_all_diagrams(self) -> Dict[str, str]:
+        """Generate all Mermaid diagrams and return as dictionary"""
+        return self.generate_sections(SECTION_INPUTS)
+
+
+# Process pool workers each hold one copy of the loaded model
+_worker_model: Optional[UniFiToMermaid] = None
+
+
+def _init_render_worker(model: UniFiToMermaid):
+    global _worker_model
+    _worker_model = model
+
+
+def _render_task(name: str, device_ids: Optional[List[str]]) -> str:
+    if device_ids is None:
+        return getattr(_worker_model, f'generate_{name}')()
+    return getattr(_worker_model, f'render_{name}_chunk')(device_ids)
+
+
+def _ordered_results(pool, tasks, window: int) -> Iterator[Tuple[str, str]]:
+    """Run render tasks on the pool, yielding results in task order with at most `window` pending"""
+    remaining = iter(tasks)
+    pending = deque((name, pool.submit(_render_task, name, device_ids))
+                    for name, device_ids in itertools.islice(remaining, window))
+    while pending:
+        name, future = pending.popleft()
+        for next_name, device_ids in itertools.islice(remaining, 1):
+            pending.append((next_name, pool.submit(_render_task, next_name, device_ids)))
+        yield name, future.result()
+
+
+def _join_chunks(name: str, chunks: Iterator[str]) -> Iterator[str]:
+    """Turn rendered chunks back into the section's line stream"""
+    blank_between = name in SPLIT_SECTIONS and SPLIT_SECTIONS[name][1]
+    for position, chunk in enumerate(chunks):
+        if position and blank_between:
+            yield ""
+        yield chunk
+
+
+class RenderCache:
+    """Input fingerprints and section cache keys from the previous run.
+    
+    Stored next to the generated files. A section is reused when the content
+    hashes of the inputs it depends on, and of this script, are unchanged.
+    File size and mtime are checked first so unchanged inputs are not re-hashed.
+    """
+    FILENAME = '.render-cache.json'
+    
+    def __init__(self, output_dir: Path):
+        self.path = output_dir / self.FILENAME
+        self.inputs: Dict[str, Any] = {}
+        self.sections: Dict[str, str] = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.inputs = data.get('inputs', {})
+            self.sections = data.get('sections', {})
+        except (OSError, ValueError):
+            pass  # No usable cache; everything is regenerated
+        self._fingerprints: Dict[str, str] = {}
+        self._dirty = False
+    
+    def fingerprint(self, path: Path) -> str:
+        """SHA-256 of a file, reusing the cached hash when size and mtime match"""
+        key = str(path.resolve())
+        if key in self._fingerprints:
+            return self._fingerprints[key]
+        
+        cached = self.inputs.get(key)
+        known = (cached['size'], cached['mtime_ns'], cached['sha256']) if cached else None
+        fingerprint = _file_fingerprint(path, known)
+        if fingerprint is None:
+            digest = 'missing'
+        else:
+            size, mtime_ns, digest = fingerprint
+            if fingerprint is not known:
+                self.inputs[key] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': digest}
+                self._dirty = True
+        
+        self._fingerprints[key] = digest
+        return digest
+    
+    def section_key(self, name: str, config_dir: Path, inputs=None, options: str = '') -> str:
+        """Cache key of a section: this script, every input it reads (by
+        default its SECTION_INPUTS) and the rendering options
+        """
+        sha = hashlib.sha256()
+        sha.update(self.fingerprint(Path(__file__)).encode())
+        for filename in inputs if inputs is not None else SECTION_INPUTS[name]:
+            sha.update(f"{filename}={self.fingerprint(config_dir / filename)}".encode())
+        sha.update(options.encode())
+        return sha.hexdigest()
+    
+    def is_fresh(self, name: str, key: str, section_file: Path) -> bool:
+        return self.sections.get(name) == key and section_file.exists()
+    
+    def record(self, name: str, key: str):
+        if self.sections.get(name) != key:
+            self.sections[name] = key
+            self._dirty = True
+    
+    def save(self):
+        """Persist the cache if anything changed since it was read"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        with open(self.path, 'w') as f:
+            json.dump({'inputs': self.inputs, 'sections': self.sections}, f, indent=2)
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Write text to path unless it already holds exactly that, keeping mtimes stable"""
+    with ChangedFileWriter(path) as writer:
+        writer.write(text)
+    return writer.changed
+
+
+class ChangedFileWriter:
+    """Streams text to a temporary file and replaces the target only if the
+    content differs, so unchanged outputs keep their mtimes.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.tmp")
+        self.changed = False
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+    
+    def write(self, text: str):
+        self._file.write(text)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            self.tmp_path.unlink()
+            return
+        if self.path.exists() and filecmp.cmp(self.tmp_path, self.path, shallow=False):
+            self.tmp_path.unlink()
+        else:
+            os.replace(self.tmp_path, self.path)
+            self.changed = True
+
+
+def write_lines(lines: Iterator[str], *writers):
+    """Write lines joined by newlines (no trailing newline) to every writer"""
+    separator = ''
+    for line in lines:
+        text = separator + line
+        for writer in writers:
+            writer.write(text)
+        separator = '\n'
+
+
+def section_header(name: str) -> str:
+    return f"# {name.replace('_', ' ').title()}\n\n"
+
+
+def copy_section_body(section_file: Path, writer):
+    """Stream a previously written section file, minus its title, to writer"""
+    with open(section_file, encoding='utf-8') as f:
+        f.read(len(section_header(section_file.stem)))
+        shutil.copyfileobj(f, writer)
+
+
+def write_documentation(output_dir: Path, sections: Iterator[Tuple[str, Iterator[str]]],
+                        reuse=()) -> List[str]:
+    """Stream rendered sections into their own files and network-documentation.md.
+    
+    `sections` yields (name, lines) in document order, e.g. from
+    UniFiToMermaid.iter_sections(). Sections named in `reuse` are copied from
+    their existing files instead; sections that are neither, as after an
+    --only run with no earlier output, are left out. Returns the names of
+    the section files that changed.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    combined_file = output_dir / 'network-documentation.md'
+    changed = []
+    pending = next(sections, None)
+    
+    with ChangedFileWriter(combined_file) as combined:
+        combined.write(COMBINED_HEADER)
+        for name, heading, intro in COMBINED_SECTIONS:
+            if name not in reuse and (pending is None or pending[0] != name):
+                continue
+            combined.write(f"## {heading}\n\n")
+            if intro:
+                combined.write(f"{intro}\n\n")
+            
+            section_file = output_dir / f'{name}.md'
+            if name in reuse:
+                copy_section_body(section_file, combined)
+                logger.info(f"♻️  Reused: {section_file}")
+            else:
+                # Stream the regenerated section into both files at once
+                _, lines = pending
+                with ChangedFileWriter(section_file) as section:
+                    section.write(section_header(name))
+                    write_lines(lines, section, combined)
+                pending = next(sections, None)
+                if section.changed:
+                    changed.append(name)
+                logger.info(f"📄 {'Generated' if section.changed else 'Unchanged'}: {section_file}")
+            combined.write("\n\n")
+        combined.write(COMBINED_FOOTER)
+    
+    return changed
+
+
+def write_device_pages(model: UniFiToMermaid, pages_dir: Path) -> List[str]:
+    """Write index.md and one page per switch and gateway into pages_dir.
+    
+    Pages of devices that are gone from the export are removed. Returns the
+    names of the pages that changed.
+    """
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    pages = [('index.md', model.iter_device_index())]
+    pages.extend((model.page_name(device), model.iter_device_page(device)) for device in model.page_devices())
+    
+    changed = []
+    for filename, lines in pages:
+        with ChangedFileWriter(pages_dir / filename) as page:
+            write_lines(lines, page)
+        if page.changed:
+            changed.append(filename)
+    
+    current = {filename for filename, _ in pages}
+    for stale in pages_dir.glob('*.md'):
+        if stale.name not in current:
+            stale.unlink()
+            changed.append(stale.name)
+    return changed
+
+
+def write_graphs(model: UniFiToMermaid, graphs_dir: Path, names: Iterable[str], formats: Iterable[str]) -> List[str]:
+    """Write the full-detail graphs of the named GRAPH_SECTIONS in each of the
+    GRAPH_FORMATS, one file per section and format. Every format is rendered
+    from the same graph build. Returns the names of the files that changed.
+    """
+    graphs_dir.mkdir(parents=True, exist_ok=True)
+    changed = []
+    for name in names:
+        if name not in GRAPH_SECTIONS:
+            continue
+        graphs = model.section_graphs(name, node_budget=0)
+        for graph_format in formats:
+            extension, render = GRAPH_FORMATS[graph_format]
+            with ChangedFileWriter(graphs_dir / f"{name}{extension}") as writer:
+                write_lines(render(graphs), writer)
+                writer.write('\n')
+            if writer.changed:
+                changed.append(writer.path.name)
+    return changed
+
+
+def _merge_device_record(record: Dict[str, Any], update: Dict[str, Any]):
+    """Merge a (possibly partial) device record into the stored one; ports
+    are merged by port_idx, as updates may carry only the ports that changed
+    """
+    for key, value in update.items():
+        if key == 'port_table' and record.get('port_table'):
+            ports = {port.get('port_idx'): port for port in record['port_table']}
+            for port in value:
+                if port.get('port_idx') in ports:
+                    ports[port.get('port_idx')].update(port)
+                else:
+                    record['port_table'].append(port)
+        else:
+            record[key] = value
+
+
+def _link_signature(device: Device) -> Tuple[Any, ...]:
+    """The fields of a device the topology graph is built from"""
+    return (device.uplink_type, device.uplink_mac, device.uplink_remote_port, device.uplink_port, device.lldp)
+
+
+def _drawn_signature(device: Device) -> Tuple[Any, ...]:
+    """The fields of a device shown where other devices or the topology refer to it"""
+    return (device.name, device.label, device.model, device.uplink_type, len(device.ports))
+
+
+class LiveDocumentation:
+    """Documentation kept current from controller event-stream messages.
+    
+    Holds a loaded model, the raw device records it was loaded from and the
+    rendered port mapping and switch details of every device. apply() merges
+    one message into the model and marks what it touched: the device itself,
+    the switch a client sits on, the neighbours showing a renamed device, or
+    a whole section. write() re-renders only what was marked and rewrites the
+    documentation from the kept fragments, so a port or client change costs
+    one device's tables rather than the whole site. Only changes to links or
+    device names redraw the topology, and a new device reloads like a full
+    export.
+    """
+    
+    def __init__(self, model: UniFiToMermaid, device_records: Iterable[Dict[str, Any]], output_dir: Path):
+        self.model = model
+        self.records = {record['_id']: record for record in device_records}
+        self.output_dir = output_dir
+        # Rendered text of each split section, by device id
+        self.fragments: Dict[str, Dict[str, str]] = {name: {} for name in SPLIT_SECTIONS}
+        # Sections to render whole, and devices whose fragments are stale
+        self.dirty: Set[str] = set(SECTION_INPUTS)
+        self.dirty_devices: Set[str] = set()
+    
+    def apply(self, message: Dict[str, Any]) -> bool:
+        """Merge one event-stream message into the model; returns whether it was one LiveDocumentation applies"""
+        kind = (message.get('meta') or {}).get('message')
+        records = message.get('data') or []
+        if kind in LIVE_DEVICE_MESSAGES:
+            for record in records:
+                self._update_device(record)
+        elif kind in LIVE_CLIENT_MESSAGES:
+            for record in records:
+                self._update_client(record)
+        elif kind == 'events':
+            for record in records:
+                mac = record.get('user') or record.get('guest')
+                if record.get('key') in CLIENT_LEAVE_EVENTS and mac:
+                    self._remove_client(mac.lower())
+        else:
+            return False
+        return True
+    
+    def _mark(self, device: Optional[Device]):
+        if device is not None:
+            self.dirty_devices.add(device.id)
+    
+    def _mark_neighbours(self, device: Device):
+        """Mark the devices whose port tables show this one"""
+        for link in self.model.topology.adjacency.get(device.id, ()):
+            self._mark(link.other(device))
+    
+    def _update_device(self, update: Dict[str, Any]):
+        model = self.model
+        record = self.records.get(update.get('_id'))
+        if record is None:
+            if update.get('_id') and update.get('mac'):
+                self.records[update['_id']] = dict(update)
+                model.devices[update['_id']] = Device(update)
+                self._reload()
+            return
+        
+        device = model.devices[record['_id']]
+        mac, device_type = device.mac, device.type
+        links, drawn = _link_signature(device), _drawn_signature(device)
+        _merge_device_record(record, update)
+        device.update(record)
+        if device.mac != mac or device.type != device_type:
+            self._reload()
+            return
+        
+        self._mark(device)
+        if _link_signature(device) != links:
+            self._rebuild_topology()
+        else:
+            model.refresh_device_ports(device)
+        if _drawn_signature(device) != drawn:
+            self._mark_neighbours(device)
+            self.dirty.update(('physical_topology', 'logical_topology') if device is model.gateway
+                              else ('physical_topology',))
+    
+    def _rebuild_topology(self):
+        """Rebuild the link graph and re-render the devices whose peers or uplink changed"""
+        model = self.model
+        peers = model.topology.port_peers
+        uplinks = {device.id: model.topology.uplink_port(device) for device in model.devices.values()}
+        model.build('build_topology')
+        
+        new_peers = model.topology.port_peers
+        touched = {key[0] for key in peers.keys() | new_peers.keys() if peers.get(key) is not new_peers.get(key)}
+        touched.update(device.id for device in model.devices.values()
+                       if model.topology.uplink_port(device) != uplinks.get(device.id))
+        touched.update(self.dirty_devices)
+        for device_id in touched:
+            model.refresh_device_ports(model.devices[device_id])
+        self.dirty_devices |= touched
+        self.dirty.add('physical_topology')
+    
+    def _reload(self):
+        """Rebuild every device index and re-render everything drawn from the devices"""
+        model = self.model
+        for step in ('build_indexes', 'build_topology', 'resolve_ports'):
+            model.build(step)
+        self.dirty.update(name for name, inputs in SECTION_INPUTS.items() if 'devices.json' in inputs)
+    
+    def _update_client(self, record: Dict[str, Any]):
+        model = self.model
+        client = Client(record)
+        if not client.mac:
+            return
+        old = model.clients.get(client.mac)
+        if old is not None and self._port_key(old) != self._port_key(client):
+            # Keep the model's client order, which the port tables list clients in
+            del model.clients[client.mac]
+        model.clients[client.mac] = client
+        self._replace_host(old if old is not None else model.reservations.get(client.mac), client)
+    
+    def _remove_client(self, mac: str):
+        client = self.model.clients.pop(mac, None)
+        if client is not None:
+            # A reserved host stays in the logical diagram as offline
+            self._replace_host(client, self.model.reservations.get(mac))
+    
+    # Where place_clients() indexes a host; reservations of offline hosts are not indexed
+    def _port_key(self, client: Client) -> Optional[Tuple[str, Any]]:
+        return (client.sw_mac, client.sw_port) if client.online and client.wired and client.sw_mac else None
+    
+    def _ap_key(self, client: Client) -> Optional[str]:
+        return client.ap_mac if client.online and self._port_key(client) is None else None
+    
+    def _network_key(self, client: Client) -> Optional[str]:
+        address = self.model.host_address(client)
+        network = self.model.prefix_index.lookup(address) if address else None
+        if network is None:
+            network = self.model.networks.get(client.network_id)
+        return network.id if network is not None else None
+    
+    def _replace_host(self, old: Optional[Client], new: Optional[Client]):
+        """Swap one host for another (either may be None) in the client
+        indexes, marking the port tables and diagrams that show it
+        """
+        model = self.model
+        old_address, new_address = (model.host_address(host) if host is not None else None for host in (old, new))
+        old_port, new_port = (self._port_key(host) if host is not None else None for host in (old, new))
+        if _swap(model.clients_by_port, old_port, new_port, old, new) or (
+                new_port is not None and (old.name, old_address) != (new.name, new_address)):
+            for key in (old_port, new_port):
+                if key is not None:
+                    self._mark(model.devices_by_mac.get(key[0]))
+        
+        old_ap, new_ap = (self._ap_key(host) if host is not None else None for host in (old, new))
+        if _swap(model.clients_by_ap, old_ap, new_ap, old, new):
+            # The count of wireless clients is noted on the switch ports facing the AP
+            for key in (old_ap, new_ap):
+                if key is not None and key in model.devices_by_mac:
+                    self._mark_neighbours(model.devices_by_mac[key])
+        
+        # Rebuilt on the next find_host()
+        vars(model).pop('hosts_by_key', None)
+        
+        old_network, new_network = (self._network_key(host) if host is not None else None for host in (old, new))
+        hosts = {None: model.unplaced_clients}
+        for key in (old_network, new_network):
+            if key is not None:
+                hosts[key] = model.clients_by_network.setdefault(key, [])
+        if old is not None:
+            hosts[old_network].remove(old)
+        if new is not None:
+            hosts[new_network].append(new)
+        if old_network is not None and not hosts[old_network]:
+            del model.clients_by_network[old_network]
+        if (old is None or new is None or old_network != new_network
+                or (old.name, old_address, old.wired, old.online) != (new.name, new_address, new.wired, new.online)):
+            self.dirty.add('logical_topology')
+    
+    def write(self) -> Dict[str, Any]:
+        """Re-render what apply() marked and rewrite the documentation.
+        
+        Returns the re-rendered section names, the number of device
+        fragments rendered and the names of the section files that changed.
+        """
+        model = self.model
+        rendered = []
+        fragment_count = 0
+        for name, _, _ in COMBINED_SECTIONS:
+            if name in SPLIT_SECTIONS:
+                fragments = self.fragments[name]
+                devices = model.devices_of_type(SPLIT_SECTIONS[name][0])
+                if name in self.dirty:
+                    fragments.clear()
+                stale = [device for device in devices if device.id not in fragments or device.id in self.dirty_devices]
+                for device in stale:
+                    fragments[device.id] = getattr(model, f'render_{name}_chunk')([device.id])
+                fragment_count += len(stale)
+                if stale or name in self.dirty:
+                    rendered.append(name)
+            elif name in self.dirty:
+                rendered.append(name)
+        self.dirty.clear()
+        self.dirty_devices.clear()
+        
+        def sections():
+            for name in rendered:
+                devices = model.devices_of_type(SPLIT_SECTIONS[name][0]) if name in SPLIT_SECTIONS else []
+                if devices:
+                    yield name, _join_chunks(name, (self.fragments[name][device.id] for device in devices))
+                else:
+                    yield name, getattr(model, f'iter_{name}')()
+        
+        changed = write_documentation(self.output_dir, sections(),
+                                      reuse=[name for name in SECTION_INPUTS if name not in rendered])
+        return {'rendered': rendered, 'fragments': fragment_count, 'changed': changed}
+
+
+def _swap(index: Dict[Any, List[Client]], old_key: Any, new_key: Any,
+          old: Optional[Client], new: Optional[Client]) -> bool:
+    """Replace old with new in a client index, in place when both sit under
+    the same key; returns whether a list gained or lost a client
+    """
+    if old_key is not None and old_key == new_key:
+        clients = index[old_key]
+        clients[clients.index(old)] = new
+        return False
+    if old_key is not None:
+        index[old_key].remove(old)
+        if not index[old_key]:
+            del index[old_key]
+    if new_key is not None:
+        index.setdefault(new_key, []).append(new)
+    return old_key is not None or new_key is not None
+
+
+def generate_site(config_dir: Path, output_dir: Path, stream: bool = False, force: bool = False,
+                  workers: int = 1, profiler: Optional[StageProfiler] = None,
+                  node_budget: int = MERMAID_NODE_BUDGET, device_pages: bool = False,
+                  history_dir: Optional[Path] = None, snapshot_cache: bool = True,
+                  only: Optional[Iterable[str]] = None, graph_formats: Iterable[str] = ()) -> Dict[str, Any]:
+    """Render one export directory into output_dir, reusing unchanged sections.
+    
+    Returns a summary with the regenerated section names and, when the export
+    had to be loaded, its device and network counts. A profiler, if given,
+    records every load and render stage. With device_pages, one page per
+    switch and gateway is also written under output_dir/devices. With a port
+    history store, the port tables note each port's recent traffic. Given
+    `only` section names, just those sections are refreshed and only the
+    export files they read are loaded; other sections keep their existing
+    files. Each of the graph_formats (see GRAPH_FORMATS) also writes the
+    regenerated graph sections, in full detail, under output_dir/graphs.
+    """
+    combined_file = output_dir / 'network-documentation.md'
+    pages_dir = output_dir / DEVICE_PAGES_DIR
+    summary = {'regenerated': [], 'devices': None, 'networks': None}
+    
+    # Work out which sections are stale from the input fingerprints
+    cache = RenderCache(output_dir)
+    history = PortHistory(history_dir) if history_dir is not None else None
+    options = {name: f"node_budget={node_budget}" for name in list(SECTION_INPUTS) + ['device_pages']}
+    if history is not None:
+        # The port tables change with every ingested snapshot
+        for name in ('port_mapping', 'device_pages'):
+            options[name] += f";history={history.fingerprint}"
+    graph_formats = list(graph_formats)
+    if graph_formats:
+        for name in GRAPH_SECTIONS:
+            options[name] += f";graphs={','.join(graph_formats)}"
+    keys = {name: cache.section_key(name, config_dir, options=options[name]) for name in SECTION_INPUTS}
+    selected = [name for name, _, _ in COMBINED_SECTIONS if only is None or name in only]
+    stale = [name for name in selected
+             if force or not cache.is_fresh(name, keys[name], output_dir / f'{name}.md')]
+    pages_stale = False
+    if device_pages:
+        keys['device_pages'] = cache.section_key('device_pages', config_dir, DEVICE_PAGE_INPUTS, options['device_pages'])
+        pages_stale = force or not cache.is_fresh('device_pages', keys['device_pages'], pages_dir / 'index.md')
+    
+    if not stale and not pages_stale and combined_file.exists():
+        cache.save()
+        logger.info("✅ Inputs unchanged, documentation is up to date")
+        return summary
+    
+    sections = iter(())
+    if stale or pages_stale:
+        parser = UniFiToMermaid(config_dir, stream=stream, profiler=profiler, node_budget=node_budget,
+                                snapshot_cache=snapshot_cache)
+        parser.load_configs(sections=stale if only is not None else None)
+        if history is not None:
+            parser.load_history(history)
+        summary['regenerated'] = list(stale)
+        if stale:
+            sections = parser.iter_sections(stale, workers=workers)
+            if profiler is not None:
+                sections = profiler.iter_sections(sections)
+    
+    write_documentation(output_dir, sections, reuse=[name for name in SECTION_INPUTS if name not in stale
+                                                     and (output_dir / f'{name}.md').exists()])
+    if graph_formats and any(name in GRAPH_SECTIONS for name in stale):
+        with parser._stage('graphs') as record:
+            changed = write_graphs(parser, output_dir / GRAPHS_DIR, stale, graph_formats)
+            record['items'] = len(changed)
+        logger.info(f"🕸️  Graphs: {output_dir / GRAPHS_DIR} ({len(changed)} changed)")
+    for name in stale:
+        cache.record(name, keys[name])
+    
+    if pages_stale:
+        with parser._stage('device_pages') as record:
+            changed = write_device_pages(parser, pages_dir)
+            record['items'] = len(parser.page_devices())
+        cache.record('device_pages', keys['device_pages'])
+        summary['regenerated'].append('device_pages')
+        logger.info(f"📑 Device pages: {pages_dir / 'index.md'} ({len(changed)} changed)")
+    if stale or pages_stale:
+        # Counted after rendering, so a selective run does not load devices just for this
+        summary['devices'] = len(parser.devices) if parser.is_loaded('devices') else None
+        summary['networks'] = len(parser.networks) if parser.is_loaded('networks') else None
+    cache.save()
+    
+    logger.info(f"📚 Combined documentation: {combined_file}")
+    return summary
+
+
+def load_manifest(manifest_path: Path) -> List[Dict[str, str]]:
+    """Read a batch manifest: a JSON list of sites, or {"sites": [...]}.
+    
+    Each site is a directory path or {"name": ..., "config_dir": ...}.
+    Relative paths are resolved against the manifest's directory.
+    """
+    with open(manifest_path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('sites', [])
+    
+    sites = []
+    for entry in data:
+        if isinstance(entry, str):
+            entry = {'config_dir': entry}
+        config_dir = manifest_path.parent / entry['config_dir']
+        sites.append({'name': entry.get('name') or config_dir.resolve().name, 'config_dir': str(config_dir)})
+    return sites
+
+
+def _run_site(site: Dict[str, Any]) -> Dict[str, Any]:
+    """Batch worker: generate one site, capturing its output and any error"""
+    result = {'name': site['name'], 'config_dir': site['config_dir'], 'status': 'ok', 'error': None}
+    started = time.perf_counter()
+    with capture_log() as log:
+        try:
+            result.update(generate_site(Path(site['config_dir']), Path(site['output_dir']),
+                                        stream=site['stream'], force=site['force']))
+        except Exception as e:  # One broken site must not abort the batch
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}" if not isinstance(e, ConfigError) else str(e)
+            result['log'] = log.getvalue()
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def batch_index(results: List[Dict[str, Any]]) -> str:
+    """Markdown index page linking every site's documentation"""
+    lines = ["# Network Documentation Index", ""]
+    lines.append("| Site | Status | Devices | Networks | Time | Documentation |")
+    lines.append("|------|--------|---------|----------|------|---------------|")
+    for result in sorted(results, key=lambda r: r['name']):
+        status = "✅ OK" if result['status'] == 'ok' else f"❌ {result['error']}"
+        devices = result.get('devices')
+        networks = result.get('networks')
+        link = f"[{result['name']}]({result['name']}/network-documentation.md)" if result['status'] == 'ok' else ""
+        lines.append(f"| {result['name']} | {status} | {devices if devices is not None else '-'} | "
+                     f"{networks if networks is not None else '-'} | {result['seconds']:.2f}s | {link} |")
+    lines.append("")
+    lines.append("*Generated automatically from UniFi configuration*")
+    return '\n'.join(lines)
+
+
+def batch_main(argv: List[str]):
+    from concurrent.futures import ProcessPoolExecutor
+    
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py batch',
+                                         description="Generate documentation for many sites in parallel")
+    arg_parser.add_argument('site_dirs', nargs='*', help="Export directories, one per site")
+    arg_parser.add_argument('--manifest', help="JSON manifest listing the sites to generate")
+    arg_parser.add_argument('--output-root', default='network-diagrams',
+                            help="Directory receiving one sub-directory per site (default: network-diagrams)")
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of worker processes (default: CPU count)")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="Stream devices.json one device at a time to bound memory on very large exports")
+    arg_parser.add_argument('--force', action='store_true',
+                            help="Regenerate every section even if its inputs are unchanged")
+    arg_parser.add_argument('--quiet', action='store_true', help="Only report failures")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=args.quiet)
+    
+    sites = [{'name': Path(d).resolve().name, 'config_dir': d} for d in args.site_dirs]
+    if args.manifest:
+        sites.extend(load_manifest(Path(args.manifest)))
+    if not sites:
+        arg_parser.error("no sites given; pass site directories or --manifest")
+    
+    names = [site['name'] for site in sites]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        arg_parser.error(f"duplicate site names: {', '.join(duplicates)} (name them in a manifest)")
+    
+    output_root = Path(args.output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    for site in sites:
+        site.update(output_dir=str(output_root / site['name']), stream=args.stream, force=args.force)
+    
+    logger.info(f"🚀 Generating {len(sites)} sites with {args.workers} workers...")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = []
+        for result in pool.map(_run_site, sites):
+            if result['status'] == 'ok':
+                logger.info(f"   ✅ {result['name']}: {result['seconds']:.2f}s")
+            else:
+                logger.error(f"   ❌ {result['name']}: {result['seconds']:.2f}s ({result['error']})")
+            results.append(result)
+    
+    write_if_changed(output_root / 'index.md', batch_index(results))
+    with open(output_root / 'batch-results.json', 'w') as f:
+        json.dump({'seconds': round(time.perf_counter() - started, 3), 'sites': results}, f, indent=2)
+    
+    failed = [r for r in results if r['status'] != 'ok']
+    logger.info(f"📚 Index: {output_root / 'index.md'}")
+    if failed:
+        logger.error(f"⚠️  {len(failed)} of {len(results)} sites failed")
+        sys.exit(1)
+    logger.info("🎉 All sites generated successfully!")
+
+
+def reach_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py reach',
+                                         description="Check what the firewall lets one network reach on another")
+    arg_parser.add_argument('source', help="Source network name or id")
+    arg_parser.add_argument('destination', help="Destination network name or id")
+    arg_parser.add_argument('service', nargs='?',
+                            help="Protocol with optional port, e.g. tcp/445, udp/53 or icmp (default: every service)")
+    arg_parser.add_argument('--config-dir', default='.',
+                            help="Directory containing the exported JSON files (default: current directory)")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=True)
+    
+    parser = UniFiToMermaid(args.config_dir)
+    try:
+        # Only the files the firewall is compiled from are read
+        parser.load_configs(sections=['firewall_matrix'])
+        firewall = parser.firewall
+    except ConfigError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    try:
+        i, j = firewall.network_index(args.source), firewall.network_index(args.destination)
+    except KeyError as e:
+        arg_parser.error(str(e.args[0]))
+    route = f"{firewall.networks[i].name} → {firewall.networks[j].name}"
+    
+    if not args.service:
+        for label, allowed, conditional in firewall.verdicts(i, j):
+            note = " (some hosts differ)" if conditional else ""
+            print(f"{'✅' if allowed else '❌'} {route} {label}{note}")
+        return
+    
+    protocol, _, port = args.service.partition('/')
+    try:
+        port = int(port) if port else None
+    except ValueError:
+        arg_parser.error(f"invalid port: {port}")
+    if port is not None:
+        if protocol.lower() not in PORT_PROTOCOLS:
+            arg_parser.error(f"{protocol} has no ports; use one of {', '.join(PORT_PROTOCOLS)} with a port")
+        if not PORT_MIN <= port <= PORT_MAX:
+            arg_parser.error(f"port {port} is outside {PORT_MIN}-{PORT_MAX}")
+    allowed = firewall.can_reach(args.source, args.destination, protocol, port)
+    rule = firewall.first_match(args.source, args.destination, protocol, port)
+    if rule is None:
+        reason = "no rule matches; default policy"
+    else:
+        host_level = ", host-level" if rule.partial else ""
+        reason = f"rule {firewall.rules.index(rule) + 1} '{rule.name}': {rule.action}{host_level}"
+    print(f"{'✅ allowed' if allowed else '❌ blocked'}: {route} {args.service} ({reason})")
+
+
+def _path_port(port_idx: Any, port: Optional[ResolvedPort]) -> str:
+    """A port on a traced path, as port 14 (Desk 14): VLAN 10, profile Office"""
+    if port is None:
+        return f"port {port_idx}" if port_idx is not None else "port unknown"
+    name = f" ({port.custom_name})" if port.custom_name and port.custom_name != f'Port {port.idx}' else ""
+    profile = port.profile_name or ("Custom" if port.has_profile else "Default")
+    return f"port {port.idx}{name}: {port.vlan_label}, profile {profile}"
+
+
+def iter_host_path(path: HostPath) -> Iterator[str]:
+    """Yield a traced path as lines: the host, then one line per hop up to the gateway"""
+    host = path.host
+    icon = "📌" if not host.online else "🖥️ " if host.wired else "📱"
+    network = (f"{path.network.name} ({'VLAN ' + str(path.network.vlan) if path.network.vlan else 'Default'})"
+               if path.network is not None else "no known network")
+    yield f"{icon} {host.name} ({path.address or 'No IP'}, {host.mac}) on {network}"
+    if not host.online:
+        yield "   Offline: known only from its DHCP reservation"
+        return
+    if not path.hops:
+        yield "   ❓ Its switch or AP is not in the export"
+        return
+    for position, hop in enumerate(path.hops):
+        if hop.wireless:
+            # The host's own association first, mesh uplinks after it
+            arrival = "📶 wireless" if position == 0 else "📶 mesh"
+        else:
+            arrival = _path_port(hop.port_idx, hop.port)
+        uplink = f"; uplink {_path_port(hop.uplink_idx, hop.uplink)}" if hop.uplink_idx is not None else ""
+        yield f"   → {hop.device.label} {arrival}{uplink}"
+    if not path.complete:
+        yield f"   ❓ No known uplink beyond {path.hops[-1].device.label}"
+
+
+def trace_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py trace',
+                                         description="Show where hosts are plugged in: the switch port or AP "
+                                                     "and every uplink hop to the gateway")
+    arg_parser.add_argument('hosts', nargs='+', metavar='HOST', help="Host MAC, IP address or name")
+    arg_parser.add_argument('--config-dir', default='.',
+                            help="Directory containing the exported JSON files (default: current directory)")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=True)
+    
+    parser = UniFiToMermaid(args.config_dir)
+    try:
+        # The snapshot cache holds the built indexes, so a repeat trace parses nothing
+        parser.load_configs()
+    except ConfigError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    
+    missing = False
+    for term in args.hosts:
+        path = parser.trace_host(term)
+        if path is None:
+            print(f"❓ No host matches {term}")
+            missing = True
+            continue
+        for line in iter_host_path(path):
+            print(line)
+    if missing:
+        sys.exit(1)
+
+
+def snapshot_devices(path: Path) -> Tuple[List[Device], Optional[float]]:
+    """Read a devices.json snapshot, streaming it, and return its devices
+    with the newest last_seen time reported by any of them
+    """
+    devices = []
+    last_seen = None
+    for raw in iter_json_array(path):
+        devices.append(Device(raw))
+        if isinstance(raw.get('last_seen'), (int, float)):
+            last_seen = max(last_seen or 0, raw['last_seen'])
+    return devices, last_seen
+
+
+def _parse_time(value: str) -> float:
+    """Epoch seconds, or an ISO 8601 time (UTC unless it has an offset)"""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def history_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py history',
+                                         description="Record port counters from successive exports and report on them")
+    actions = arg_parser.add_subparsers(dest='action', required=True)
+    ingest = actions.add_parser('ingest', help="Append devices.json snapshots to the store")
+    ingest.add_argument('snapshots', nargs='+', help="devices.json files or export directories, oldest first")
+    ingest.add_argument('--at', help="Time of the snapshot when ingesting one (epoch seconds or ISO 8601); "
+                                     "default: the newest last_seen in it, else the file's modification time")
+    report = actions.add_parser('report', help="Write per-port rates, percentiles and utilization heatmaps")
+    report.add_argument('--output', help="Markdown file to write (default: standard output)")
+    report.add_argument('--bucket', choices=HEATMAP_BUCKETS, default='day', help="Heatmap cell size (default: day)")
+    report.add_argument('--buckets', type=int, default=14, help="Heatmap cells per port (default: 14)")
+    for action in (ingest, report):
+        action.add_argument('--store', default='port-history',
+                            help="Directory of the port history store (default: port-history)")
+    args = arg_parser.parse_args(argv)
+    at = None
+    if args.action == 'ingest' and args.at:
+        if len(args.snapshots) > 1:
+            arg_parser.error("--at needs exactly one snapshot")
+        try:
+            at = _parse_time(args.at)
+        except ValueError:
+            arg_parser.error(f"--at takes epoch seconds or an ISO 8601 time, not {args.at!r}")
+    configure_logging()
+    history = PortHistory(Path(args.store))
+    
+    if args.action == 'report':
+        lines = history.iter_report(bucket=args.bucket, buckets=args.buckets)
+        if args.output:
+            write_if_changed(Path(args.output), '\n'.join(lines) + '\n')
+            logger.info(f"📈 Port usage report: {args.output}")
+        else:
+            for line in lines:
+                print(line)
+        return
+    
+    for snapshot in map(Path, args.snapshots):
+        path = snapshot / 'devices.json' if snapshot.is_dir() else snapshot
+        try:
+            devices, last_seen = snapshot_devices(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ {path}: {e}")
+            sys.exit(1)
+        taken = at if at is not None else (last_seen or path.stat().st_mtime)
+        try:
+            ports = history.ingest(devices, taken)
+        except ValueError as e:
+            logger.warning(f"⚠️  Skipped {path}: {e}")
+            continue
+        logger.info(f"✅ {path}: {ports} ports at {_format_time(taken)}")
+    logger.info(f"📦 {len(history.times)} snapshots of {len(history.ports)} ports in {args.store}")
+
+
+def diff_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py diff',
+                                         description="Report what changed between two exports")
+    arg_parser.add_argument('old', help="Export directory of the earlier snapshot")
+    arg_parser.add_argument('new', help="Export directory of the later snapshot")
+    arg_parser.add_argument('--output', help="Markdown file to write (default: standard output)")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="Stream devices.json one device at a time to bound memory on very large exports")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=True)
+    
+    records = []
+    for config_dir in (args.old, args.new):
+        parser = UniFiToMermaid(config_dir, stream=args.stream)
+        try:
+            parser.load_configs()
+        except ConfigError as e:
+            logger.error(f"❌ {config_dir}: {e}")
+            sys.exit(1)
+        records.append(SnapshotRecords(parser))
+        del parser  # Only the records of each snapshot are kept
+    
+    lines = SnapshotDiff(*records).iter_report(args.old, args.new)
+    if args.output:
+        write_if_changed(Path(args.output), '\n'.join(lines) + '\n')
+    else:
+        for line in lines:
+            print(line)
+
+
+# Subcommands as (module, function); anything else is treated as a single-site run.
+# Each module is imported only when its command runs.
+COMMANDS = {
+    'batch': (__name__, 'batch_main'),
+    'reach': (__name__, 'reach_main'),
+    'trace': (__name__, 'trace_main'),
+    'history': (__name__, 'history_main'),
+    'diff': (__name__, 'diff_main'),
+    'inventory': ('unifi_inventory', 'inventory_main'),
+    'query': ('unifi_inventory', 'query_main'),
+    'serve': ('unifi_serve', 'serve_main'),
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        module, function = COMMANDS[sys.argv[1]]
+        getattr(importlib.import_module(module), function)(sys.argv[2:])
+        return
+    
+    arg_parser = argparse.ArgumentParser(description="Convert UniFi API JSON exports to Mermaid diagrams",
+                                         epilog="Subcommands: " + ", ".join(COMMANDS) + " (see <command> --help)")
+    arg_parser.add_argument('config_dir', nargs='?', default='.',
+                            help="Directory containing the exported JSON files (default: current directory)")
+    arg_parser.add_argument('--output-dir', default='network-diagrams',
+                            help="Directory to write the documentation to (default: network-diagrams)")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="Stream devices.json one device at a time to bound memory on very large exports")
+    arg_parser.add_argument('--force', action='store_true',
+                            help="Regenerate every section even if its inputs are unchanged")
+    arg_parser.add_argument('--no-snapshot-cache', action='store_true',
+                            help="Always parse the JSON files; do not read or write the snapshot cache "
+                                 f"(under ~/.cache/{'/'.join(SNAPSHOT_CACHE_DIR)})")
+    arg_parser.add_argument('--only', metavar='SECTIONS',
+                            help="Refresh only these comma-separated sections, reading only the files they need "
+                                 f"({', '.join(SECTION_INPUTS)})")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="Render sections and per-device tables on this many processes (default: 1)")
+    arg_parser.add_argument('--node-budget', type=int, default=MERMAID_NODE_BUDGET,
+                            help="Collapse detail in diagrams with more nodes than this; 0 draws everything "
+                                 f"(default: {MERMAID_NODE_BUDGET})")
+    arg_parser.add_argument('--history', metavar='STORE',
+                            help="Port history store (see the history command) to add traffic notes to the port tables")
+    arg_parser.add_argument('--graph-formats', metavar='FORMATS',
+                            help="Also write the topology and switch graphs in full detail to "
+                                 f"{GRAPHS_DIR}/ in these comma-separated formats ({', '.join(GRAPH_FORMATS)}), "
+                                 "for layout with Graphviz or loading into other tools")
+    arg_parser.add_argument('--device-pages', action='store_true',
+                            help=f"Also write one page per switch and gateway, with an index, to {DEVICE_PAGES_DIR}/")
+    verbosity = arg_parser.add_mutually_exclusive_group()
+    verbosity.add_argument('--quiet', action='store_true', help="Only report warnings and errors")
+    verbosity.add_argument('--verbose', action='store_true', help="Also report per-stage detail")
+    arg_parser.add_argument('--profile', metavar='FILE',
+                            help="Write a JSON report of time, memory and item counts per stage to FILE")
+    args = arg_parser.parse_args()
+    configure_logging(quiet=args.quiet, verbose=args.verbose)
+    only = None
+    if args.only is not None:
+        only = [name.strip() for name in args.only.split(',') if name.strip()]
+        unknown = [name for name in only if name not in SECTION_INPUTS]
+        if unknown or not only:
+            arg_parser.error(f"--only takes section names from: {', '.join(SECTION_INPUTS)}")
+    
+    graph_formats = [name.strip() for name in (args.graph_formats or '').split(',') if name.strip()]
+    unknown = [name for name in graph_formats if name not in GRAPH_FORMATS]
+    if unknown:
+        arg_parser.error(f"--graph-formats takes formats from: {', '.join(GRAPH_FORMATS)}")
+    
+    profiler = StageProfiler() if args.profile else None
+    started = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    try:
+        generate_site(Path(args.config_dir), Path(args.output_dir), stream=args.stream, force=args.force,
+                      workers=args.workers, profiler=profiler, node_budget=args.node_budget,
+                      device_pages=args.device_pages,
+                      history_dir=Path(args.history) if args.history else None,
+                      snapshot_cache=not args.no_snapshot_cache, only=only, graph_formats=graph_formats)
+    except ConfigError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+    
+    if profiler is not None:
+        report = profiler.report(config_dir=args.config_dir, output_dir=args.output_dir, stream=args.stream,
+                                 workers=args.workers, node_budget=args.node_budget, started=started)
+        with open(args.profile, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"⏱️  Profile: {args.profile}")
+    logger.info("🎉 All network diagrams generated successfully!")
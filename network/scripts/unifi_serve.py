@@ -0,0 +1,430 @@
+"""
+HTTP server for the serve command of unifi-to-mermaid.py: each site's
+documentation rendered on demand from exports held in memory
+"""
+
+import argparse
+import hashlib
+import html
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from unifi_mermaid import (COMBINED_SECTIONS, GRAPH_FORMATS, GRAPH_SECTIONS, GRAPHS_DIR, MERMAID_NODE_BUDGET,
+                           OPTIONAL_FILES, REQUIRED_FILES, SECTION_INPUTS, ConfigError, UniFiToMermaid,
+                           _file_fingerprint, _same_fingerprints, configure_logging, load_manifest, logger,
+                           section_header)
+
+
+# How often a served site checks its export files for changes, in seconds
+SERVE_CHECK_SECONDS = 1.0
+
+# Browser page wrapping Markdown rendered to HTML on the server. Every
+# controller-supplied string is escaped; the page runs no script but Mermaid
+# served from this server, and Mermaid sanitizes the diagram labels itself.
+SERVE_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>body {{ font-family: sans-serif; max-width: 80em; margin: 1em auto; padding: 0 1em; }}
+table {{ border-collapse: collapse; }} th, td {{ border: 1px solid #ccc; padding: 0.2em 0.5em; }}</style>
+{scripts}</head>
+<body>
+<nav>{nav}</nav>
+<main>
+{body}
+</main>
+</body>
+</html>
+"""
+SERVE_SCRIPTS = '<script src="/mermaid.min.js" defer></script>\n<script src="/mermaid-init.js" defer></script>\n'
+SERVE_MERMAID_INIT = ("mermaid.initialize({ startOnLoad: false, securityLevel: 'strict', maxTextSize: 1000000 });\n"
+                      "mermaid.run();\n")
+# Served pages may only load scripts from this server
+SERVE_CSP = ("default-src 'none'; script-src 'self'; style-src 'self' 'unsafe-inline'; "
+             "img-src 'self' data:; font-src 'self' data:")
+# Mermaid is looked for here when serve is given no --mermaid-js
+SERVE_MERMAID_JS = Path(__file__).resolve().parent / 'mermaid.min.js'
+
+MARKDOWN_INLINE = re.compile(r'`([^`]+)`|\*\*(.+?)\*\*|\*([^*\s](?:[^*]*[^*\s])?)\*|\[([^\]]+)\]\(([^)\s]+)\)'
+                             r'|(<br\s*/?>)|\\([\\`*_\[\]|#-])')
+MARKDOWN_TABLE_SEPARATOR = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+
+
+def _markdown_inline(text: str) -> str:
+    """HTML for one line of Markdown text; everything but the generated markup is escaped"""
+    out = []
+    position = 0
+    for match in MARKDOWN_INLINE.finditer(text):
+        out.append(html.escape(text[position:match.start()]))
+        position = match.end()
+        code, strong, emphasis, label, href, line_break, escaped = match.groups()
+        if code is not None:
+            out.append(f"<code>{html.escape(code)}</code>")
+        elif strong is not None:
+            out.append(f"<strong>{_markdown_inline(strong)}</strong>")
+        elif emphasis is not None:
+            out.append(f"<em>{_markdown_inline(emphasis)}</em>")
+        elif label is not None:
+            # Only relative and web links; javascript: and the like stay text
+            if urllib.parse.urlsplit(href).scheme in ('', 'http', 'https'):
+                out.append(f'<a href="{html.escape(href)}">{_markdown_inline(label)}</a>')
+            else:
+                out.append(_markdown_inline(label))
+        elif line_break is not None:
+            out.append("<br>")
+        else:
+            out.append(html.escape(escaped))
+    out.append(html.escape(text[position:]))
+    return ''.join(out)
+
+
+def _markdown_cells(line: str) -> List[str]:
+    """The cells of a Markdown table row, split on unescaped pipes"""
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    return [cell.strip() for cell in re.split(r'(?<!\\)\|', line)]
+
+
+def markdown_html(markdown: str) -> str:
+    """HTML for the Markdown these docs are written in: headings, paragraphs,
+    lists, tables, rules and code blocks, with Mermaid blocks left for Mermaid
+    """
+    lines = markdown.split('\n')
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+        if not stripped:
+            i += 1
+        elif stripped.startswith('```'):
+            language = stripped[3:].strip()
+            i += 1
+            code = []
+            while i < len(lines) and lines[i].strip() != '```':
+                code.append(lines[i])
+                i += 1
+            i += 1
+            text = html.escape('\n'.join(code))
+            out.append(f'<pre class="mermaid">{text}</pre>' if language == 'mermaid' else f"<pre><code>{text}</code></pre>")
+        elif re.match(r'#{1,6} ', stripped):
+            level = len(stripped) - len(stripped.lstrip('#'))
+            out.append(f"<h{level}>{_markdown_inline(stripped[level:].strip())}</h{level}>")
+            i += 1
+        elif stripped == '---':
+            out.append("<hr>")
+            i += 1
+        elif stripped.startswith('|') and i + 1 < len(lines) and MARKDOWN_TABLE_SEPARATOR.match(lines[i + 1].strip()):
+            rows = ["<tr>" + ''.join(f"<th>{_markdown_inline(cell)}</th>" for cell in _markdown_cells(line)) + "</tr>"]
+            i += 2
+            while i < len(lines) and lines[i].strip().startswith('|'):
+                rows.append("<tr>" + ''.join(f"<td>{_markdown_inline(cell)}</td>" for cell in _markdown_cells(lines[i]))
+                            + "</tr>")
+                i += 1
+            out.append("<table>\n" + '\n'.join(rows) + "\n</table>")
+        elif stripped.startswith('- '):
+            items = []
+            while i < len(lines) and lines[i].strip().startswith('- '):
+                items.append(f"<li>{_markdown_inline(lines[i].strip()[2:])}</li>")
+                i += 1
+            out.append("<ul>\n" + '\n'.join(items) + "\n</ul>")
+        else:
+            paragraph = []
+            while i < len(lines) and lines[i].strip() and not re.match(r'```|#{1,6} |---$|- |\|', lines[i].strip()):
+                paragraph.append(_markdown_inline(lines[i].strip()))
+                i += 1
+            if not paragraph:
+                # A table row without a separator below it is plain text
+                paragraph.append(_markdown_inline(stripped))
+                i += 1
+            out.append("<p>" + '\n'.join(paragraph) + "</p>")
+    return '\n'.join(out)
+
+
+def serve_page(title: str, markdown: str, nav: str = '', diagrams: bool = False) -> str:
+    """Browser page showing Markdown; with diagrams, Mermaid draws its code
+    blocks, otherwise they show as source
+    """
+    return SERVE_PAGE.format(title=html.escape(title), nav=nav, body=markdown_html(markdown),
+                             scripts=SERVE_SCRIPTS if diagrams else '')
+
+
+class ServedPage:
+    """A rendered page, its ETag and the export files it was rendered from"""
+    __slots__ = ('body', 'content_type', 'etag', 'inputs')
+    
+    def __init__(self, body: Any, content_type: str, inputs: Iterable[str]):
+        self.body = body.encode('utf-8') if isinstance(body, str) else body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=16).hexdigest() + '"'
+        self.inputs = set(inputs)
+
+
+class ServedSite:
+    """One export directory served from memory.
+    
+    The model is loaded once and each page is rendered on its first request
+    and kept. At most every SERVE_CHECK_SECONDS a request checks the export
+    files (by size and mtime first, like the snapshot cache); when one has
+    changed the model is reloaded and only the pages rendered from that file
+    are dropped.
+    """
+    
+    def __init__(self, name: str, config_dir: Path, node_budget: int = MERMAID_NODE_BUDGET, diagrams: bool = False):
+        self.name = name
+        self.config_dir = Path(config_dir)
+        self.node_budget = node_budget
+        # Whether pages load Mermaid to draw their diagrams
+        self.diagrams = diagrams
+        self.model: Optional[UniFiToMermaid] = None
+        self.inputs: Dict[str, Any] = {}
+        self.pages: Dict[str, ServedPage] = {}
+        self.checked = 0.0
+        self.loads = 0
+        self.lock = threading.Lock()
+    
+    def refresh(self):
+        """Reload the model if an export file changed. Raises ConfigError if
+        the export cannot be loaded and there is no earlier model to keep serving
+        """
+        now = time.monotonic()
+        if self.model is not None and now - self.checked < SERVE_CHECK_SECONDS:
+            return
+        self.checked = now
+        inputs = {filename: _file_fingerprint(self.config_dir / filename, self.inputs.get(filename))
+                  for filename in REQUIRED_FILES + OPTIONAL_FILES}
+        changed = {filename for filename in inputs
+                   if not _same_fingerprints({filename: inputs[filename]}, {filename: self.inputs.get(filename)})}
+        if self.model is not None and not changed:
+            return
+        
+        model = UniFiToMermaid(self.config_dir, node_budget=self.node_budget)
+        try:
+            model.load_configs()
+        except ConfigError as e:
+            if self.model is None:
+                raise
+            logger.warning(f"⚠️  {self.name}: keeping the previous model, reload failed: {e}")
+            return
+        if self.model is not None:
+            logger.info(f"🔄 {self.name}: reloaded after changes to {', '.join(sorted(changed))}")
+        self.model, self.inputs = model, inputs
+        self.loads += 1
+        self.pages = {path: page for path, page in self.pages.items() if not page.inputs & changed}
+    
+    def page(self, path: str) -> Optional[ServedPage]:
+        """The page at a path below the site, rendering it if needed; None if there is no such page"""
+        with self.lock:
+            self.refresh()
+            page = self.pages.get(path)
+            if page is None:
+                page = self._render(path)
+                if page is not None:
+                    self.pages[path] = page
+            return page
+    
+    def _render(self, path: str) -> Optional[ServedPage]:
+        model = self.model
+        nav = f'<a href="/">All sites</a> · <a href="/{urllib.parse.quote(self.name)}/">{html.escape(self.name)}</a>'
+        if path == '':
+            return ServedPage(serve_page(self.name, self._index(), nav, self.diagrams), 'text/html; charset=utf-8',
+                              REQUIRED_FILES)
+        
+        name, extension = os.path.splitext(path)
+        if name.startswith(f'{GRAPHS_DIR}/'):
+            name = name[len(GRAPHS_DIR) + 1:]
+            formats = {ext: render for ext, render in GRAPH_FORMATS.values()}
+            if name not in GRAPH_SECTIONS or extension not in formats:
+                return None
+            content_type = 'application/json' if extension == '.json' else 'text/vnd.graphviz'
+            text = '\n'.join(formats[extension](model.section_graphs(name, node_budget=0))) + '\n'
+            return ServedPage(text, f'{content_type}; charset=utf-8', SECTION_INPUTS[name])
+        
+        if name not in SECTION_INPUTS or extension not in ('', '.md'):
+            return None
+        markdown = section_header(name) + model.generate_sections([name])[name]
+        if extension == '.md':
+            return ServedPage(markdown, 'text/markdown; charset=utf-8', SECTION_INPUTS[name])
+        return ServedPage(serve_page(f"{self.name}: {name}", markdown, nav, self.diagrams),
+                          'text/html; charset=utf-8', SECTION_INPUTS[name])
+    
+    def _index(self) -> str:
+        model = self.model
+        lines = [f"# {self.name}", "",
+                 f"{len(model.devices)} devices and {len(model.networks)} networks from `{self.config_dir}`.", "",
+                 "| Section | Markdown | Graphs |", "|---------|----------|--------|"]
+        for name, heading, _ in COMBINED_SECTIONS:
+            graphs = ""
+            if name in GRAPH_SECTIONS:
+                graphs = " · ".join(f"[{graph_format}]({GRAPHS_DIR}/{name}{extension})"
+                                    for graph_format, (extension, _) in GRAPH_FORMATS.items())
+            lines.append(f"| [{heading}]({name}) | [{name}.md]({name}.md) | {graphs} |")
+        return '\n'.join(lines)
+
+
+class DocumentationServer(ThreadingHTTPServer):
+    """HTTP server for one or more sites, each under /<site name>/, and the
+    Mermaid scripts at the top level when given
+    """
+    daemon_threads = True
+    
+    def __init__(self, address, sites: List[ServedSite], mermaid_js: Optional[bytes] = None):
+        super().__init__(address, DocumentationHandler)
+        self.sites = {site.name: site for site in sites}
+        self.static: Dict[str, ServedPage] = {}
+        if mermaid_js is not None:
+            self.static = {'/mermaid.min.js': ServedPage(mermaid_js, 'text/javascript; charset=utf-8', ()),
+                           '/mermaid-init.js': ServedPage(SERVE_MERMAID_INIT, 'text/javascript; charset=utf-8', ())}
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class DocumentationHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: DocumentationServer
+    
+    def log_message(self, format, *args):
+        logger.debug(f"   {self.address_string()} {format % args}")
+    
+    def do_GET(self):
+        self._serve(head=False)
+    
+    def do_HEAD(self):
+        self._serve(head=True)
+    
+    def _send(self, status: int, page: Optional[ServedPage], head: bool, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        body = page.body if page is not None and status == 200 else b''
+        if page is not None:
+            self.send_header('ETag', page.etag)
+            # Browsers revalidate every time, which costs a 304 when nothing changed
+            self.send_header('Cache-Control', 'no-cache')
+            if status == 200:
+                self.send_header('Content-Type', page.content_type)
+            if page.content_type.startswith('text/html'):
+                self.send_header('Content-Security-Policy', SERVE_CSP)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(page.body) if page is not None else 0))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+    
+    def _error(self, status: int, message: str, head: bool):
+        body = f"{message}\n".encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+    
+    def _serve(self, head: bool):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        site_name, slash, page_path = path.lstrip('/').partition('/')
+        sites = self.server.sites
+        if path in self.server.static:
+            page = self.server.static[path]
+        elif not site_name:
+            if len(sites) == 1:
+                self._send(302, None, head, {'Location': f"/{urllib.parse.quote(next(iter(sites)))}/"})
+                return
+            lines = ["# Network Documentation", ""]
+            lines.extend(f"- [{name}]({urllib.parse.quote(name)}/)" for name in sorted(sites))
+            page = ServedPage(serve_page("Network Documentation", '\n'.join(lines), diagrams=bool(self.server.static)),
+                              'text/html; charset=utf-8', ())
+        elif site_name not in sites:
+            self._error(404, f"No site named {site_name}", head)
+            return
+        elif not slash:
+            self._send(301, None, head, {'Location': f"/{urllib.parse.quote(site_name)}/"})
+            return
+        else:
+            try:
+                page = sites[site_name].page(page_path)
+            except ConfigError as e:
+                self._error(503, f"{site_name}: {e}", head)
+                return
+            if page is None:
+                self._error(404, f"No page {page_path} in {site_name}", head)
+                return
+        
+        match = self.headers.get('If-None-Match')
+        if match is not None and (match.strip() == '*' or page.etag in (tag.strip() for tag in match.split(','))):
+            self._send(304, page, head=True)
+        else:
+            self._send(200, page, head)
+
+
+def serve_main(argv: List[str]):
+    arg_parser = argparse.ArgumentParser(prog='unifi-to-mermaid.py serve',
+                                         description="Serve the documentation of one or more sites over HTTP, "
+                                                     "rendered on demand from exports held in memory")
+    arg_parser.add_argument('site_dirs', nargs='*', help="Export directories, one per site (default: current directory)")
+    arg_parser.add_argument('--manifest', help="JSON manifest listing the sites to serve")
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--node-budget', type=int, default=MERMAID_NODE_BUDGET,
+                            help="Collapse detail in diagrams with more nodes than this; 0 draws everything "
+                                 f"(default: {MERMAID_NODE_BUDGET})")
+    arg_parser.add_argument('--mermaid-js', metavar='FILE',
+                            help="Mermaid's mermaid.min.js, served to draw the diagrams "
+                                 f"(default: {SERVE_MERMAID_JS.name} next to this script, if present; "
+                                 "without it diagrams show as source)")
+    verbosity = arg_parser.add_mutually_exclusive_group()
+    verbosity.add_argument('--quiet', action='store_true', help="Only report warnings and errors")
+    verbosity.add_argument('--verbose', action='store_true', help="Also log every request")
+    args = arg_parser.parse_args(argv)
+    configure_logging(quiet=args.quiet, verbose=args.verbose)
+    
+    mermaid_js = None
+    mermaid_path = Path(args.mermaid_js) if args.mermaid_js else SERVE_MERMAID_JS
+    try:
+        mermaid_js = mermaid_path.read_bytes()
+    except OSError as e:
+        if args.mermaid_js:
+            arg_parser.error(f"cannot read {args.mermaid_js}: {e.strerror}")
+        logger.info(f"ℹ️  No {SERVE_MERMAID_JS.name} next to the script; diagrams show as source (see --mermaid-js)")
+    
+    sites = [{'name': Path(d).resolve().name, 'config_dir': d} for d in args.site_dirs]
+    if args.manifest:
+        sites.extend(load_manifest(Path(args.manifest)))
+    if not sites:
+        sites = [{'name': Path('.').resolve().name, 'config_dir': '.'}]
+    names = [site['name'] for site in sites]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        arg_parser.error(f"duplicate site names: {', '.join(duplicates)} (name them in a manifest)")
+    
+    served = []
+    for site in sites:
+        served_site = ServedSite(site['name'], Path(site['config_dir']), node_budget=args.node_budget,
+                                 diagrams=mermaid_js is not None)
+        try:
+            served_site.refresh()  # Load up front so broken exports are reported at start
+        except ConfigError as e:
+            logger.error(f"❌ {site['name']}: {e}")
+        served.append(served_site)
+    
+    server = DocumentationServer((args.host, args.port), served, mermaid_js)
+    logger.info(f"🌐 Serving {len(served)} sites on {server.url}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()